@@ -1,12 +1,15 @@
 # agents/analyzer.py
-from typing import TypedDict
-import json, os
-from langchain_openai import ChatOpenAI
+from typing import TypedDict, Any, Dict, Optional
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
 from langchain_core.messages import SystemMessage, HumanMessage
-from dotenv import load_dotenv
 
-load_dotenv("properties.env")
-MODEL = os.getenv("OPENAI_MODEL")
+from agents.llm import MODEL, get_model
 
 
 class State(TypedDict, total=False):
@@ -14,21 +17,14 @@ class State(TypedDict, total=False):
     spec: dict
 
 
-def analyzer_node(state: State) -> State:
-    model = ChatOpenAI(model=MODEL)
-
-    task = state.get("task", "")
-    if not task:
-        return state
-
-    system = (
-        "You are a Task Analysis Agent.\n"
-        "Given a natural language project description, you produce a MINIMAL JSON spec "
-        "that summarizes the website structure and key requirements.\n"
-        "Return ONLY valid JSON (no markdown)."
-    )
+SYSTEM_PROMPT = (
+    "You are a Task Analysis Agent.\n"
+    "Given a natural language project description, you produce a MINIMAL JSON spec "
+    "that summarizes the website structure and key requirements.\n"
+    "Return ONLY valid JSON (no markdown)."
+)
 
-    user = f"""
+USER_TEMPLATE = """
 Task:
 {task}
 
@@ -39,16 +35,92 @@ Output JSON with keys:
 - notes: short free-form notes (array of strings)
 """
 
+
+def analyzer_node(state: State) -> State:
+    # 只返回自己写的 spec：analyzer 可能和 researcher 并行执行，返回整个 state 会和对方的更新冲突
+    task = state.get("task", "")
+    if not task:
+        return {}
+
+    # 同样的任务（规范化后）+ 同样的模型，直接复用之前解析好的 spec，省一次模型调用
+    key = _spec_key(task, MODEL)
+    cached = _get_spec(key)
+    if cached is not None:
+        return {"spec": cached}
+
+    model = get_model()
     resp = model.invoke([
-        SystemMessage(content=system),
-        HumanMessage(content=user),
+        SystemMessage(content=SYSTEM_PROMPT),
+        HumanMessage(content=USER_TEMPLATE.format(task=task)),
     ])
 
     try:
         spec = json.loads(resp.content)
     except Exception:
-        # 容错：解析失败就留空
-        return state
+        # 容错：解析失败就留空，也不缓存
+        return {}
+
+    _put_spec(key, spec)
+    return {"spec": spec}
+
+
+# ---------- spec 缓存 ----------
+# 线上流量里反复出现同一批任务（例如 server.py 里的 arXiv CS Daily 预设），
+# spec 按 (规范化任务, 模型, prompt) 缓存在内存里，TTL + 条数上限。
+SPEC_CACHE_TTL_S = int(os.getenv("ANALYZER_SPEC_TTL_S", str(24 * 3600)))
+SPEC_CACHE_SIZE = int(os.getenv("ANALYZER_SPEC_CACHE_SIZE", "128"))
+
+_spec_lock = threading.Lock()
+# key -> (过期时间, spec)
+_spec_cache: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+_spec_stats = {"hits": 0, "misses": 0, "stores": 0}
+
+
+def _normalize_task(task: str) -> str:
+    """只忽略空白差异（每行首尾空白、连续空白、空行）；大小写和标点可能影响 spec，保留。"""
+    lines = (" ".join(line.split()) for line in task.strip().splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def _spec_key(task: str, model: Optional[str]) -> str:
+    h = hashlib.sha256()
+    # prompt 改了之后旧的 spec 自动失效
+    for part in (model or "", SYSTEM_PROMPT, USER_TEMPLATE, _normalize_task(task)):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _get_spec(key: str) -> Optional[Any]:
+    if SPEC_CACHE_TTL_S <= 0:
+        return None
+    with _spec_lock:
+        entry = _spec_cache.get(key)
+        if entry is None or entry[0] <= time.time():
+            if entry is not None:
+                del _spec_cache[key]
+            _spec_stats["misses"] += 1
+            return None
+        _spec_cache.move_to_end(key)
+        _spec_stats["hits"] += 1
+        # 返回副本：下游节点改 spec 不能污染缓存
+        return copy.deepcopy(entry[1])
+
+
+def _put_spec(key: str, spec: Any) -> None:
+    if SPEC_CACHE_TTL_S <= 0 or SPEC_CACHE_SIZE <= 0:
+        return
+    with _spec_lock:
+        _spec_cache[key] = (time.time() + SPEC_CACHE_TTL_S, copy.deepcopy(spec))
+        _spec_cache.move_to_end(key)
+        _spec_stats["stores"] += 1
+        while len(_spec_cache) > SPEC_CACHE_SIZE:
+            _spec_cache.popitem(last=False)
+
 
-    state["spec"] = spec
-    return state
\ No newline at end of file
+def spec_cache_stats() -> Dict[str, Any]:
+    with _spec_lock:
+        out: Dict[str, Any] = dict(_spec_stats, size=len(_spec_cache))
+    lookups = out["hits"] + out["misses"]
+    out["hit_rate"] = round(out["hits"] / lookups, 3) if lookups else None
+    return out
\ No newline at end of file
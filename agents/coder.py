@@ -1,12 +1,12 @@
 # agents/coder.py
 from typing import TypedDict, List, Dict, Any
-import json, os
-from langchain_openai import ChatOpenAI
+import json, os, re
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, ToolMessage
+from agents.llm import get_model
 from tools.init import TOOLS_BY_NAME
-from dotenv import load_dotenv
-load_dotenv("properties.env")
-MODEL = os.getenv("OPENAI_MODEL")
+from tools.executor import run_tool_calls
+from tools.pydeps import local_imports
+from tools.workspace import get_workspace, workspace_manifest
 
 
 class State(TypedDict, total=False):
@@ -14,16 +14,21 @@ class State(TypedDict, total=False):
     spec: dict
     task_queue: List[dict]
     done_tasks: List[dict]
-    test_log: str
+    test_log: Any
     tests_passed: bool
+    iter: int
     review: str
     evidence_pack: Dict[str, Any]
+    contract: Dict[str, Any]
+    workspace: str
 
 
 def coder_node(state: State) -> State:
-    model = ChatOpenAI(model=MODEL).bind_tools(
+    model = get_model(
         [
             TOOLS_BY_NAME["write_file"],
+            TOOLS_BY_NAME["write_files"],
+            TOOLS_BY_NAME["edit_file"],
             TOOLS_BY_NAME["read_file"],
             TOOLS_BY_NAME["list_dir"],
             TOOLS_BY_NAME["web_fetch"],
@@ -34,7 +39,112 @@ def coder_node(state: State) -> State:
     user_task = (state.get("task") or "").strip()
     if not user_task:
         # 没有任何任务描述，就什么都不做
-        return state
+        return {}
+
+    if state.get("tests_passed") is False and state.get("iter", 0) > 0:
+        # evaluator 打回来的修复轮：只带失败上下文，增量修改
+        messages = _fix_messages(state, user_task)
+    elif state.get("done_tasks") and not state.get("iter"):
+        # file_worker 已经并行生成了各个文件：只补缺失的文件、修跨文件的不一致
+        messages = _integrate_messages(state, user_task)
+    else:
+        messages = _build_messages(state, user_task)
+
+    written = set()
+
+    # write_file / write_files 的参数校验与去重在主线程按顺序做，保证并发执行时 written 仍然正确
+    def precheck(tc):
+        if tc["name"] == "write_files":
+            return _precheck_batch(tc, written)
+        if tc["name"] != "write_file":
+            return None
+        args = tc.get("args", {}) or {}
+        if "path" not in args or "content" not in args:
+            return ToolMessage(
+                content=f"ERROR: write_file missing fields: {args}",
+                tool_call_id=tc["id"],
+            )
+        if args["path"] in written:
+            return ToolMessage(
+                content=f"SKIP: already wrote {args['path']} in this run",
+                tool_call_id=tc["id"],
+            )
+        written.add(args["path"])
+        return None
+
+    # 一次性生成项目，可以多给几轮工具调用
+    for _ in range(8):
+        ai = model.invoke(messages)
+        messages.append(ai)
+        if not isinstance(ai, AIMessage) or not ai.tool_calls:
+            break
+
+        # 同一轮里互不相关的工具调用并发执行，结果按 tool_call 原顺序追加
+        messages.extend(run_tool_calls(ai.tool_calls, TOOLS_BY_NAME, precheck=precheck))
+
+    # coder 只产出文件，不改 state；不能把整个 state 返回去，否则 done_tasks 的 reducer 会把它再追加一遍
+    return {}
+
+
+def _precheck_batch(tc: dict, written: set):
+    files = (tc.get("args") or {}).get("files")
+    if not isinstance(files, list) or not files:
+        return ToolMessage(content="ERROR: write_files needs a non-empty 'files' list", tool_call_id=tc["id"])
+    paths = [f.get("path") for f in files if isinstance(f, dict)]
+    if len(paths) != len(files) or not all(paths) or any("content" not in f for f in files):
+        return ToolMessage(
+            content="ERROR: every write_files entry needs 'path' and 'content'",
+            tool_call_id=tc["id"],
+        )
+    # 整批都写过才跳过；部分重复照常写（写入带变更检测，内容没变的文件不会真的落盘）
+    if all(p in written for p in paths):
+        return ToolMessage(
+            content=f"SKIP: already wrote {', '.join(paths)} in this run",
+            tool_call_id=tc["id"],
+        )
+    written.update(paths)
+    return None
+
+
+def _integrate_messages(state: State, user_task: str) -> list:
+    """map-reduce 之后的整合轮：worker 的产出 + 契约 + 清单，不重新生成已经写好的文件。"""
+    done = [
+        {k: t.get(k) for k in ("id", "files", "written", "errors")}
+        for t in state.get("done_tasks") or []
+    ]
+    manifest = "\n".join(
+        f"{rel}  {meta['sha256']}  {meta['size']}B" for rel, meta in workspace_manifest().items()
+    )
+    return [
+        SystemMessage(content=(
+            "You are the integration step of a Code Generation Agent. "
+            "The project's files were just generated in parallel by per-file workers that shared a PROJECT CONTRACT. "
+            "Create only what is still missing (files a worker failed to write, scripts, shared modules, README) "
+            "and fix cross-file inconsistencies (links, asset paths, shared names) with edit_file. "
+            "Use read_file to inspect a file before editing it. Do NOT regenerate files that are already fine."
+        )),
+        HumanMessage(content=f"""
+PROJECT DESCRIPTION (natural language):
+{user_task}
+
+PROJECT CONTRACT:
+{json.dumps(state.get("contract") or {}, ensure_ascii=False, indent=2)}
+
+WORKER RESULTS (files each worker owned / actually wrote / errors):
+{json.dumps(done, ensure_ascii=False, indent=2)}
+
+WORKSPACE MANIFEST (path  sha256-prefix  size):
+{manifest}
+
+Requirements:
+- Paths are relative to workspace/ (no 'workspace/' prefix).
+- If everything required by the task is present and consistent, reply briefly without calling tools.
+"""),
+    ]
+
+
+def _build_messages(state: State, user_task: str) -> list:
+    """首轮：完整任务 + spec + evidence，一次性生成整个项目。"""
     # 可选：上一轮测试结果
     prev_tests = state.get("test_log")
     prev_passed = state.get("tests_passed")
@@ -60,7 +170,8 @@ def coder_node(state: State) -> State:
             "You are a Code Generation Agent. "
             "Given a project description, create ALL necessary project files in the workspace/ directory. "
             "This is a one-shot build: design a minimal but complete solution, then implement it. "
-            "Use write_file to create/overwrite files; use read_file/list_dir only if you truly need context. "
+            "Use write_files to create several files in one call (write_file for a single file); "
+            "use read_file/list_dir only if you truly need context. "
             "Do NOT rewrite the same file multiple times in a single run."
         )),
         HumanMessage(content=f"""
@@ -74,56 +185,126 @@ PROJECT DESCRIPTION (natural language):
 
 Requirements:
 - Create a project for this task under the current directory (workspace/).
-- Use only relative paths; when calling write_file:
+- Use only relative paths; when calling write_file / write_files:
   - 'path' MUST be relative to workspace/ (do NOT prefix with 'workspace/').
-  - MUST include both 'path' and 'content'.
+  - MUST include both 'path' and 'content' for every file.
+- Prefer one write_files call with all files over many write_file calls.
 - Avoid placeholder/fake content if the task explicitly requires real data.
 - If spec is available, strictly follow it.
 """)
     ]
+    return messages
 
-    written = set()
-    # 一次性生成项目，可以多给几轮工具调用
-    for _ in range(8):
-        ai = model.invoke(messages)
-        messages.append(ai)
-        if not isinstance(ai, AIMessage) or not ai.tool_calls:
-            break
 
-        for tc in ai.tool_calls:
-            name = tc["name"]
-            args = tc.get("args", {}) or {}
-
-            if name == "write_file":
-                if "path" not in args or "content" not in args:
-                    messages.append(ToolMessage(
-                        content=f"ERROR: write_file missing fields: {args}",
-                        tool_call_id=tc["id"],
-                    ))
-                    continue
-                if args["path"] in written:
-                    messages.append(ToolMessage(
-                        content=f"SKIP: already wrote {args['path']} in this run",
-                        tool_call_id=tc["id"],
-                    ))
-                    continue
-                written.add(args["path"])
-
-            tool = TOOLS_BY_NAME.get(name)
-            if not tool:
-                messages.append(ToolMessage(
-                    content=f"ERROR: unknown tool {name}",
-                    tool_call_id=tc["id"],
-                ))
-                continue
-
-            try:
-                out = tool.invoke(args)
-                messages.append(ToolMessage(content=str(out), tool_call_id=tc["id"]))
-            except Exception as e:
-                messages.append(ToolMessage(
-                    content=f"ERROR: tool failed: {e}",
-                    tool_call_id=tc["id"],
-                ))
-
-    return state
\ No newline at end of file
+# 修复轮给模型看的上下文上限
+FIX_MAX_FILES = 8
+FIX_MAX_FILE_CHARS = 20000
+FIX_MAX_LOG_CHARS = 4000
+
+_TRACEBACK_FILE_RE = re.compile(r'File "([^"]+)", line \d+')
+
+
+def _failing_entries(test_log: Any) -> List[dict]:
+    if not isinstance(test_log, list):
+        return []
+    out = []
+    for res in test_log:
+        if not isinstance(res, dict) or res.get("skipped"):
+            continue
+        if res.get("returncode", 1) != 0 or res.get("parse_error"):
+            out.append(res)
+    return out
+
+
+def _touched_files(failing: List[dict]) -> List[str]:
+    """失败目标本身、traceback 里出现的 workspace 文件，以及目标直接 import 的本地模块。"""
+    root = get_workspace()
+    seen: List[str] = []
+
+    def add(abs_path: str) -> None:
+        abs_path = os.path.abspath(abs_path)
+        if os.path.commonpath([root, abs_path]) != root or not os.path.isfile(abs_path):
+            return
+        rel = os.path.relpath(abs_path, root)
+        if rel not in seen:
+            seen.append(rel)
+
+    for res in failing:
+        target = res.get("target")
+        if target:
+            add(os.path.join(root, target))
+        for path in _TRACEBACK_FILE_RE.findall(str(res.get("output") or res.get("raw") or "")):
+            add(os.path.join(root, path))
+        if target:
+            for dep in local_imports(os.path.join(root, target), root):
+                add(dep)
+    return seen[:FIX_MAX_FILES]
+
+
+def _fix_messages(state: State, user_task: str) -> list:
+    """
+    修复轮：不重新生成整个项目，只给
+    - 失败目标的日志（截尾）；
+    - 这些目标涉及的文件内容；
+    - 整个 workspace 的内容哈希清单（让模型知道已有哪些文件，不必重写）。
+    """
+    failing = _failing_entries(state.get("test_log"))
+    logs = []
+    for res in failing:
+        entry = {
+            "target": res.get("target"),
+            "returncode": res.get("returncode"),
+            "output": str(res.get("output") or res.get("raw") or "")[-FIX_MAX_LOG_CHARS:],
+        }
+        if res.get("precheck"):
+            entry["check"] = res["precheck"]  # 静态预检查失败（语法 / JSON / HTML）
+        logs.append(entry)
+    if not logs:
+        # 没有结构化的失败记录（例如静态检查失败），原样带上日志
+        logs = [{"log": str(state.get("test_log"))[-FIX_MAX_LOG_CHARS:]}]
+
+    root = get_workspace()
+    files = []
+    for rel in _touched_files(failing):
+        try:
+            with open(os.path.join(root, rel), "r", encoding="utf-8", errors="replace") as f:
+                content = f.read(FIX_MAX_FILE_CHARS + 1)
+        except OSError:
+            continue
+        if len(content) > FIX_MAX_FILE_CHARS:
+            content = content[:FIX_MAX_FILE_CHARS] + "\n... [truncated; use read_file with start_line/offset for the rest]"
+        files.append(f"--- {rel} ---\n{content}")
+
+    # 一行一个文件，比缩进 JSON 省 token
+    manifest = "\n".join(
+        f"{rel}  {meta['sha256']}  {meta['size']}B" for rel, meta in workspace_manifest().items()
+    )
+    return [
+        SystemMessage(content=(
+            "You are a Code Generation Agent in FIX mode. "
+            "The project already exists in the workspace/ directory and some checks failed. "
+            "Make the smallest change that fixes the failures: touch ONLY the files that need to change, "
+            "and do NOT regenerate or re-emit files that are already correct. "
+            "Prefer edit_file (search/replace blocks or a unified diff) over write_file for existing files. "
+            "Use read_file if you need a file that is not included below. "
+            "Do NOT rewrite the same file multiple times in a single run."
+        )),
+        HumanMessage(content=f"""
+PROJECT DESCRIPTION (for reference):
+{user_task}
+
+FAILING CHECKS (iteration {state.get("iter", 0)}):
+{json.dumps(logs, ensure_ascii=False, indent=2)}
+
+FILES INVOLVED IN THE FAILURES:
+{chr(10).join(files) if files else "(none identified)"}
+
+WORKSPACE MANIFEST (path  sha256-prefix  size; these files already exist):
+{manifest or "(empty)"}
+
+Requirements:
+- Use edit_file for small changes to existing files; write_file only for new files or full rewrites.
+- 'path' MUST be relative to workspace/.
+- Keep everything else as is.
+""")
+    ]
@@ -1,7 +1,30 @@
 # agents/evaluator.py
-from typing import TypedDict, List, Any
+from typing import TypedDict, List, Any, Callable, Dict, Optional
+import contextvars
 import json
-from tools.init import TOOLS_BY_NAME
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from tools.capture import kill_process_group
+from tools.prechecks import run_prechecks
+from tools.pydeps import scan_inputs
+from tools.shell import run_command
+from tools import fsindex, profiling, warm_pool
+from tools.workspace import file_sha256, get_workspace
+
+# 并行评测的默认配置，state 里的同名小写字段可以覆盖
+EVAL_WORKERS = int(os.getenv("EVAL_WORKERS", "4"))
+EVAL_TARGET_TIMEOUT_S = int(os.getenv("EVAL_TARGET_TIMEOUT_S", "120"))
+EVAL_TOTAL_BUDGET_S = int(os.getenv("EVAL_TOTAL_BUDGET_S", "600"))
+EVAL_FAIL_FAST = os.getenv("EVAL_FAIL_FAST", "0") == "1"
+# 是否先跑进程内静态预检查（tools/prechecks.py）
+EVAL_PRECHECKS = os.getenv("EVAL_PRECHECKS", "1") == "1"
+# 忽略变更检测，每轮都全部重跑
+EVAL_FORCE_FULL = os.getenv("EVAL_FORCE_FULL", "0") == "1"
+# 用预热解释器池（tools/warm_pool.py）代替 run_shell 执行目标；不支持 fork 的平台自动退回
+EVAL_WARM_POOL = os.getenv("EVAL_WARM_POOL", "0") == "1"
 
 
 class State(TypedDict, total=False):
@@ -9,16 +32,172 @@ class State(TypedDict, total=False):
     tests_passed: bool
     test_log: Any
     iter: int
+    # 可选：覆盖并行评测配置
+    eval_workers: int
+    eval_target_timeout_s: int
+    eval_total_budget_s: int
+    eval_fail_fast: bool
+    eval_force_full: bool
+    eval_prechecks: bool
+    eval_warm_pool: bool
+    precheck: Dict[str, Any]
+    # 上一轮每个目标的输入指纹和结果：{target: {"inputs": {path: sha256}, "result": {...}}}
+    eval_cache: Dict[str, Any]
+    workspace: str
+
+
+def _run_target(path: str, timeout_s: int, warm: bool = False, workers: int = EVAL_WORKERS,
+                on_start: Optional[Callable[[int], None]] = None) -> dict:
+    cmd = f"python {path}"
+    if warm and warm_pool.available():
+        try:
+            return warm_pool.get_pool(workers).run(path, get_workspace(), timeout_s, on_start=on_start)
+        except Exception:  # noqa: BLE001
+            pass  # 池子本身出问题（母进程起不来 / 卡死 / 等不到空闲母进程）或目标有同名本地模块，就退回普通子进程
+    try:
+        # 直接调实现而不是 run_shell 工具：工具的参数 schema 把 timeout_s 限制在 120 以内，
+        # EVAL_TARGET_TIMEOUT_S / eval_target_timeout_s 可以配得更大
+        res = run_command(cmd, timeout_s, on_start=on_start)
+    except Exception as e:  # noqa: BLE001
+        res = {"cmd": cmd, "returncode": None, "error": f"{type(e).__name__}: {e}"}
+    return res
+
+
+def _target_inputs(path: str) -> Optional[Dict[str, str]]:
+    """
+    目标的输入指纹：{相对路径: sha256}，包括目标自身、本地 import 和引用到的数据文件。
+    目标（或它 import 的本地文件）里有动态路径 / 动态 import / glob 等静态看不全的读取时返回 None：
+    输入集合不完整，指纹没变不代表结果没变，这种目标每轮都重跑。
+    """
+    root = get_workspace()
+    inputs, dynamic = scan_inputs(os.path.join(root, path), root)
+    if dynamic:
+        return None
+    fingerprint = {}
+    for abs_path in inputs:
+        rel = os.path.relpath(abs_path, root)
+        try:
+            fingerprint[rel] = file_sha256(abs_path)
+        except OSError:
+            fingerprint[rel] = "missing"
+    return fingerprint
+
+
+def _run_targets(
+    targets: List[str],
+    workers: int,
+    target_timeout_s: int,
+    total_budget_s: int,
+    fail_fast: bool,
+    warm: bool = False,
+) -> List[dict]:
+    """
+    并行执行所有 .py 目标，结果按 targets 原顺序返回：
+    - 每个目标的超时 = min(单目标上限, 总预算剩余时间)；预算用完后还没开始的目标直接判失败；
+    - fail_fast 时一旦有目标失败，尚未开始的目标被取消，正在运行的目标整组杀掉，都记为 cancelled (fail-fast)。
+    """
+    results: List[Optional[dict]] = [None] * len(targets)
+    deadline = time.monotonic() + total_budget_s
+    stop = threading.Event()
+    # 正在运行的目标：下标 -> 进程组号；fail-fast 时用来杀掉还没跑完的兄弟目标
+    lock = threading.Lock()
+    running: Dict[int, int] = {}
+    cancelled = set()
+
+    def started(i: int) -> Callable[[int], None]:
+        def on_start(pid: int) -> None:
+            with lock:
+                if stop.is_set():
+                    # 进程刚起来时 fail-fast 已经触发
+                    cancelled.add(i)
+                    kill_process_group(pid)
+                else:
+                    running[i] = pid
+        return on_start
+
+    def cancel_running() -> None:
+        with lock:
+            for i, pid in running.items():
+                cancelled.add(i)
+                kill_process_group(pid)
+            running.clear()
+
+    def run(i: int, path: str) -> None:
+        if stop.is_set():
+            results[i] = {"target": path, "skipped": True, "reason": "cancelled (fail-fast)"}
+            return
+        remaining = deadline - time.monotonic()
+        if remaining < 1:
+            results[i] = {
+                "target": path,
+                "returncode": None,
+                "error": f"total time budget ({total_budget_s}s) exhausted before start",
+            }
+            return
+        timeout_s = max(1, min(target_timeout_s, math.floor(remaining)))
+        t0 = time.perf_counter()
+        res = _run_target(path, timeout_s, warm=warm, workers=workers, on_start=started(i))
+        res["target"] = path
+        res["duration_s"] = round(time.perf_counter() - t0, 3)
+        with lock:
+            running.pop(i, None)
+            # 被杀之前刚好自己跑完并通过的不算取消
+            was_cancelled = i in cancelled and res.get("returncode") != 0
+        if was_cancelled:
+            res.update(skipped=True, reason="cancelled (fail-fast)")
+        results[i] = res
+        if fail_fast and not was_cancelled and res.get("returncode", 1) != 0:
+            stop.set()
+            cancel_running()
+
+    jobs = []
+    for i, path in enumerate(targets):
+        # 只允许 .py 文件
+        if not path.endswith(".py"):
+            results[i] = {
+                "target": path,
+                "skipped": True,
+                "reason": "only .py files are allowed in evaluator",
+            }
+        else:
+            jobs.append((i, path))
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="eval") as pool:
+        # 复制 contextvars：run_shell 依赖当前运行的 workspace
+        futures = [pool.submit(contextvars.copy_context().run, profiling.in_thread(run), i, path) for i, path in jobs]
+        for f in futures:
+            f.result()
+
+    return [r for r in results if r is not None]
 
 
 def evaluator_node(state: State) -> State:
     """
     通用评测节点：
-    - 仅在 state.test_targets 中有 .py 目标时，使用 run_shell 运行这些文件；
+    - 先对 workspace 做一遍静态预检查（.py 语法 / .json 解析 / .html 标签配对），失败直接打回 coder；
+    - 仅在 state.test_targets 中有 .py 目标时，使用 run_shell 并行运行这些文件；
     - 对于“纯前端任务”，不设置 test_targets => evaluator 只记录“无测试”，不实际执行任何东西。
     """
     targets = state.get("test_targets") or []
-    logs: List[Any] = []
+
+    # 0) 进程内静态预检查：语法 / JSON / HTML 有问题就不必再起解释器
+    if state.get("eval_prechecks", EVAL_PRECHECKS):
+        pre = run_prechecks()
+        state["precheck"] = {k: pre[k] for k in ("ok", "checked", "duration_s")}
+        if not pre["ok"]:
+            state["tests_passed"] = False
+            # 与 run_shell 结果同样的结构，coder 修复轮可以直接定位到出错文件
+            state["test_log"] = [
+                {
+                    "target": f["path"],
+                    "precheck": f["kind"],
+                    "returncode": 1,
+                    "output": f["error"],
+                }
+                for f in pre["failures"]
+            ]
+            state["iter"] = state.get("iter", 0) + 1
+            return state
 
     # 1) 没有任何测试目标：直接跳过
     if not targets:
@@ -27,38 +206,45 @@ def evaluator_node(state: State) -> State:
         state["iter"] = state.get("iter", 0) + 1
         return state
 
-    # 2) 有测试目标：执行 .py 文件
-    run_shell = TOOLS_BY_NAME["run_shell"]
+    # 2) 输入没变的目标直接复用上一轮结果，只跑变了的
+    force_full = state.get("eval_force_full", EVAL_FORCE_FULL)
+    prev_cache = {} if force_full else (state.get("eval_cache") or {})
+    inputs = {p: _target_inputs(p) for p in targets if p.endswith(".py")}
+    reused = {}
+    for p, fingerprint in inputs.items():
+        prev = prev_cache.get(p)
+        if fingerprint is not None and prev and prev.get("inputs") == fingerprint:
+            reused[p] = {**prev["result"], "reused": True}
 
-    ok = True
-    for path in targets:
-        # 只允许 .py 文件
-        if not path.endswith(".py"):
-            logs.append(
-                {
-                    "target": path,
-                    "skipped": True,
-                    "reason": "only .py files are allowed in evaluator",
-                }
-            )
-            continue
+    # 3) 有测试目标：并行执行 .py 文件
+    to_run = [p for p in targets if p not in reused]
+    fresh = _run_targets(
+        to_run,
+        workers=state.get("eval_workers") or EVAL_WORKERS,
+        target_timeout_s=state.get("eval_target_timeout_s") or EVAL_TARGET_TIMEOUT_S,
+        total_budget_s=state.get("eval_total_budget_s") or EVAL_TOTAL_BUDGET_S,
+        fail_fast=state.get("eval_fail_fast", EVAL_FAIL_FAST),
+        warm=state.get("eval_warm_pool", EVAL_WARM_POOL),
+    )
+    # 目标可能生成了文件（预热池不经过 run_shell），让 list_dir 重新索引
+    fsindex.invalidate(get_workspace())
+    by_target = {res["target"]: res for res in fresh}
+    logs = [reused.get(p) or by_target[p] for p in targets]
 
-        cmd = f"python {path}"
-        raw = run_shell.invoke({"cmd": cmd, "timeout_s": 120})
-
-        # 你的 run_shell 是返回 JSON 字符串，这里解析一下
-        try:
-            res = json.loads(raw)
-        except Exception:
-            res = {"raw": raw, "parse_error": True}
-
-        res["target"] = path
-        logs.append(res)
+    # 更新缓存：超时 / 预算耗尽 / 被取消的结果不可复现，输入看不全的没法判断是否变了，都不缓存
+    cache = dict(prev_cache)
+    for res in fresh:
+        p = res["target"]
+        if inputs.get(p) is not None and res.get("returncode") is not None and not res.get("skipped"):
+            cache[p] = {"inputs": inputs[p], "result": res}
+        else:
+            cache.pop(p, None)
+    state["eval_cache"] = cache
 
-        if res.get("returncode", 1) != 0:
-            ok = False
+    # 被跳过的（非 .py / fail-fast 取消）不参与判定；fail-fast 取消时必然已有失败
+    ok = all(res.get("returncode", 1) == 0 for res in logs if not res.get("skipped"))
 
     state["tests_passed"] = ok
     state["test_log"] = logs
     state["iter"] = state.get("iter", 0) + 1
-    return state
\ No newline at end of file
+    return state
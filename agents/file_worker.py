@@ -0,0 +1,118 @@
+# agents/file_worker.py
+"""
+file_worker：map-reduce 里的 map 端，由 planner 通过 Send 并行分发。
+每个 worker 只负责一个 work item（一个文件或一组文件），上下文只有任务描述 + 共享契约 + 自己的 item，
+只能写自己负责的文件（避免并行 worker 互相覆盖），结果以一条记录追加进 done_tasks。
+"""
+import json
+import os
+import time
+from typing import TypedDict, List, Dict, Any
+
+from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, ToolMessage
+
+from agents.llm import get_model
+from agents.planner import allows
+from tools.executor import run_tool_calls
+from tools.init import TOOLS_BY_NAME
+from tools.workspace import get_workspace
+
+FILE_WORKER_MAX_TURNS = int(os.getenv("FILE_WORKER_MAX_TURNS", "4"))
+
+
+class State(TypedDict, total=False):
+    task: str
+    contract: Dict[str, Any]
+    work_item: Dict[str, Any]
+    workspace: str
+
+
+def _write_paths(tc: dict) -> List[str]:
+    args = tc.get("args") or {}
+    if tc["name"] == "write_file":
+        return [args.get("path") or ""]
+    if tc["name"] == "write_files":
+        return [f.get("path") or "" for f in (args.get("files") or []) if isinstance(f, dict)]
+    return []
+
+
+def _written_paths(content: Any) -> List[str]:
+    """从 write_file / write_files 的返回里取出真正写成功的文件（相对 workspace 的路径）。"""
+    try:
+        data = json.loads(str(content))
+    except ValueError:
+        return []  # "ERROR: ..."：整个调用失败或被拒
+    entries = data.get("results", [data]) if isinstance(data, dict) else []
+    root = get_workspace()
+    return [
+        os.path.relpath(e["path"], root).replace("\\", "/")
+        for e in entries
+        if isinstance(e, dict) and e.get("path") and "error" not in e
+    ]
+
+
+def file_worker_node(state: State) -> Dict[str, Any]:
+    item = state.get("work_item") or {}
+    files = item.get("files") or []
+    t0 = time.perf_counter()
+    model = get_model([TOOLS_BY_NAME["write_files"], TOOLS_BY_NAME["write_file"], TOOLS_BY_NAME["read_file"]])
+
+    written: List[str] = []
+    errors: List[str] = []
+
+    # 只允许写自己负责的文件；在主线程里按顺序检查。实际写了哪些按工具返回结果记录
+    def precheck(tc):
+        paths = _write_paths(tc)
+        outside = [p for p in paths if not allows(files, p)]
+        if outside:
+            errors.append(f"refused write outside work item: {', '.join(outside)}")
+            return ToolMessage(
+                content=f"ERROR: {', '.join(outside)} belong to other workers; only write {files}",
+                tool_call_id=tc["id"],
+            )
+        return None
+
+    messages = [
+        SystemMessage(content=(
+            "You are a File Generation Worker, one of several running in parallel on the same project. "
+            "Write ONLY the files of your work item, completely and in final form, in a single write_files call if possible. "
+            "Other files are written by other workers at the same time: follow the PROJECT CONTRACT exactly for "
+            "their paths, names and shared assets so links and references line up, and do not write them yourself."
+        )),
+        HumanMessage(content=f"""
+PROJECT DESCRIPTION:
+{state.get("task", "")}
+
+PROJECT CONTRACT (shared, read-only):
+{json.dumps(state.get("contract") or {}, ensure_ascii=False, indent=2)}
+
+YOUR WORK ITEM:
+{json.dumps(item, ensure_ascii=False, indent=2)}
+
+Requirements:
+- Paths are relative to workspace/ (no 'workspace/' prefix).
+- If a path is a pattern (e.g. 'categories/*.html'), write every concrete file the task implies for it.
+- Avoid placeholder/fake content if the task explicitly requires real data.
+"""),
+    ]
+
+    for _ in range(FILE_WORKER_MAX_TURNS):
+        ai = model.invoke(messages)
+        messages.append(ai)
+        if not isinstance(ai, AIMessage) or not ai.tool_calls:
+            break
+        results = run_tool_calls(ai.tool_calls, TOOLS_BY_NAME, precheck=precheck)
+        messages.extend(results)
+        for tc, m in zip(ai.tool_calls, results):
+            if tc["name"] in ("write_file", "write_files"):
+                written.extend(p for p in _written_paths(m.content) if p not in written)
+        errors.extend(m.content for m in results if str(m.content).startswith("ERROR: tool failed"))
+
+    # 只返回 reducer 字段：多个 worker 的结果由 operator.add 合并
+    return {"done_tasks": [{
+        "id": item.get("id", ""),
+        "files": files,
+        "written": written,
+        "errors": errors,
+        "duration_s": round(time.perf_counter() - t0, 3),
+    }]}
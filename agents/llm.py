@@ -0,0 +1,141 @@
+# agents/llm.py
+"""
+进程级共享的 chat model 注册表：
+- 每个 (model, tool 集合) 只构造一次 ChatOpenAI / bind_tools，之后所有运行复用；
+- 同一个 model 的所有变体共用一个 httpx.Client（连接池 + keep-alive + TLS 会话复用）；
+- pool_stats() 暴露每个 model 的请求数 / 新建连接数 / 当前连接数，用来观察连接复用情况；
+- 返回的模型外面包了一层磁盘响应缓存，见 agents/llm_cache.py；
+- register_base_model() 可以把某个 model 名换成别的 chat model（bench/ 里的脚本化假模型就是这样接进来的）。
+"""
+import os
+import threading
+import weakref
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import httpx
+from dotenv import load_dotenv
+from langchain_openai import ChatOpenAI
+
+from agents.llm_cache import CachedChatModel, cache_mode
+
+load_dotenv("properties.env")
+MODEL = os.getenv("OPENAI_MODEL")
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_HTTP_KEEPALIVE_CONNECTIONS", "10"))
+HTTP_KEEPALIVE_EXPIRY_S = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY_S", "60"))
+HTTP_TIMEOUT_S = float(os.getenv("LLM_HTTP_TIMEOUT_S", "600"))
+
+
+class _PooledTransport(httpx.HTTPTransport):
+    """在 httpx 默认连接池之上统计请求数和新建连接数。"""
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._lock = threading.Lock()
+        self._seen: "weakref.WeakSet[Any]" = weakref.WeakSet()
+        self.requests = 0
+        self.connections_opened = 0
+
+    def _connections(self) -> list:
+        pool = getattr(self, "_pool", None)
+        return list(getattr(pool, "connections", []) or [])
+
+    def _track_connections(self) -> None:
+        with self._lock:
+            for conn in self._connections():
+                if conn not in self._seen:
+                    self._seen.add(conn)
+                    self.connections_opened += 1
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        with self._lock:
+            self.requests += 1
+        try:
+            return super().handle_request(request)
+        finally:
+            self._track_connections()
+
+    def stats(self) -> Dict[str, Any]:
+        conns = self._connections()
+        idle = sum(1 for c in conns if getattr(c, "is_idle", lambda: False)())
+        with self._lock:
+            requests, opened = self.requests, self.connections_opened
+        return {
+            "requests": requests,
+            "connections_opened": opened,
+            "connections_open": len(conns),
+            "connections_idle": idle,
+            # >1 说明连接被复用；新建一次连接平均服务了多少个请求
+            "requests_per_connection": round(requests / opened, 2) if opened else None,
+        }
+
+
+_lock = threading.Lock()
+_transports: Dict[str, _PooledTransport] = {}
+_clients: Dict[str, httpx.Client] = {}
+_bases: Dict[str, ChatOpenAI] = {}
+_models: Dict[Tuple[str, Tuple[str, ...]], Any] = {}
+
+
+def _http_client(model: str) -> httpx.Client:
+    # 调用方已持有 _lock
+    client = _clients.get(model)
+    if client is None:
+        transport = _PooledTransport(
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_S,
+            ),
+        )
+        client = httpx.Client(transport=transport, timeout=HTTP_TIMEOUT_S)
+        _transports[model] = transport
+        _clients[model] = client
+    return client
+
+
+def get_model(tools: Optional[Sequence[Any]] = None, model: Optional[str] = None):
+    """
+    返回共享的 chat model；传入 tools 时返回 bind_tools 之后的版本。
+    返回对象可以在多个线程 / 多个运行之间并发使用。
+    """
+    model = model or MODEL
+    tools = list(tools or [])
+    key = (model, tuple(t.name for t in tools))
+    with _lock:
+        cached = _models.get(key)
+        if cached is not None:
+            return cached
+        base = _bases.get(model)
+        if base is None:
+            # 自带 http_client 时 langchain-openai 不会默认打开 stream_usage；
+            # server 用 messages 模式流式运行，不打开的话流式响应里没有 usage，token / 费用全是 0
+            # replay 模式只读缓存、不会真的请求 API；没配 OPENAI_API_KEY 时给个占位 key，
+            # 否则 ChatOpenAI 构造时就报错，离线回放也得先配 key
+            api_key = os.getenv("OPENAI_API_KEY") or ("replay-offline" if cache_mode() == "replay" else None)
+            base = ChatOpenAI(model=model, http_client=_http_client(model), stream_usage=True, api_key=api_key)
+            _bases[model] = base
+        bound = base.bind_tools(tools) if tools else base
+        # 外面再包一层响应缓存（LLM_CACHE_MODE=off 时直接透传）
+        wrapped = CachedChatModel(bound, model, tools)
+        _models[key] = wrapped
+        return wrapped
+
+
+def register_base_model(model: str, chat_model: Any) -> None:
+    """
+    让 get_model(model=model) 使用 chat_model 而不是新建 ChatOpenAI。
+    chat_model 需要支持 invoke / bind_tools；已经缓存的该 model 的变体会被清掉。
+    """
+    with _lock:
+        _bases[model] = chat_model
+        for key in [k for k in _models if k[0] == model]:
+            del _models[key]
+
+
+def pool_stats() -> Dict[str, Dict[str, Any]]:
+    """每个 model 一份连接池统计。"""
+    with _lock:
+        transports = dict(_transports)
+    return {model: t.stats() for model, t in transports.items()}
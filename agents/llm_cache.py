@@ -0,0 +1,213 @@
+# agents/llm_cache.py
+"""
+按内容寻址的 LLM 响应缓存（本地磁盘）：
+- key = sha256(model, 绑定的 tool schema, 规范化后的 messages)；
+- 文件按 mtime 做 LRU，总大小超过 LLM_CACHE_MAX_BYTES 时淘汰最久未用的条目；
+- LLM_CACHE_MODE:
+    off     —— 不读不写（默认）
+    record  —— 命中直接返回，未命中调用模型并写入缓存
+    replay  —— 只读，未命中直接抛 LLMCacheMiss，用于离线 / 可复现地跑整张图
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    convert_to_messages,
+    message_to_dict,
+    messages_from_dict,
+)
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from tools import metrics
+from tools.workspace import get_workspace
+
+CACHE_DIR = os.path.abspath(os.getenv("LLM_CACHE_DIR", os.path.join(".cache", "llm")))
+MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+MODES = ("off", "record", "replay")
+
+
+class LLMCacheMiss(RuntimeError):
+    """replay 模式下缓存未命中。"""
+
+
+def cache_mode() -> str:
+    mode = (os.getenv("LLM_CACHE_MODE") or "off").strip().lower()
+    if mode not in MODES:
+        raise ValueError(f"LLM_CACHE_MODE must be one of {MODES}, got {mode!r}")
+    return mode
+
+
+def _canonical_message(m: BaseMessage, workspace: str) -> Dict[str, Any]:
+    """只保留决定模型输出的字段；id / usage / response_metadata 每次都不一样，不参与 key。"""
+    content = m.content
+    if isinstance(content, str) and workspace:
+        # 工具结果里常带当前运行的绝对路径（workspace/runs/<run_id>/...），换成占位符
+        content = content.replace(workspace, "<workspace>")
+    out: Dict[str, Any] = {"type": m.type, "content": content}
+    if isinstance(m, AIMessage) and m.tool_calls:
+        out["tool_calls"] = [
+            {"name": tc["name"], "args": tc.get("args"), "id": tc.get("id")}
+            for tc in m.tool_calls
+        ]
+    for attr in ("tool_call_id", "name"):
+        val = getattr(m, attr, None)
+        if val:
+            out[attr] = val
+    return out
+
+
+def cache_key(model: str, tool_schemas: List[dict], messages: Sequence[BaseMessage]) -> str:
+    workspace = get_workspace()
+    doc = {
+        "model": model,
+        "tools": tool_schemas,
+        "messages": [_canonical_message(m, workspace) for m in messages],
+    }
+    raw = json.dumps(doc, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class DiskLRU:
+    """一个 key 一个 JSON 文件；命中时 touch mtime，超出容量按 mtime 淘汰。"""
+
+    def __init__(self, root: str = CACHE_DIR, max_bytes: int = MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None  # 懒加载：第一次写入时才扫描目录
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key + ".json")
+
+    def get(self, key: str) -> Optional[dict]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            os.utime(path, None)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key: str, data: dict) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        raw = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(raw)
+        try:
+            old = os.path.getsize(path)
+        except OSError:
+            old = 0
+        os.replace(tmp, path)
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += len(raw) - old
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self) -> List[tuple]:
+        out = []
+        for dirpath, _, files in os.walk(self.root):
+            for fn in files:
+                if fn.endswith(".json"):
+                    p = os.path.join(dirpath, fn)
+                    try:
+                        st = os.stat(p)
+                    except OSError:
+                        continue
+                    out.append((st.st_mtime, st.st_size, p))
+        return out
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self) -> None:
+        # 调用方已持有 _lock；淘汰到容量的 90%，避免每次写入都触发扫描
+        target = int(self.max_bytes * 0.9)
+        entries = sorted(self._entries())
+        size = sum(e[1] for e in entries)
+        for _, sz, p in entries:
+            if size <= target:
+                break
+            try:
+                os.remove(p)
+                size -= sz
+            except OSError:
+                pass
+        self._size = size
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "bytes": self._size}
+
+
+_store = DiskLRU()
+
+
+def cache_stats() -> Dict[str, Any]:
+    return {"mode": cache_mode(), **_store.stats()}
+
+
+class CachedChatModel:
+    """
+    包一层 chat model：invoke 先查缓存。其余属性透传给被包的模型。
+    mode 每次调用时读取，方便基准测试 / 离线回放时切换。
+    """
+
+    def __init__(self, inner: Any, model: str, tools: Sequence[Any] = ()):
+        self.inner = inner
+        self.model = model
+        self.tool_schemas = [convert_to_openai_tool(t) for t in tools]
+
+    def invoke(self, input: Any, config: Optional[dict] = None, **kwargs: Any) -> BaseMessage:
+        # 每次调用的耗时 / token 记到 tools/metrics（缓存命中也记，但不计 token）
+        t0 = time.perf_counter()
+        cached = False
+        resp = None
+        try:
+            resp, cached = self._invoke(input, config, **kwargs)
+            return resp
+        finally:
+            metrics.record_llm(self.model, time.perf_counter() - t0, resp, cached=cached, error=resp is None)
+
+    def _invoke(self, input: Any, config: Optional[dict], **kwargs: Any):
+        mode = cache_mode()
+        if mode == "off":
+            return self.inner.invoke(input, config, **kwargs), False
+
+        messages = convert_to_messages([input] if isinstance(input, str) else input)
+        key = cache_key(self.model, self.tool_schemas, messages)
+        hit = _store.get(key)
+        if hit is not None:
+            return messages_from_dict([hit["message"]])[0], True
+        if mode == "replay":
+            raise LLMCacheMiss(f"LLM cache miss in replay mode (key={key[:16]}…)")
+
+        resp = self.inner.invoke(messages, config, **kwargs)
+        _store.put(key, {
+            "model": self.model,
+            "created": time.time(),
+            "message": message_to_dict(resp),
+        })
+        return resp, False
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.inner, name)
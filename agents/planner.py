@@ -0,0 +1,151 @@
+# agents/planner.py
+"""
+planner：把 analyzer 的 spec（pages / assets）拆成互相独立的文件生成任务（task_queue），
+再通过 LangGraph 的 Send 把每个任务分发给并行的 file_worker（map），
+worker 的结果经 done_tasks 的 operator.add reducer 汇总（reduce），最后由 coder 做一次整合。
+所有 worker 共享同一份只读的项目契约（contract）：文件清单、用途、资源路径，保证页面之间链接 / 引用一致。
+"""
+import fnmatch
+import os
+from typing import TypedDict, List, Dict, Any, Union
+
+from langgraph.types import Send
+
+from tools.filesystem import normalize_path
+
+# 是否启用 map-reduce 并行生成；关掉后 planner 不拆任务，直接交给 coder 一次性生成
+MAP_REDUCE = os.getenv("GRAPH_MAP_REDUCE", "1") == "1"
+# 至少拆出这么多个任务才值得并行，否则走原来的单个 coder
+MAP_REDUCE_MIN_ITEMS = int(os.getenv("MAP_REDUCE_MIN_ITEMS", "2"))
+# 最多分发这么多个 worker，页面更多时合并成文件组
+MAP_REDUCE_MAX_ITEMS = int(os.getenv("MAP_REDUCE_MAX_ITEMS", "12"))
+
+_GLOB_CHARS = set("*?[{<")
+
+
+class State(TypedDict, total=False):
+    task: str
+    spec: dict
+    evidence_pack: Dict[str, Any]
+    task_queue: List[dict]
+    contract: Dict[str, Any]
+    workspace: str
+    map_reduce: bool
+
+
+def _entry(item: Any, default_purpose: str) -> Dict[str, str]:
+    if isinstance(item, dict):
+        path = item.get("path") or item.get("file") or item.get("name") or ""
+        purpose = item.get("purpose") or item.get("description") or default_purpose
+    else:
+        path, purpose = str(item), default_purpose
+    path = str(path).strip().replace("\\", "/").lstrip("/")
+    if path.startswith("./"):
+        path = path[2:]
+    if path.startswith("workspace/"):
+        path = path[len("workspace/"):]
+    return {"path": path, "purpose": str(purpose)}
+
+
+def is_pattern(path: str) -> bool:
+    """spec 里的 "categories/*.html" 这类路径代表一组文件，而不是单个文件。"""
+    return any(c in _GLOB_CHARS for c in path)
+
+
+def allows(files: List[str], path: str) -> bool:
+    """work item 的 files（可能含通配）是否覆盖 path。"""
+    # 和 write_file 用同样的规则（./、workspace/ 前缀），否则 "./index.html" 会被误拒
+    path = normalize_path(path).lstrip("/")
+    for f in files:
+        if f == path:
+            return True
+        if is_pattern(f):
+            # "<category>.html" 这种占位写法也当成通配
+            pat = "".join("*" if c in "<>" else c for c in f).replace("**", "*")
+            pat = pat.replace("{", "*").replace("}", "")
+            if fnmatch.fnmatch(path, pat):
+                return True
+    return False
+
+
+def plan_work(spec: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """spec -> work items：每个页面（或页面组）一个，所有 assets 合成一个。"""
+    pages = [_entry(p, "page") for p in (spec.get("pages") or [])]
+    assets = [_entry(a, "shared asset") for a in (spec.get("assets") or [])]
+    pages = [p for p in pages if p["path"]]
+    assets = [a for a in assets if a["path"]]
+
+    items: List[Dict[str, Any]] = []
+    seen = set()
+    for p in pages:
+        if p["path"] in seen:
+            continue
+        seen.add(p["path"])
+        items.append({"id": p["path"], "files": [p["path"]], "purpose": p["purpose"]})
+    asset_paths = [a["path"] for a in assets if a["path"] not in seen]
+    if asset_paths:
+        items.append({
+            "id": "assets",
+            "files": asset_paths,
+            "purpose": "; ".join(f"{a['path']}: {a['purpose']}" for a in assets if a["path"] in asset_paths),
+        })
+
+    # 超过上限时轮转合并成文件组，每个 worker 的上下文仍然有界
+    if len(items) > MAP_REDUCE_MAX_ITEMS > 0:
+        groups: List[Dict[str, Any]] = [
+            {"id": "", "files": [], "purpose": ""} for _ in range(MAP_REDUCE_MAX_ITEMS)
+        ]
+        for i, it in enumerate(items):
+            g = groups[i % MAP_REDUCE_MAX_ITEMS]
+            g["files"] += it["files"]
+            g["purpose"] = (g["purpose"] + "\n" if g["purpose"] else "") + f"{it['id']}: {it['purpose']}"
+        for g in groups:
+            g["id"] = ", ".join(g["files"][:3]) + (" ..." if len(g["files"]) > 3 else "")
+        items = groups
+    return items
+
+
+def build_contract(spec: Dict[str, Any], items: List[Dict[str, Any]], evidence: Dict[str, Any]) -> Dict[str, Any]:
+    """所有 worker 共享的只读项目契约。"""
+    contract: Dict[str, Any] = {
+        "project_name": spec.get("project_name", ""),
+        "files": [
+            {"path": f, "owner": it["id"]} for it in items for f in it["files"]
+        ],
+        "pages": [_entry(p, "page") for p in (spec.get("pages") or [])],
+        "assets": [_entry(a, "shared asset") for a in (spec.get("assets") or [])],
+        "notes": spec.get("notes") or [],
+    }
+    # evidence_pack 可能很长，只带结论性的部分
+    for k in ("notes", "gotchas"):
+        if evidence.get(k):
+            contract[f"research_{k}"] = evidence[k]
+    return contract
+
+
+def planner_node(state: State) -> State:
+    spec = state.get("spec") or {}
+    enabled = state.get("map_reduce", MAP_REDUCE)
+    items = plan_work(spec) if enabled and isinstance(spec, dict) else []
+    if len(items) < max(MAP_REDUCE_MIN_ITEMS, 1):
+        return {"task_queue": []}
+    return {
+        "task_queue": items,
+        "contract": build_contract(spec, items, state.get("evidence_pack") or {}),
+    }
+
+
+def dispatch_work(state: State) -> Union[str, List[Send]]:
+    """planner 之后的路由：有任务就每个任务一个 Send（并行 file_worker），否则直接去 coder。"""
+    items = state.get("task_queue") or []
+    if not items:
+        return "coder"
+    return [
+        Send("file_worker", {
+            "task": state.get("task", ""),
+            "contract": state.get("contract") or {},
+            "work_item": item,
+            "workspace": state.get("workspace"),
+        })
+        for item in items
+    ]
@@ -1,15 +1,12 @@
 # agents/researcher.py
 from typing import TypedDict, Dict, Any
-import json, os
+import json
 
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, ToolMessage
-from dotenv import load_dotenv
+from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
 
+from agents.llm import get_model
 from tools.init import TOOLS_BY_NAME
-
-load_dotenv("properties.env")
-MODEL = os.getenv("OPENAI_MODEL")
+from tools.executor import run_tool_calls
 
 
 class State(TypedDict, total=False):
@@ -32,19 +29,19 @@ def researcher_node(state: State) -> State:
     """
     Research Agent（可选）：
     - 当 state.enable_research 为 True 时：执行简单的 search + fetch 流程，产出 evidence_pack。
-    - 当未启用时：直接返回 state，不做任何事，不影响当前工作流稳定性。
+    - 当未启用时：什么都不做，不影响当前工作流稳定性。
+    - 只返回 evidence_pack：researcher 可能和 analyzer 并行执行（此时拿不到 spec），
+      返回整个 state 会和 analyzer 的更新冲突。
     """
 
     # 1) 默认不开研究
     if not state.get("enable_research", False):
-        if "evidence_pack" not in state:
-            state["evidence_pack"] = {}
-        return state
+        return {"evidence_pack": state.get("evidence_pack") or {}}
 
     task_text = (state.get("task") or "").strip()
     spec = state.get("spec") or {}
 
-    model = ChatOpenAI(model=MODEL).bind_tools(
+    model = get_model(
         [
             TOOLS_BY_NAME["web_search"],
             TOOLS_BY_NAME["web_fetch"],
@@ -84,32 +81,10 @@ If tools are not available or fail, still return a best-effort JSON based on you
                 evidence = json.loads(ai.content)
             except Exception:
                 evidence = {"notes": [ai.content]}
-            state["evidence_pack"] = evidence
-            return state
+            return {"evidence_pack": evidence}
 
         # 有 tool_calls：执行工具，再让模型总结一次
-        for tc in ai.tool_calls:
-            name = tc["name"]
-            args = tc.get("args") or {}
-            tool = TOOLS_BY_NAME.get(name)
-            if not tool:
-                messages.append(ToolMessage(
-                    content=f"ERROR: unknown tool {name}",
-                    tool_call_id=tc["id"],
-                ))
-                continue
-
-            try:
-                out = tool.invoke(args)
-                messages.append(ToolMessage(
-                    content=str(out),
-                    tool_call_id=tc["id"],
-                ))
-            except Exception as e:  # noqa: BLE001
-                messages.append(ToolMessage(
-                    content=f"ERROR: tool failed: {e}",
-                    tool_call_id=tc["id"],
-                ))
+        messages.extend(run_tool_calls(ai.tool_calls, TOOLS_BY_NAME))
 
         # 再让模型汇总一次，产出 evidence_pack JSON
         final = model.invoke(messages)
@@ -117,10 +92,7 @@ If tools are not available or fail, still return a best-effort JSON based on you
             evidence = json.loads(final.content)
         except Exception:
             evidence = {"notes": [final.content]}
-        state["evidence_pack"] = evidence
-        return state
+        return {"evidence_pack": evidence}
 
     # 理论上不会跑到这里，兜底一下
-    if "evidence_pack" not in state:
-        state["evidence_pack"] = {}
-    return state
\ No newline at end of file
+    return {"evidence_pack": state.get("evidence_pack") or {}}
\ No newline at end of file
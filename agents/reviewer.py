@@ -1,10 +1,10 @@
 from typing import TypedDict, List
-import json, os
-from langchain_openai import ChatOpenAI
+import json
+import os
+from agents.llm import get_model
 from tools.init import TOOLS_BY_NAME
-from dotenv import load_dotenv
-load_dotenv("properties.env")
-MODEL = os.getenv("OPENAI_MODEL")
+
+REVIEW_MAX_FILES = int(os.getenv("REVIEW_MAX_FILES", "300"))
 
 class State(TypedDict, total=False):
     task: str
@@ -13,11 +13,16 @@ class State(TypedDict, total=False):
     test_log: str
     tests_passed: bool
     review: str
+    workspace: str
 
 
 def reviewer_node(state: State) -> State:
-    model = ChatOpenAI(model=MODEL)
-    files = TOOLS_BY_NAME["list_dir"].invoke({"path": ""})
+    model = get_model()
+    # 只给 reviewer 看前 REVIEW_MAX_FILES 个文件，大仓库不至于把 prompt 撑爆
+    listing = json.loads(TOOLS_BY_NAME["list_dir"].invoke({"path": "", "limit": REVIEW_MAX_FILES}))
+    files = "\n".join(f"{f['path']} ({f['size']}B)" for f in listing["files"])
+    if listing["next_offset"] is not None:
+        files += f"\n... and {listing['total'] - len(listing['files'])} more files"
     spec_json = json.dumps(state.get("spec", {}), ensure_ascii=False, indent=2)
 
     prompt = f"""
@@ -0,0 +1,334 @@
+# bench/graph_bench.py
+"""
+离线的整图基准测试：用 bench/scripted_model.py 的脚本化模型驱动 build_app()，
+web_fetch 打到本地 HTTP 替身，web_search 用替身 Tavily，完全不联网、结果确定。
+
+每个规模（默认 1 / 20 / 200 个生成文件）在独立的子进程里跑，互不影响（模块级缓存、ru_maxrss 都是进程级的）。
+输出一份 JSON，包含每个规模的：
+- wall_s：每次运行的墙钟时间、中位数、最小值；
+- nodes：每个节点的调用次数和耗时（多次运行取中位数）；
+- tools：每个工具的调用次数、耗时、吞吐（calls/s、bytes/s）；
+- llm：模型调用次数和 token（脚本化模型按字符数估算）；
+- fix_loop：evaluator → coder 修复轮数和这部分花的时间；
+- memory：进程 RSS 峰值（以及可选的 tracemalloc 峰值）。
+
+用法：
+    python -m bench.graph_bench                          # 1 / 20 / 200，各跑 3 次
+    python -m bench.graph_bench --sizes 20 --repeat 5 --llm-latency-ms 200
+    python -m bench.graph_bench --baseline bench/results/graph-xxx.json --max-regression 0.2
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SIZES = "1,20,200"
+
+
+def _configure_env(tmp: str) -> None:
+    """必须在 import 任何项目模块之前调用：这些模块在 import 时读取环境变量。"""
+    os.environ.update({
+        "OPENAI_MODEL": "scripted",
+        "OPENAI_API_KEY": "bench-not-used",
+        "LLM_CACHE_MODE": "off",
+        # 每次运行都要真的走一遍 analyzer / web_search，不吃进程内缓存
+        "ANALYZER_SPEC_TTL_S": "0",
+        "WEB_SEARCH_TTL_S": "0",
+        "WEB_FETCH_CACHE_DIR": os.path.join(tmp, "web_fetch"),
+        "WORKSPACE_ROOT": os.path.join(tmp, "workspace"),
+        "NO_PROXY": "127.0.0.1,localhost",
+    })
+
+
+def _count_files(root: str) -> int:
+    n = 0
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d != ".devagent"]
+        n += len(filenames)
+    return n
+
+
+def _fix_loop_cost(node_ends: List[Dict[str, Any]]) -> float:
+    """第一次 evaluator 结束之后，coder / evaluator 再花的时间就是修复轮的成本。"""
+    cost, seen_eval = 0.0, False
+    for e in node_ends:
+        if seen_eval and e["node"] in ("coder", "evaluator"):
+            cost += e["duration_s"]
+        if e["node"] == "evaluator":
+            seen_eval = True
+    return cost
+
+
+def _run_once(app: Any, size: int, research: bool, trace_memory: bool) -> Dict[str, Any]:
+    from bench.scripted_model import CHECK_FILE
+    from tools import metrics
+    from tools.workspace import create_run_workspace, release_run_workspace
+
+    run_id, workspace = create_run_workspace()
+    state = {
+        "task": f"Benchmark project with {size} generated files",
+        "enable_research": research,
+        "test_targets": [CHECK_FILE],
+        "run_id": run_id,
+        "workspace": workspace,
+    }
+    node_ends: List[Dict[str, Any]] = []
+    final: Dict[str, Any] = {}
+    if trace_memory:
+        tracemalloc.reset_peak()
+    t0 = time.perf_counter()
+    try:
+        with metrics.track_run(run_id) as run_metrics:
+            config = {"configurable": {"workspace": workspace}}
+            for mode, chunk in app.stream(state, config, stream_mode=["custom", "values"]):
+                if mode == "values":
+                    final = chunk
+                elif chunk.get("event") == "node_end":
+                    node_ends.append(chunk)
+    finally:
+        release_run_workspace(run_id)
+    wall = time.perf_counter() - t0
+
+    timings = run_metrics.summary()
+    out = {
+        "wall_s": round(wall, 4),
+        "tests_passed": final.get("tests_passed"),
+        "files_written": _count_files(workspace),
+        "timings": timings,
+        "fix_loop_s": round(_fix_loop_cost(node_ends), 4),
+    }
+    if trace_memory:
+        out["tracemalloc_peak_bytes"] = tracemalloc.get_traced_memory()[1]
+    return out
+
+
+def _median(values: List[float]) -> float:
+    return round(statistics.median(values), 4) if values else 0.0
+
+
+def _aggregate(size: int, runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    walls = [r["wall_s"] for r in runs]
+    last = runs[-1]["timings"]  # 脚本化模型是确定的：调用次数 / token 每次都一样，取最后一次
+
+    nodes = {
+        name: {
+            "calls": stats["calls"],
+            "total_s": _median([r["timings"]["nodes"].get(name, {}).get("total_s", 0.0) for r in runs]),
+            "max_s": _median([r["timings"]["nodes"].get(name, {}).get("max_s", 0.0) for r in runs]),
+        }
+        for name, stats in last["nodes"].items()
+    }
+    tools = {}
+    for name, stats in last["tools"].items():
+        total = _median([r["timings"]["tools"].get(name, {}).get("total_s", 0.0) for r in runs])
+        moved = stats.get("args_bytes", 0) + stats.get("result_bytes", 0)
+        tools[name] = {
+            "calls": stats["calls"],
+            "errors": stats.get("errors", 0),
+            "total_s": total,
+            "calls_per_s": round(stats["calls"] / total, 1) if total else None,
+            "bytes": moved,
+            "bytes_per_s": round(moved / total) if total else None,
+        }
+    llm = {k: last["llm"][k] for k in ("calls", "prompt_tokens", "completion_tokens")}
+    llm["total_s"] = _median([r["timings"]["llm"]["total_s"] for r in runs])
+
+    files = runs[-1]["files_written"]
+    out = {
+        "size": size,
+        "runs": len(runs),
+        "tests_passed": [r["tests_passed"] for r in runs],
+        "files_written": files,
+        "wall_s": {"runs": walls, "median": _median(walls), "min": round(min(walls), 4)},
+        "files_per_s": round(files / _median(walls), 1) if walls and _median(walls) else None,
+        "nodes": nodes,
+        "tools": tools,
+        "llm": llm,
+        "fix_loop": {
+            "iterations": last["fix_iterations"],
+            "cost_s": _median([r["fix_loop_s"] for r in runs]),
+        },
+        # Linux 上 ru_maxrss 单位是 KB；整个子进程（所有重复运行）的峰值
+        "memory": {"max_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024},
+    }
+    if "tracemalloc_peak_bytes" in runs[-1]:
+        out["memory"]["tracemalloc_peak_bytes"] = max(r["tracemalloc_peak_bytes"] for r in runs)
+    return out
+
+
+def run_case(size: int, repeat: int, latency_s: float, fail_first: bool, research: bool,
+             trace_memory: bool, file_bytes: int) -> Dict[str, Any]:
+    tmp = tempfile.mkdtemp(prefix="devagent-bench-")
+    _configure_env(tmp)
+    try:
+        from agents.llm import MODEL, register_base_model
+        from bench.scripted_model import ScriptedChatModel
+        from bench.stubs import DocsServer, StubTavily
+        from graph_app import build_app
+        from tools import web_search
+
+        with DocsServer() as docs:
+            register_base_model(MODEL, ScriptedChatModel(
+                n_files=size,
+                file_bytes=file_bytes,
+                fail_first=fail_first,
+                latency_s=latency_s,
+                docs_url=docs.url,
+            ))
+            web_search._tavily_client = StubTavily(docs.url)
+            app = build_app()
+            if trace_memory:
+                tracemalloc.start()
+            runs = [_run_once(app, size, research, trace_memory) for _ in range(repeat)]
+        return _aggregate(size, runs)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def _git_rev() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+            capture_output=True, text=True, timeout=10,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _child_args(args: argparse.Namespace, size: int) -> List[str]:
+    out = [
+        sys.executable, "-m", "bench.graph_bench", "--child",
+        "--sizes", str(size),
+        "--repeat", str(args.repeat),
+        "--llm-latency-ms", str(args.llm_latency_ms),
+        "--file-bytes", str(args.file_bytes),
+    ]
+    if args.no_fix_loop:
+        out.append("--no-fix-loop")
+    if args.no_research:
+        out.append("--no-research")
+    if args.trace_memory:
+        out.append("--trace-memory")
+    return out
+
+
+def _compare(cases: List[Dict[str, Any]], baseline_path: str, max_regression: float) -> List[str]:
+    """和基线比较 wall_s 中位数，返回超过阈值的回归描述。"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {c["size"]: c for c in json.load(f).get("cases", []) if "wall_s" in c}
+    regressions = []
+    for c in cases:
+        base = baseline.get(c["size"])
+        if not base or "wall_s" not in c:
+            continue
+        old, new = base["wall_s"]["median"], c["wall_s"]["median"]
+        c["baseline_wall_s"] = old
+        c["wall_change"] = round(new / old - 1, 3) if old else None
+        if old and new / old - 1 > max_regression:
+            regressions.append(f"size={c['size']}: wall median {old}s -> {new}s ({(new / old - 1) * 100:+.0f}%)")
+    return regressions
+
+
+def _print_table(cases: List[Dict[str, Any]]) -> None:
+    print(f"{'size':>5} {'files':>6} {'wall(med)':>10} {'files/s':>8} {'llm':>5} {'fix':>4} {'fix_s':>7} {'rss MB':>7}  slowest nodes")
+    for c in cases:
+        if "error" in c:
+            print(f"{c['size']:>5}  ERROR: {c['error'].strip().splitlines()[-1] if c['error'].strip() else '?'}")
+            continue
+        slow = sorted(c["nodes"].items(), key=lambda kv: -kv[1]["total_s"])[:3]
+        print(
+            f"{c['size']:>5} {c['files_written']:>6} {c['wall_s']['median']:>10.3f} {c['files_per_s'] or 0:>8.1f} "
+            f"{c['llm']['calls']:>5} {c['fix_loop']['iterations']:>4} {c['fix_loop']['cost_s']:>7.3f} "
+            f"{c['memory']['max_rss_bytes'] / 1e6:>7.1f}  "
+            + ", ".join(f"{n}={v['total_s']:.3f}s" for n, v in slow)
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="Offline end-to-end benchmark of the agent graph with a scripted model.")
+    p.add_argument("--sizes", default=DEFAULT_SIZES, help="comma-separated numbers of generated files (default 1,20,200)")
+    p.add_argument("--repeat", type=int, default=3, help="runs per size (default 3)")
+    p.add_argument("--llm-latency-ms", type=float, default=0.0, help="simulated latency of each model call")
+    p.add_argument("--file-bytes", type=int, default=2000, help="approximate size of each generated file")
+    p.add_argument("--no-fix-loop", action="store_true", help="write a passing check.py right away (no evaluator -> coder loop)")
+    p.add_argument("--no-research", action="store_true", help="skip the researcher's web_search / web_fetch round")
+    p.add_argument("--trace-memory", action="store_true", help="also record tracemalloc peaks (slows Python down)")
+    p.add_argument("--case-timeout", type=float, default=900.0, help="seconds per size before giving up")
+    p.add_argument("--out", default="", help="result JSON path (default bench/results/graph-<timestamp>.json)")
+    p.add_argument("--baseline", default="", help="earlier result JSON to compare against")
+    p.add_argument("--max-regression", type=float, default=0.2, help="fail if wall median grows more than this fraction")
+    p.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = p.parse_args(argv)
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+
+    if args.child:
+        case = run_case(
+            size=sizes[0],
+            repeat=max(1, args.repeat),
+            latency_s=args.llm_latency_ms / 1000.0,
+            fail_first=not args.no_fix_loop,
+            research=not args.no_research,
+            trace_memory=args.trace_memory,
+            file_bytes=args.file_bytes,
+        )
+        # 最后一行是结果，前面可能有项目代码自己的输出
+        print(json.dumps(case, ensure_ascii=False))
+        return 0
+
+    cases: List[Dict[str, Any]] = []
+    for size in sizes:
+        try:
+            proc = subprocess.run(
+                _child_args(args, size), cwd=REPO_ROOT,
+                capture_output=True, text=True, timeout=args.case_timeout,
+            )
+        except subprocess.TimeoutExpired:
+            cases.append({"size": size, "error": f"timed out after {args.case_timeout}s"})
+            continue
+        lines = proc.stdout.strip().splitlines()
+        if proc.returncode != 0 or not lines:
+            cases.append({"size": size, "error": proc.stderr[-4000:]})
+            continue
+        cases.append(json.loads(lines[-1]))
+
+    result = {
+        "schema": 1,
+        "benchmark": "graph",
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "git_rev": _git_rev(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("child", "out", "baseline")},
+        "cases": cases,
+    }
+    regressions = _compare(cases, args.baseline, args.max_regression) if args.baseline else []
+    if args.baseline:
+        result["baseline"] = args.baseline
+        result["regressions"] = regressions
+
+    out = args.out or os.path.join(REPO_ROOT, "bench", "results", f"graph-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+
+    _print_table(cases)
+    print(f"\nresults: {out}")
+    for r in regressions:
+        print(f"REGRESSION {r}")
+    failed = any("error" in c for c in cases)
+    return 1 if failed or regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
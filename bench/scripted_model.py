@@ -0,0 +1,157 @@
+# bench/scripted_model.py
+"""
+确定性的脚本化 chat model：不联网，按系统提示词认出是哪个 agent 在调用，返回固定的 tool call 序列。
+- analyzer：按 n_files 生成 spec（n_files-2 个页面 + style.css / app.js；n_files<=2 时只有页面）；
+- researcher：一轮 web_search + web_fetch，然后给出 evidence_pack JSON；
+- file_worker：用 write_files 写自己 work item 里的文件；
+- coder：全量模式一次写完所有文件（按 write_files 上限分批），整合模式只补 check.py，
+  修复模式用 edit_file 改 check.py；
+- reviewer：固定的一段文字。
+check.py 是 evaluator 的测试目标；fail_first=True 时第一次写的是会失败的版本，触发一轮 evaluator → coder 修复。
+"""
+import json
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, SystemMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from tools.filesystem import WRITE_FILES_MAX
+
+CHECK_FILE = "check.py"
+_CHECK_FAILING = 'import sys\n\nFAIL = True\n\nif FAIL:\n    sys.exit("check failed: FAIL flag is set")\nprint("ok")\n'
+_CHECK_PASSING = _CHECK_FAILING.replace("FAIL = True", "FAIL = False")
+
+_ITEM_RE = re.compile(r"YOUR WORK ITEM:\n(\{.*?\n\})\n", re.S)
+
+
+def plan_files(n_files: int) -> Dict[str, List[str]]:
+    assets = ["style.css", "app.js"] if n_files > 2 else []
+    n_pages = max(n_files - len(assets), 1)
+    pages = ["index.html"] + [f"pages/p{i:03d}.html" for i in range(1, n_pages)]
+    return {"pages": pages, "assets": assets}
+
+
+def file_content(path: str, pages: List[str], size: int) -> str:
+    """确定性的文件内容，大小约为 size 字节；HTML 之间互相链接，能通过 evaluator 的预检查。"""
+    if path.endswith(".css"):
+        rule = "body { font-family: sans-serif; margin: 0 auto; max-width: 960px; }\n"
+        return rule * max(1, size // len(rule))
+    if path.endswith(".js"):
+        line = "document.querySelectorAll('a').forEach(function (a) { a.rel = 'noopener'; });\n"
+        return line * max(1, size // len(line))
+    links = "".join(f'<li><a href="/{p}">{p}</a></li>' for p in pages[:10])
+    para = f"<p>Generated content for {path}. Lorem ipsum dolor sit amet.</p>\n"
+    body = para * max(1, (size - 300 - len(links)) // len(para))
+    return (
+        "<!DOCTYPE html>\n<html>\n<head><title>" + path + "</title>"
+        '<link rel="stylesheet" href="/style.css"></head>\n<body>\n'
+        f"<nav><ul>{links}</ul></nav>\n<main>\n{body}</main>\n"
+        '<script src="/app.js"></script>\n</body>\n</html>\n'
+    )
+
+
+def _text(m: BaseMessage) -> str:
+    return m.content if isinstance(m.content, str) else json.dumps(m.content, default=str)
+
+
+class ScriptedChatModel(BaseChatModel):
+    n_files: int = 20
+    file_bytes: int = 2000
+    fail_first: bool = True
+    latency_s: float = 0.0
+    docs_url: str = ""
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> "ScriptedChatModel":
+        # 回复是脚本定好的，工具 schema 用不上
+        return self
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        system = next((_text(m) for m in messages if isinstance(m, SystemMessage)), "")
+        after_tools = bool(messages) and isinstance(messages[-1], ToolMessage)
+        prompt = "".join(_text(m) for m in messages)
+
+        content, calls = self._respond(system or prompt, messages, after_tools)
+        ai = AIMessage(
+            content=content,
+            tool_calls=[
+                {"name": name, "args": args, "id": f"call_{len(messages)}_{i}", "type": "tool_call"}
+                for i, (name, args) in enumerate(calls)
+            ],
+            usage_metadata={
+                "input_tokens": len(prompt) // 4,
+                "output_tokens": (len(content) + len(json.dumps([c[1] for c in calls]))) // 4,
+                "total_tokens": (len(prompt) + len(content)) // 4,
+            },
+        )
+        return ChatResult(generations=[ChatGeneration(message=ai)])
+
+    def _respond(self, system: str, messages: List[BaseMessage], after_tools: bool):
+        plan = plan_files(self.n_files)
+        pages = plan["pages"]
+
+        if "Task Analysis Agent" in system:
+            spec = {
+                "project_name": f"bench-{self.n_files}",
+                "pages": [{"path": p, "purpose": f"page {p}"} for p in pages],
+                "assets": plan["assets"],
+                "notes": ["scripted benchmark spec"],
+            }
+            return json.dumps(spec), []
+
+        if "Research Agent" in system:
+            if after_tools:
+                evidence = {
+                    "sources": [{"title": "bench docs", "url": f"{self.docs_url}/docs/0"}],
+                    "notes": ["use relative links"],
+                    "gotchas": ["keep pages small"],
+                    "recommended_examples": [],
+                }
+                return json.dumps(evidence), []
+            return "", [
+                ("web_search", {"query": f"bench project with {self.n_files} files", "max_results": 3}),
+                ("web_fetch", {"url": f"{self.docs_url}/docs/0"}),
+                ("web_fetch", {"url": f"{self.docs_url}/docs/1"}),
+            ]
+
+        if after_tools:
+            # 各个写文件的 agent：工具执行完就结束
+            return "done", []
+
+        if "File Generation Worker" in system:
+            m = _ITEM_RE.search("".join(_text(x) for x in messages))
+            item = json.loads(m.group(1)) if m else {"files": []}
+            files = [{"path": p, "content": file_content(p, pages, self.file_bytes)} for p in item["files"]]
+            return "", [("write_files", {"files": chunk}) for chunk in _chunks(files)]
+
+        if "FIX mode" in system:
+            return "", [("edit_file", {
+                "path": CHECK_FILE,
+                "edits": [{"search": "FAIL = True", "replace": "FAIL = False"}],
+            })]
+
+        check = _CHECK_FAILING if self.fail_first else _CHECK_PASSING
+        if "integration step" in system:
+            return "", [("write_file", {"path": CHECK_FILE, "content": check})]
+
+        if "Code Generation Agent" in system:
+            files = [{"path": p, "content": file_content(p, pages, self.file_bytes)}
+                     for p in pages + plan["assets"]]
+            files.append({"path": CHECK_FILE, "content": check})
+            return "", [("write_files", {"files": chunk}) for chunk in _chunks(files)]
+
+        # reviewer（没有系统消息，直接是一段 prompt）
+        return "Scripted review: structure looks fine; acceptance criteria met for the benchmark.", []
+
+
+def _chunks(files: List[Dict[str, str]]) -> List[List[Dict[str, str]]]:
+    return [files[i:i + WRITE_FILES_MAX] for i in range(0, len(files), WRITE_FILES_MAX)]
@@ -0,0 +1,68 @@
+# bench/stubs.py
+"""
+基准测试用的本地替身：
+- DocsServer：127.0.0.1 上的 HTTP 服务，给 web_fetch 返回确定性的文档页（Cache-Control: no-store，每次都真的走一遍网络栈）；
+- StubTavily：和 TavilyClient.search 同样的返回结构，结果指向 DocsServer。
+"""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict
+
+
+class _DocsHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive，和 web_fetch 的连接池配合
+    doc_bytes = 20000
+
+    def do_GET(self) -> None:
+        line = f"<p>Reference documentation for {self.path}: endpoints, parameters, examples.</p>\n"
+        body = ("<html><body>\n" + line * max(1, self.doc_bytes // len(line)) + "</body></html>\n").encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+
+class DocsServer:
+    def __init__(self, doc_bytes: int = 20000):
+        handler = type("DocsHandler", (_DocsHandler,), {"doc_bytes": doc_bytes})
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="bench-docs", daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "DocsServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class StubTavily:
+    def __init__(self, docs_url: str):
+        self.docs_url = docs_url
+        self.calls = 0
+
+    def search(self, query: str, max_results: int = 5, **kwargs: Any) -> Dict[str, Any]:
+        self.calls += 1
+        return {
+            "query": query,
+            "results": [
+                {
+                    "title": f"Bench doc {i}",
+                    "url": f"{self.docs_url}/docs/{i}",
+                    "content": f"Snippet {i} for {query}",
+                }
+                for i in range(max_results)
+            ],
+        }
@@ -0,0 +1,100 @@
+# checkpoints.py
+"""
+graph 的本地持久化 checkpoint：
+- 用 SQLite（langgraph-checkpoint-sqlite）保存每个节点执行完后的 state，thread_id 就是 run_id；
+- 服务重启 / 运行中途崩溃后，可以从最后一个完成的节点继续（server 的 resume 接口），
+  analyzer 的 spec、researcher 的 evidence_pack、已经跑过的 coder 轮次都不用再花一次钱；
+- 每次 checkpoint 写入都计时，统计放在 /api/stats 里。
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+CHECKPOINTS = os.getenv("CHECKPOINTS", "1") == "1"
+CHECKPOINT_DB = os.getenv("CHECKPOINT_DB", os.path.join(".cache", "checkpoints.sqlite"))
+# sync：节点结束后等 checkpoint 落盘再继续；async：后台写，和下一个节点重叠；exit：只在运行结束时写
+CHECKPOINT_DURABILITY = os.getenv("CHECKPOINT_DURABILITY", "async")
+
+
+class TimedSqliteSaver(SqliteSaver):
+    """SqliteSaver + 写入耗时统计。"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        super().__init__(conn)
+        self._stats_lock = threading.Lock()
+        self._stats = {"puts": 0, "put_s": 0.0, "put_max_s": 0.0, "writes": 0, "writes_s": 0.0}
+
+    def _record(self, kind: str, elapsed: float) -> None:
+        with self._stats_lock:
+            if kind == "put":
+                self._stats["puts"] += 1
+                self._stats["put_s"] += elapsed
+                self._stats["put_max_s"] = max(self._stats["put_max_s"], elapsed)
+            else:
+                self._stats["writes"] += 1
+                self._stats["writes_s"] += elapsed
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        t0 = time.perf_counter()
+        try:
+            return super().put(config, checkpoint, metadata, new_versions)
+        finally:
+            self._record("put", time.perf_counter() - t0)
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        t0 = time.perf_counter()
+        try:
+            return super().put_writes(config, writes, task_id, task_path)
+        finally:
+            self._record("writes", time.perf_counter() - t0)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            s = dict(self._stats)
+        s["put_avg_ms"] = round(s["put_s"] / s["puts"] * 1000, 3) if s["puts"] else 0.0
+        s["put_max_ms"] = round(s.pop("put_max_s") * 1000, 3)
+        s["put_total_s"] = round(s.pop("put_s"), 4)
+        s["writes_total_s"] = round(s.pop("writes_s"), 4)
+        return s
+
+    def thread_ids(self) -> Iterable[str]:
+        self.setup()
+        with self.cursor(transaction=False) as cur:
+            cur.execute("SELECT DISTINCT thread_id FROM checkpoints")
+            return [row[0] for row in cur.fetchall()]
+
+
+def open_checkpointer(path: str = CHECKPOINT_DB) -> TimedSqliteSaver:
+    if path != ":memory:":
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    # 多个 job worker 线程共用一个连接，SqliteSaver 内部有锁
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA synchronous=NORMAL")  # WAL 下足够安全，写入快很多
+    saver = TimedSqliteSaver(conn)
+    saver.setup()
+    return saver
+
+
+def thread_config(run_id: str, workspace: Optional[str] = None) -> Dict[str, Any]:
+    """run 的 config：thread_id 给 checkpointer 用；workspace 给 graph_app._wrap_node 切换工具根目录。"""
+    configurable = {"thread_id": run_id}
+    if workspace:
+        configurable["workspace"] = workspace
+    return {"configurable": configurable}
+
+
+def prune_checkpoints(saver: Optional[TimedSqliteSaver], keep: Iterable[str]) -> int:
+    """删除不在 keep 里的运行的 checkpoint（workspace 已经被清理的运行没法再 resume）。"""
+    if saver is None:
+        return 0
+    keep = set(keep)
+    removed = 0
+    for tid in saver.thread_ids():
+        if tid not in keep:
+            saver.delete_thread(tid)
+            removed += 1
+    return removed
@@ -1,31 +1,60 @@
 # graph_app.py
-from typing import TypedDict, List, Any, Dict
+import functools
+import operator
+import os
+import time
+from typing import TypedDict, List, Any, Dict, Annotated
+from langgraph.config import get_config
 from langgraph.graph import StateGraph, START, END
 
+from tools import metrics, profiling
+from tools.events import emit
+from tools.workspace import use_workspace
+
 from agents.coder import coder_node
 from agents.reviewer import reviewer_node
 from agents.evaluator import evaluator_node
 from agents.analyzer import analyzer_node
 from agents.researcher import researcher_node
+from agents.planner import planner_node, dispatch_work
+from agents.file_worker import file_worker_node
 
 
 class State(TypedDict, total=False):
     task: str
     spec: dict
+    # planner 拆出的文件生成任务；file_worker 并行执行，结果用 operator.add 汇总进 done_tasks
     task_queue: List[dict]
-    done_tasks: List[dict]
+    done_tasks: Annotated[List[dict], operator.add]
+    contract: Dict[str, Any]  # 所有 file_worker 共享的只读项目契约
+    map_reduce: bool          # 是否拆分并行生成（默认 GRAPH_MAP_REDUCE=1）
     test_targets: List[str]   # 例如 ["app.py", "scripts/check_data.py"]
     # evaluator 输出
     tests_passed: bool
     test_log: Any
     # 控制 evaluator→coder 的循环次数
     iter: int
+    # 可选：并行评测配置（默认取 EVAL_* 环境变量）
+    eval_workers: int
+    eval_target_timeout_s: int
+    eval_total_budget_s: int
+    eval_fail_fast: bool
+    eval_force_full: bool    # 忽略变更检测，全部重跑
+    eval_prechecks: bool     # 是否先跑静态预检查（默认 EVAL_PRECHECKS=1）
+    eval_warm_pool: bool     # 用预热解释器池执行目标（默认 EVAL_WARM_POOL=0）
+    precheck: Dict[str, Any]  # 预检查摘要
+    eval_cache: Dict[str, Any]  # evaluator 记录的目标输入指纹 + 结果
     review: str
     # 可选：研究结果
     evidence_pack: Dict[str, Any]
     enable_research: bool  # 研究开关，默认 False
+    # 每次运行独立的 workspace（workspace/runs/<run_id>/），为空时使用 workspace/
+    run_id: str
+    workspace: str
 
 MAX_FIX_ITERS = 2  # 比如最多回 coder 修 2 轮
+# analyzer 与 researcher 并行执行（researcher 拿不到 spec）；设为 0 恢复原来的 analyzer → researcher 串行
+PARALLEL_RESEARCH = os.getenv("GRAPH_PARALLEL_RESEARCH", "1") == "1"
 
 def route_after_evaluator(state: State) -> str:
     """
@@ -33,21 +62,81 @@ def route_after_evaluator(state: State) -> str:
     - 其他情况（True / 没有测试） => 直接去 reviewer
     """
     if state.get("tests_passed") is False and state.get("iter", 0) < MAX_FIX_ITERS:
+        metrics.record_fix_iteration()
         return "coder"
     return "reviewer"
 
-def build_app():
+def _run_workspace(state: State) -> str:
+    """
+    当前运行的 workspace：优先取 config["configurable"]["workspace"]（server 通过 thread_config 传入），
+    它不受节点 State 注解的影响；没有时才退回 state["workspace"]。
+    """
+    try:
+        configurable = get_config().get("configurable") or {}
+    except RuntimeError:  # 不在 graph 运行上下文里（直接调用节点函数）
+        configurable = {}
+    return configurable.get("workspace") or state.get("workspace") or ""
+
+
+def _wrap_node(name: str, node):
+    """
+    - 节点执行期间，所有文件 / shell 工具都落在这次运行的 workspace 下（见 _run_workspace）；
+      functools.wraps 保留了节点自己的 State 注解，langgraph 按它过滤输入，所以不能只靠 state["workspace"]：
+      节点的 State 没声明 workspace 时会被过滤掉，工具就写进共享的默认目录了
+    - 发出 node_start / node_end 事件（带耗时），供流式接口实时展示；
+    - 节点耗时、节点内的 LLM / 工具调用记到 tools/metrics（/metrics 和结果里的 timings）；
+    - 运行开了 profile 时，每个节点单独跑一个 cProfile（tools/profiling）。
+    """
+    @functools.wraps(node)
+    def wrapper(state: State):
+        emit({"event": "node_start", "node": name})
+        t0 = time.perf_counter()
+        error = ""
+        try:
+            with use_workspace(_run_workspace(state)), metrics.node_scope(name), profiling.node_profile(name):
+                return node(state)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            emit({
+                "event": "node_end",
+                "node": name,
+                "duration_s": round(time.perf_counter() - t0, 3),
+                "error": error,
+            })
+    return wrapper
+
+
+def build_app(checkpointer=None, parallel_research: bool = PARALLEL_RESEARCH):
+    """
+    - checkpointer 不为空时，每个节点结束后都会按 thread_id（= run_id）保存 state，可以中断后续跑；
+    - parallel_research=True 时 analyzer 和 researcher 从 START 同时出发，两边都结束后才进 planner。
+    """
     g = StateGraph(State)
 
-    g.add_node("analyzer", analyzer_node)
-    g.add_node("coder", coder_node)
-    g.add_node("evaluator", evaluator_node)
-    g.add_node("researcher", researcher_node)
-    g.add_node("reviewer", reviewer_node)
+    g.add_node("analyzer", _wrap_node("analyzer", analyzer_node))
+    g.add_node("coder", _wrap_node("coder", coder_node))
+    g.add_node("evaluator", _wrap_node("evaluator", evaluator_node))
+    g.add_node("researcher", _wrap_node("researcher", researcher_node))
+    g.add_node("planner", _wrap_node("planner", planner_node))
+    g.add_node("file_worker", _wrap_node("file_worker", file_worker_node))
+    g.add_node("reviewer", _wrap_node("reviewer", reviewer_node))
+
+    if parallel_research:
+        # 两个分支各自只写 spec / evidence_pack，在 coder 前汇合
+        g.add_edge(START, "analyzer")
+        g.add_edge(START, "researcher")
+        g.add_edge(["analyzer", "researcher"], "planner")
+    else:
+        g.add_edge(START, "analyzer")
+        g.add_edge("analyzer", "researcher")  # analyzer 之后进入 researcher
+        g.add_edge("researcher", "planner")  # researcher 再进 planner
 
-    g.add_edge(START, "analyzer")
-    g.add_edge("analyzer", "researcher")  # analyzer 之后进入 researcher
-    g.add_edge("researcher", "coder")  # researcher 再进 coder
+    # planner 按 spec 拆任务：有任务就 Send 给多个并行的 file_worker，全部结束后 coder 做整合；
+    # 拆不出任务（没有 spec / 页面太少 / 关闭 map-reduce）时直接进 coder 一次性生成
+    g.add_conditional_edges("planner", dispatch_work, ["file_worker", "coder"])
+    g.add_edge("file_worker", "coder")
     g.add_edge("coder", "evaluator")
 
     g.add_conditional_edges(
@@ -60,4 +149,4 @@ def build_app():
     )
 
     g.add_edge("reviewer", END)
-    return g.compile()
\ No newline at end of file
+    return g.compile(checkpointer=checkpointer)
\ No newline at end of file
@@ -0,0 +1,134 @@
+# jobs.py
+"""
+异步任务子系统：
+- submit() 立刻返回 job_id，真正的 graph 运行放到固定大小的 worker 池里；
+- 等待队列有上限，满了直接抛 QueueFull，由 server 转成 429，而不是无限堆线程；
+- 已结束的 job 只保留最近 JOB_HISTORY 个，避免常驻进程内存无限增长。
+"""
+import os
+import queue
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "8"))
+JOB_HISTORY = int(os.getenv("JOB_HISTORY", "200"))
+
+
+class QueueFull(Exception):
+    """等待队列已满，调用方应稍后重试。"""
+
+
+class Job:
+    def __init__(
+        self,
+        job_id: str,
+        payload: Dict[str, Any],
+        listener: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ):
+        self.id = job_id
+        self.payload = payload
+        # 可选：运行过程中的进度事件回调（流式接口用）
+        self.listener = listener
+        self.status = "queued"  # queued / running / succeeded / failed
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: str = ""
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.done = threading.Event()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    def __init__(
+        self,
+        runner: Callable[[Job], Dict[str, Any]],
+        workers: int = JOB_WORKERS,
+        queue_size: int = JOB_QUEUE_SIZE,
+        history: int = JOB_HISTORY,
+    ):
+        self._runner = runner
+        self._queue: "queue.Queue[Job]" = queue.Queue(maxsize=queue_size)
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._history = history
+        self._threads = []
+        for i in range(max(1, workers)):
+            t = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def submit(
+        self,
+        payload: Dict[str, Any],
+        job_id: Optional[str] = None,
+        listener: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> Job:
+        job = Job(job_id or uuid.uuid4().hex[:12], payload, listener)
+        with self._lock:
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                raise QueueFull(f"job queue is full ({self._queue.maxsize} pending)")
+            self._jobs[job.id] = job
+            self._trim()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for j in self._jobs.values():
+                counts[j.status] = counts.get(j.status, 0) + 1
+        return {
+            "workers": len(self._threads),
+            "queue_size": self._queue.maxsize,
+            "queued": self._queue.qsize(),
+            "jobs": counts,
+        }
+
+    def _trim(self) -> None:
+        # 只淘汰已结束的旧 job，排队/运行中的一个都不能丢
+        excess = len(self._jobs) - self._history
+        if excess <= 0:
+            return
+        for jid in list(self._jobs):
+            if excess <= 0:
+                break
+            if self._jobs[jid].done.is_set():
+                del self._jobs[jid]
+                excess -= 1
+
+    def _worker(self) -> None:
+        while True:
+            job = self._queue.get()
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                job.result = self._runner(job)
+                job.status = "succeeded"
+            except Exception as e:  # noqa: BLE001
+                job.error = f"{e}\n{traceback.format_exc()}"
+                job.status = "failed"
+            finally:
+                job.finished_at = time.time()
+                job.done.set()
+                self._queue.task_done()
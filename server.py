@@ -1,11 +1,33 @@
 # server.py
+import json
 import os
-from flask import Flask, request, jsonify, render_template_string
-
+import queue
+import time
+from flask import Flask, Response, request, jsonify, render_template_string, send_from_directory, stream_with_context
+from werkzeug.security import safe_join
+
+from agents.analyzer import spec_cache_stats
+from agents.llm import pool_stats
+from agents.llm_cache import cache_stats
+from checkpoints import (
+    CHECKPOINT_DURABILITY,
+    CHECKPOINTS,
+    open_checkpointer,
+    prune_checkpoints,
+    thread_config,
+)
 from graph_app import build_app
+from jobs import Job, JobManager, QueueFull
+from tools import metrics, profiling
+from tools.fsindex import stats as list_dir_stats
+from tools.http_cache import stats as web_fetch_stats
+from tools.web_search import search_stats
+from tools.workspace import create_run_workspace, release_run_workspace, remove_run_workspace, runs_dir
 
 # 构建 LangGraph 应用（全局复用，避免每次请求都重新建图）
-graph_app = build_app()
+# 每个节点结束后把 state 存进 SQLite（thread_id = run_id），中断的运行可以 resume
+checkpointer = open_checkpointer() if CHECKPOINTS else None
+graph_app = build_app(checkpointer)
 
 app = Flask(__name__)
 
@@ -284,6 +306,8 @@ INDEX_HTML = """
       <div class="output-box" id="output-box">
         这里会显示本次任务的评审结果（review）以及简单的测试状态。
       </div>
+
+      <div class="output-box" id="event-log" style="display:none; margin-top:10px; max-height:240px; color:var(--muted);"></div>
     </section>
   </div>
 
@@ -293,12 +317,14 @@ INDEX_HTML = """
     const testsPill = document.getElementById('tests-pill');
     const iterPill = document.getElementById('iter-pill');
     const metaRow = document.getElementById('meta-row');
+    const eventLog = document.getElementById('event-log');
 
     function clearTask() {
       document.getElementById('task-input').value = '';
       statusText.textContent = '空闲';
       outputBox.textContent = '这里会显示本次任务的评审结果（review）以及简单的测试状态。';
       metaRow.style.display = 'none';
+      eventLog.style.display = 'none';
     }
 
     function fillPreset(type) {
@@ -360,6 +386,27 @@ Deliver a complete repo in workspace/.`;
       } 
     }
 
+    function logEvent(text) {
+      eventLog.textContent += text + '\\n';
+      eventLog.scrollTop = eventLog.scrollHeight;
+    }
+
+    function handleEvent(ev) {
+      if (ev.event === 'queued') {
+        statusText.textContent = '排队中…（job ' + ev.job_id + '）';
+        logEvent('job ' + ev.job_id + ' 已提交');
+      } else if (ev.event === 'node_start') {
+        statusText.textContent = '运行中：' + ev.node;
+        logEvent('▶ ' + ev.node);
+      } else if (ev.event === 'node_end') {
+        logEvent('■ ' + ev.node + '  ' + ev.duration_s + 's' + (ev.error ? '  ' + ev.error : ''));
+      } else if (ev.event === 'tool_start') {
+        logEvent('    → ' + ev.tool + ' ' + JSON.stringify(ev.args));
+      } else if (ev.event === 'tool_end') {
+        logEvent('    ← ' + ev.tool + (ev.ok ? '' : ' (失败)') + '  ' + ev.duration_s + 's, ' + ev.bytes + ' bytes');
+      }
+    }
+
     async function runTask() {
   const task = document.getElementById('task-input').value.trim();
   if (!task) {
@@ -373,8 +420,12 @@ Deliver a complete repo in workspace/.`;
   outputBox.textContent = 'Agent 正在执行任务，请稍候…';
   metaRow.style.display = 'none';
 
+  eventLog.style.display = 'block';
+  eventLog.textContent = '';
+  let reviewStarted = false;
+
   try {
-    const resp = await fetch('/api/run_task', {
+    const resp = await fetch('/api/run_task/stream', {
       method: 'POST',
       headers: { 'Content-Type': 'application/json' },
       body: JSON.stringify({ task, enable_research: enableResearch })
@@ -385,7 +436,34 @@ Deliver a complete repo in workspace/.`;
       throw new Error('HTTP ' + resp.status + ': ' + txt);
     }
 
-    const data = await resp.json();
+    // 逐条读取 SSE 事件，实时展示节点 / 工具进度和 reviewer 输出
+    const reader = resp.body.getReader();
+    const decoder = new TextDecoder();
+    let buf = '';
+    let job = null;
+    while (job === null) {
+      const { value, done } = await reader.read();
+      if (done) throw new Error('stream closed before the run finished');
+      buf += decoder.decode(value, { stream: true });
+      let idx;
+      while ((idx = buf.indexOf('\\n\\n')) >= 0) {
+        const chunk = buf.slice(0, idx);
+        buf = buf.slice(idx + 2);
+        const line = chunk.split('\\n').find(l => l.startsWith('data: '));
+        if (!line) continue;
+        const ev = JSON.parse(line.slice(6));
+        if (ev.event === 'done') { job = ev; break; }
+        if (ev.event === 'token') {
+          if (!reviewStarted) { outputBox.textContent = ''; reviewStarted = true; }
+          outputBox.textContent += ev.text;
+          continue;
+        }
+        handleEvent(ev);
+      }
+    }
+    if (job.status !== 'succeeded') throw new Error(job.error || 'job failed');
+
+    const data = job.result || {};
     const passed = data.tests_passed;
     const review = data.review || '(无 review 内容)';
     const iter = data.iter;
@@ -428,31 +506,278 @@ def index():
     return render_template_string(INDEX_HTML)
 
 
-@app.route("/api/run_task", methods=["POST"])
-def run_task():
-    data = request.get_json(silent=True) or {}
+def _build_init_state(data: dict) -> dict:
     task = (data.get("task") or "").strip()
-    if not task:
-        return jsonify({"error": "task is required"}), 400
-
     # 从前端读取 enable_research（可能不存在，默认为 False）
     enable_research = bool(data.get("enable_research"))
-
-    init_state = {
+    state = {
         "task": task,
         # 这里无论 True/False 都可以写上；researcher_node 自己看布尔值。
         "enable_research": enable_research,
     }
-
-    result = graph_app.invoke(init_state)
-
-    return jsonify({
+    # 可选：按请求关闭 / 打开 map-reduce 并行生成（默认看 GRAPH_MAP_REDUCE）
+    if "map_reduce" in data:
+        state["map_reduce"] = bool(data.get("map_reduce"))
+    if _wants_profile(data):
+        state["profile"] = True
+    return state
+
+
+def _wants_profile(data: dict) -> bool:
+    """profile=true：JSON body 或 query string 都行。"""
+    value = data.get("profile", request.args.get("profile"))
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes")
+    return bool(value)
+
+
+def _stream_graph(state, config: dict, listener) -> dict:
+    """用 graph 的流式接口运行，把进度事件转给 listener，返回最终 state。state 为 None 表示从 checkpoint 续跑。"""
+    result: dict = {}
+    stream = graph_app.stream(
+        state,
+        config,
+        stream_mode=["custom", "messages", "values"],
+        durability=CHECKPOINT_DURABILITY,
+    )
+    for mode, chunk in stream:
+        if mode == "values":
+            result = chunk
+        elif mode == "custom":
+            listener(chunk)
+        elif mode == "messages":
+            # 只转发 reviewer 的 token，其余节点的输出主要是 tool call
+            msg, meta = chunk
+            if meta.get("langgraph_node") == "reviewer" and isinstance(msg.content, str) and msg.content:
+                listener({"event": "token", "node": "reviewer", "text": msg.content})
+    return result
+
+
+def _run_job(job: Job) -> dict:
+    # 每个 job 一个独立 workspace，多个运行可以并发而不互相覆盖文件
+    resume = bool(job.payload.get("resume"))
+    # 续跑时目录必须还在（排队期间可能被别的运行的清理删掉），否则直接让 job 失败
+    run_id, workspace = create_run_workspace(job.id, resume=resume)
+    profile = bool(job.payload.get("profile"))
+    if not resume:
+        # workspace 被清理掉的运行没法再续跑，它们的 checkpoint 也一起删掉
+        prune_checkpoints(checkpointer, os.listdir(runs_dir()))
+    # 续跑时输入为 None：langgraph 从该 thread 最后一个完成的节点往下执行
+    # profile 是运行选项，不进 graph state
+    payload = {k: v for k, v in job.payload.items() if k != "profile"}
+    state = None if resume else {**payload, "run_id": run_id, "workspace": workspace}
+    # workspace 放进 config：每个节点都拿得到，不依赖节点 State 里有没有声明 workspace
+    config = thread_config(run_id, workspace)
+    try:
+        # 节点 / LLM / 工具的耗时和 token 记到这次运行上，结束后作为 timings 返回；
+        # profile=true 时再加上每个节点的 cProfile + tracemalloc，产物写到 <workspace>/.devagent/profile/
+        with metrics.track_run(run_id) as run_metrics, profiling.profile_run(workspace, profile) as prof:
+            if job.listener is None:
+                result = graph_app.invoke(state, config, durability=CHECKPOINT_DURABILITY)
+            else:
+                result = _stream_graph(state, config, job.listener)
+    finally:
+        release_run_workspace(run_id)
+    out = {
         "tests_passed": result.get("tests_passed"),
         "review": result.get("review"),
         "iter": result.get("iter"),
+        "run_id": run_id,
+        "workspace": workspace,
+        "timings": run_metrics.summary(),
+    }
+    if resume:
+        out["resumed_from"] = job.payload.get("next", [])
+    if profile:
+        out["profile"] = {
+            "summary": prof,
+            "download": f"/api/jobs/{run_id}/profile/<file>",
+        }
+    return out
+
+
+# graph 运行放到有界 worker 池里，请求线程只负责提交/查询
+jobs = JobManager(_run_job)
+
+
+def _submit(data: dict, listener=None):
+    init_state = _build_init_state(data)
+    if not init_state["task"]:
+        return None, (jsonify({"error": "task is required"}), 400)
+    try:
+        return jobs.submit(init_state, listener=listener), None
+    except QueueFull as e:
+        return None, (jsonify({"error": str(e)}), 429, {"Retry-After": "30"})
+
+
+@app.route("/api/jobs", methods=["POST"])
+def create_job():
+    job, err = _submit(request.get_json(silent=True) or {})
+    if err:
+        return err
+    return jsonify({"job_id": job.id, "status": job.status}), 202
+
+
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "job not found"}), 404
+    return jsonify(job.to_dict())
+
+
+@app.route("/api/jobs/<job_id>/workspace", methods=["DELETE"])
+def delete_job_workspace(job_id):
+    try:
+        removed = remove_run_workspace(job_id)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 409
+    if checkpointer is not None:
+        checkpointer.delete_thread(job_id)
+    if not removed:
+        return jsonify({"error": "workspace not found"}), 404
+    return jsonify({"run_id": job_id, "removed": True})
+
+
+@app.route("/api/jobs/<job_id>/resume", methods=["POST"])
+def resume_job(job_id):
+    """从最后一个完成的节点继续一个中断的运行（进程崩溃 / 重启 / 节点报错）。"""
+    if checkpointer is None:
+        return jsonify({"error": "checkpointing is disabled (CHECKPOINTS=0)"}), 400
+    current = jobs.get(job_id)
+    if current is not None and not current.done.is_set():
+        return jsonify({"error": f"job {job_id} is still {current.status}"}), 409
+    snapshot = graph_app.get_state(thread_config(job_id))
+    if not snapshot.values:
+        return jsonify({"error": "no checkpoint for this job"}), 404
+    if not snapshot.next:
+        return jsonify({"error": "run already finished; nothing to resume"}), 409
+    if not os.path.isdir(os.path.join(runs_dir(), job_id)):
+        return jsonify({"error": "workspace for this job was removed"}), 410
+    payload = {"resume": True, "next": list(snapshot.next)}
+    if _wants_profile(request.get_json(silent=True) or {}):
+        payload["profile"] = True
+    try:
+        job = jobs.submit(payload, job_id=job_id)
+    except QueueFull as e:
+        return jsonify({"error": str(e)}), 429, {"Retry-After": "30"}
+    return jsonify({"job_id": job.id, "status": job.status, "next": list(snapshot.next)}), 202
+
+
+def _profile_dir(job_id: str):
+    run_dir = safe_join(runs_dir(), job_id)
+    path = os.path.join(run_dir, profiling.PROFILE_DIRNAME) if run_dir else None
+    return path if path and os.path.isdir(path) else None
+
+
+@app.route("/api/jobs/<job_id>/profile", methods=["GET"])
+def get_job_profile(job_id):
+    """profile=true 的运行：返回 summary.json 和可下载的文件列表。"""
+    path = _profile_dir(job_id)
+    if path is None or not os.path.isfile(os.path.join(path, "summary.json")):
+        return jsonify({"error": "no profile for this job (run it with profile=true)"}), 404
+    with open(os.path.join(path, "summary.json"), "r", encoding="utf-8") as f:
+        summary = json.load(f)
+    return jsonify({"job_id": job_id, "files": sorted(os.listdir(path)), "summary": summary})
+
+
+@app.route("/api/jobs/<job_id>/profile/<name>", methods=["GET"])
+def download_job_profile(job_id, name):
+    path = _profile_dir(job_id)
+    if path is None:
+        return jsonify({"error": "no profile for this job"}), 404
+    return send_from_directory(path, name, as_attachment=True)
+
+
+@app.route("/api/stats", methods=["GET"])
+def stats():
+    return jsonify({
+        "jobs": jobs.stats(),
+        "llm_pool": pool_stats(),
+        "llm_cache": cache_stats(),
+        "analyzer_spec_cache": spec_cache_stats(),
+        "web_fetch": web_fetch_stats(),
+        "web_search": search_stats(),
+        "list_dir_index": list_dir_stats(),
+        "checkpoints": checkpointer.stats() if checkpointer is not None else None,
     })
 
 
+# job 队列的当前状态在抓取时填进去
+JOBS_QUEUED = metrics.REGISTRY.register(metrics.Gauge("devagent_jobs_queued", "Jobs waiting for a worker."))
+JOBS_BY_STATUS = metrics.REGISTRY.register(metrics.Gauge("devagent_jobs", "Jobs kept in memory by status.", ("status",)))
+
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    """Prometheus 文本格式：节点 / LLM / 工具的耗时直方图、token、费用、修复轮数等。"""
+    s = jobs.stats()
+    JOBS_QUEUED.set(value=s["queued"])
+    for status in ("queued", "running", "succeeded", "failed"):
+        JOBS_BY_STATUS.set(status, value=s["jobs"].get(status, 0))
+    return Response(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def _sse(event: dict) -> str:
+    return "data: " + json.dumps(event, ensure_ascii=False, default=str) + "\n\n"
+
+
+@app.route("/api/run_task/stream", methods=["POST"])
+def run_task_stream():
+    """
+    Server-Sent Events：节点开始/结束（带耗时）、每次工具调用、reviewer 的 token，
+    最后一条是 done（带和 /api/run_task 相同的结果字段）。
+    """
+    events: "queue.Queue[dict]" = queue.Queue()
+    job, err = _submit(request.get_json(silent=True) or {}, listener=events.put)
+    if err:
+        return err
+
+    def generate():
+        yield _sse({"event": "queued", "job_id": job.id})
+        last_sent = time.time()
+        while True:
+            try:
+                yield _sse(events.get(timeout=1))
+                last_sent = time.time()
+                continue
+            except queue.Empty:
+                pass
+            if job.done.is_set() and events.empty():
+                break
+            if time.time() - last_sent > 15:
+                # 注释行当心跳，防止代理断开空闲连接
+                yield ": keep-alive\n\n"
+                last_sent = time.time()
+        yield _sse({
+            "event": "done",
+            "job_id": job.id,
+            "status": job.status,
+            "result": job.result,
+            "error": job.error,
+        })
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/api/run_task", methods=["POST"])
+def run_task():
+    # 兼容旧接口：同样走 worker 池（受队列上限保护），但在请求里等结果
+    job, err = _submit(request.get_json(silent=True) or {})
+    if err:
+        return err
+    job.done.wait()
+    if job.status != "succeeded":
+        return jsonify({"error": job.error}), 500
+    return jsonify(job.result)
+
+
 if __name__ == "__main__":
     # 默认监听 http://127.0.0.1:5001
     app.run(host="127.0.0.1", port=5001, debug=True)
\ No newline at end of file
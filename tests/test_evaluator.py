@@ -0,0 +1,91 @@
+# tests/test_evaluator.py
+import os
+import time
+
+import pytest
+
+from agents.evaluator import _run_targets
+from tools import warm_pool
+from tools.workspace import use_workspace
+
+SLOW = """import os, time
+with open("slow.pid", "w") as f:
+    f.write(str(os.getpid()))
+time.sleep(30)
+open("slow.done", "w").close()
+"""
+FAIL = """import time
+time.sleep(0.5)
+raise SystemExit("boom")
+"""
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # 僵尸进程也算已经结束
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().split(")")[-1].split()[0] != "Z"
+    except OSError:
+        return True
+
+
+@pytest.mark.parametrize("warm", [False, True])
+def test_fail_fast_kills_running_sibling(tmp_path, warm):
+    if warm and not warm_pool.available():
+        pytest.skip("warm pool needs os.fork")
+    (tmp_path / "slow.py").write_text(SLOW)
+    (tmp_path / "fail.py").write_text(FAIL)
+    t0 = time.monotonic()
+    with use_workspace(str(tmp_path)):
+        results = _run_targets(
+            ["slow.py", "fail.py"], workers=2, target_timeout_s=60,
+            total_budget_s=120, fail_fast=True, warm=warm,
+        )
+    assert time.monotonic() - t0 < 15
+    slow, fail = results
+    assert fail["returncode"] == 1
+    assert slow.get("skipped") and slow["reason"] == "cancelled (fail-fast)"
+
+    pid = int((tmp_path / "slow.pid").read_text())
+    deadline = time.monotonic() + 5
+    while _alive(pid) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not _alive(pid)
+    assert not (tmp_path / "slow.done").exists()
+
+
+def test_dynamic_inputs_are_never_reused(tmp_path):
+    from agents.evaluator import evaluator_node
+
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "x.txt").write_text("ok")
+    (tmp_path / "check.py").write_text(
+        "import os\nname = 'x.txt'\n"
+        "assert open(os.path.join('data', name)).read() == 'ok', 'regression'\n"
+    )
+    state = {"test_targets": ["check.py"], "eval_prechecks": False, "workspace": str(tmp_path)}
+    with use_workspace(str(tmp_path)):
+        state = evaluator_node(state)
+        assert state["tests_passed"]
+        # check.py 没变，但它动态读取的数据文件变了：必须重跑而不是复用上一轮的“通过”
+        (tmp_path / "data" / "x.txt").write_text("broken")
+        state = evaluator_node(state)
+    assert not state["tests_passed"]
+    assert not state["test_log"][0].get("reused")
+
+
+def test_cancelled_targets_are_not_cached(tmp_path):
+    from agents.evaluator import evaluator_node
+
+    (tmp_path / "slow.py").write_text("import time\ntime.sleep(30)\n")
+    (tmp_path / "fail.py").write_text(FAIL)
+    state = {"test_targets": ["slow.py", "fail.py"], "eval_prechecks": False, "eval_fail_fast": True,
+             "eval_workers": 2, "workspace": str(tmp_path)}
+    with use_workspace(str(tmp_path)):
+        state = evaluator_node(state)
+    assert state["test_log"][0]["reason"] == "cancelled (fail-fast)"
+    assert "slow.py" not in state["eval_cache"]
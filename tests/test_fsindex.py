@@ -0,0 +1,38 @@
+# tests/test_fsindex.py
+import os
+
+from tools import fsindex
+
+
+def _paths(root):
+    entries, _ = fsindex.get_index(root)
+    return [e.path for e in entries]
+
+
+def test_invalidate_during_scan_is_not_overwritten(tmp_path, monkeypatch):
+    root = str(tmp_path)
+    (tmp_path / "a.txt").write_text("a")
+    real_scan = fsindex._scan
+
+    def racing_scan(r, *args, **kwargs):
+        res = real_scan(r, *args, **kwargs)
+        # 扫描结束、存入缓存之前，另一个线程写了文件并 invalidate
+        (tmp_path / "b.txt").write_text("b")
+        fsindex.invalidate(root)
+        return res
+
+    monkeypatch.setattr(fsindex, "_scan", racing_scan)
+    assert _paths(root) == ["a.txt"]  # 这次扫描本身是旧的
+    monkeypatch.setattr(fsindex, "_scan", real_scan)
+    # 旧结果不能进缓存，下一次必须重新扫到 b.txt
+    assert _paths(root) == ["a.txt", "b.txt"]
+
+
+def test_cache_hit_without_invalidate(tmp_path):
+    root = str(tmp_path)
+    (tmp_path / "a.txt").write_text("a")
+    assert _paths(root) == ["a.txt"]
+    os.remove(tmp_path / "a.txt")
+    assert _paths(root) == ["a.txt"]  # 没 invalidate，用缓存
+    fsindex.invalidate(root)
+    assert _paths(root) == []
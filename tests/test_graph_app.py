@@ -0,0 +1,40 @@
+# tests/test_graph_app.py
+import json
+from typing import TypedDict
+
+from langgraph.graph import END, START, StateGraph
+
+from checkpoints import thread_config
+from graph_app import _wrap_node
+from tools.init import TOOLS_BY_NAME
+
+
+class _NoWorkspaceState(TypedDict, total=False):
+    note: str  # 故意不声明 workspace
+
+
+def _writer(state: _NoWorkspaceState) -> _NoWorkspaceState:
+    out = json.loads(TOOLS_BY_NAME["write_file"].invoke({"path": "out.txt", "content": "hi"}))
+    return {"note": out["path"]}
+
+
+class _GraphState(TypedDict, total=False):
+    note: str
+    workspace: str
+
+
+def test_node_without_workspace_in_state_writes_under_run_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("WORKSPACE_ROOT", str(tmp_path / "shared"))
+    run_dir = tmp_path / "shared" / "runs" / "r1"
+    run_dir.mkdir(parents=True)
+
+    g = StateGraph(_GraphState)
+    g.add_node("writer", _wrap_node("writer", _writer))
+    g.add_edge(START, "writer")
+    g.add_edge("writer", END)
+    app = g.compile()
+
+    result = app.invoke({"workspace": str(run_dir)}, thread_config("r1", str(run_dir)))
+    assert result["note"] == str(run_dir / "out.txt")
+    assert (run_dir / "out.txt").read_text() == "hi"
+    assert not (tmp_path / "shared" / "out.txt").exists()
@@ -0,0 +1,75 @@
+# tests/test_http_cache.py
+import gzip
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from tools import http_cache
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    big = b"x" * (1024 * 1024)
+    hits = {}
+
+    def do_GET(self):
+        n = self.hits[self.path] = self.hits.get(self.path, 0) + 1
+        if self.path == "/big":
+            self._send(200, self.big, {"Cache-Control": "max-age=600"})
+        elif self.path == "/big.gz":
+            self._send(200, gzip.compress(self.big), {"Content-Encoding": "gzip"})
+        elif self.path == "/etag":
+            if n == 1:
+                # 没有 Cache-Control，Expires 已经过期：每次都要重新验证
+                self._send(200, b"v1", {"ETag": '"a"', "Expires": "Thu, 01 Jan 1970 00:00:00 GMT"})
+            else:
+                # 304 带回新的有效期和 ETag
+                self._send(304, b"", {"ETag": '"b"', "Cache-Control": "max-age=600"})
+
+    def _send(self, status, body, headers):
+        self.send_response(status)
+        for k, v in headers.items():
+            self.send_header(k, v)
+        if status != 304:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    monkeypatch.setattr(http_cache, "CACHE_DIR", str(tmp_path / "cache"))
+    _Handler.hits = {}
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{srv.server_address[1]}"
+    srv.shutdown()
+    srv.server_close()
+
+
+@pytest.mark.parametrize("path", ["/big", "/big.gz"])
+def test_max_bytes_bounds_the_download(server, path):
+    before = http_cache.stats()["bytes_downloaded"]
+    resp = http_cache.cached_get(server + path, 5, max_bytes=10000)
+    assert len(resp.body) == 10000
+    assert not resp.complete
+    assert http_cache.stats()["bytes_downloaded"] - before <= 10000
+    # 不完整的响应不进缓存
+    assert http_cache._load(server + path) is None
+
+
+def test_304_refreshes_all_validators(server):
+    url = server + "/etag"
+    assert http_cache.cached_get(url, 5).body == b"v1"
+    resp = http_cache.cached_get(url, 5)  # 已过期：条件请求，拿到 304
+    assert resp.body == b"v1"
+    meta, _ = http_cache._load(url)
+    assert meta["headers"]["etag"] == '"b"'
+    assert meta["headers"]["cache-control"] == "max-age=600"
+    # 旧条目里没有 Cache-Control，也要按 304 给的 max-age 变成新鲜的：不再发请求
+    http_cache.cached_get(url, 5)
+    assert _Handler.hits["/etag"] == 2
@@ -0,0 +1,21 @@
+# tests/test_llm_cache.py
+from langchain_core.messages import AIMessage, HumanMessage, message_to_dict
+
+from agents import llm_cache
+
+
+def test_replay_works_without_api_key(tmp_path, monkeypatch):
+    from agents.llm import get_model
+
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    monkeypatch.setenv("LLM_CACHE_MODE", "replay")
+    store = llm_cache.DiskLRU(root=str(tmp_path))
+    monkeypatch.setattr(llm_cache, "_store", store)
+
+    messages = [HumanMessage(content="hello")]
+    key = llm_cache.cache_key("replay-test-model", [], messages)
+    store.put(key, {"model": "replay-test-model", "created": 0,
+                    "message": message_to_dict(AIMessage(content="recorded"))})
+
+    model = get_model(model="replay-test-model")
+    assert model.invoke(messages).content == "recorded"
@@ -0,0 +1,87 @@
+# tests/test_llm_usage.py
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TypedDict
+
+import pytest
+from langchain_core.messages import HumanMessage
+from langgraph.graph import END, StateGraph
+
+from tools import metrics
+
+
+class _FakeOpenAI(BaseHTTPRequestHandler):
+    """最小的 /chat/completions：stream=True 时发 SSE，只有请求里带 stream_options.include_usage 才发 usage 块。"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        base = {"id": "x", "created": 0, "model": body["model"]}
+        usage = {"prompt_tokens": 11, "completion_tokens": 7, "total_tokens": 18}
+        if not body.get("stream"):
+            out = json.dumps({**base, "object": "chat.completion", "usage": usage, "choices": [
+                {"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "hi"}}]})
+            self._send("application/json", out.encode())
+            return
+        chunks = [
+            {**base, "object": "chat.completion.chunk", "choices": [
+                {"index": 0, "delta": {"role": "assistant", "content": "hi"}, "finish_reason": None}]},
+            {**base, "object": "chat.completion.chunk", "choices": [
+                {"index": 0, "delta": {}, "finish_reason": "stop"}]},
+        ]
+        if (body.get("stream_options") or {}).get("include_usage"):
+            chunks.append({**base, "object": "chat.completion.chunk", "choices": [], "usage": usage})
+        sse = "".join(f"data: {json.dumps(c)}\n\n" for c in chunks) + "data: [DONE]\n\n"
+        self._send("text/event-stream", sse.encode())
+
+    def _send(self, ctype, data):
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeOpenAI)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv("OPENAI_BASE_URL", f"http://127.0.0.1:{server.server_address[1]}/v1")
+    monkeypatch.setenv("LLM_CACHE_MODE", "off")
+    yield
+    server.shutdown()
+    server.server_close()
+
+
+class _S(TypedDict, total=False):
+    answer: str
+
+
+def test_token_usage_recorded_under_messages_streaming(fake_openai):
+    from agents.llm import get_model
+
+    model = get_model(model="usage-test-model")
+
+    def node(state: _S) -> _S:
+        return {"answer": model.invoke([HumanMessage(content="hello")]).content}
+
+    g = StateGraph(_S)
+    g.add_node("ask", node)
+    g.set_entry_point("ask")
+    g.add_edge("ask", END)
+    app = g.compile()
+
+    with metrics.track_run("usage-test") as run:
+        # 和 server._stream_graph 一样用 messages 模式：ChatOpenAI 在节点里会走流式接口
+        modes = [mode for mode, _ in app.stream({}, stream_mode=["messages", "values"])]
+    assert "messages" in modes
+    llm = run.summary()["llm"]
+    assert llm["calls"] == 1
+    assert llm["prompt_tokens"] == 11
+    assert llm["completion_tokens"] == 7
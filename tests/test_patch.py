@@ -0,0 +1,25 @@
+# tests/test_patch.py
+import pytest
+
+from tools.patch import PatchConflict, apply_unified_diff
+
+
+def test_crlf_patch_with_empty_context_line():
+    text = "a\r\n\r\nb\r\n"
+    # git diff 对 CRLF 文件的输出：每行带 \r，空上下文行可能只剩一个 \r
+    patch = "--- a/x\r\n+++ b/x\r\n@@ -1,3 +1,3 @@\r\n a\r\n\r\n-b\r\n+c\r\n"
+    assert apply_unified_diff(text, patch) == "a\r\n\r\nc\r\n"
+    # 补丁本身是 LF、只有内容行带 \r 时结果一样
+    patch = "@@ -1,3 +1,3 @@\n a\r\n\r\n-b\r\n+c\r\n"
+    assert apply_unified_diff(text, patch) == "a\r\n\r\nc\r\n"
+
+
+def test_form_feed_stays_inside_line():
+    text = "a\x0cb\nc\n"
+    patch = "@@ -1,2 +1,2 @@\n-a\x0cb\n+x\n c\n"
+    assert apply_unified_diff(text, patch) == "x\nc\n"
+
+
+def test_invalid_line_still_rejected():
+    with pytest.raises(PatchConflict):
+        apply_unified_diff("a\n", "@@ -1,1 +1,1 @@\n*a\n")
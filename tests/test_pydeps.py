@@ -0,0 +1,34 @@
+# tests/test_pydeps.py
+from tools.pydeps import scan_inputs
+
+
+def _scan(tmp_path, files):
+    for name, src in files.items():
+        (tmp_path / name).write_text(src)
+    inputs, dynamic = scan_inputs(str(tmp_path / "main.py"), str(tmp_path))
+    return sorted(p[len(str(tmp_path)) + 1:] for p in inputs), dynamic
+
+
+def test_static_inputs_are_complete(tmp_path):
+    inputs, dynamic = _scan(tmp_path, {
+        "main.py": "import json\nimport helper\nwith open('data.json') as f:\n    json.load(f)\n",
+        "helper.py": "X = 1\n",
+        "data.json": "{}",
+    })
+    assert inputs == ["data.json", "helper.py", "main.py"]
+    assert dynamic == []
+
+
+def test_dynamic_path_marks_incomplete(tmp_path):
+    _, dynamic = _scan(tmp_path, {
+        "main.py": "import os\nDIR = 'data'\nopen(os.path.join(DIR, 'x.txt')).read()\n",
+    })
+    assert dynamic == ["main.py:3: open() with a non-literal path"]
+
+
+def test_dynamic_io_in_local_import_marks_incomplete(tmp_path):
+    _, dynamic = _scan(tmp_path, {
+        "main.py": "import loader\n",
+        "loader.py": "import glob, importlib\nfiles = glob.glob('*.csv')\nm = importlib.import_module('x')\n",
+    })
+    assert dynamic == ["loader.py:2: glob()", "loader.py:3: import_module()"]
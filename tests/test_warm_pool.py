@@ -0,0 +1,56 @@
+# tests/test_warm_pool.py
+import pytest
+
+from agents.evaluator import _run_target
+from tools import warm_pool
+from tools.workspace import use_workspace
+
+pytestmark = pytest.mark.skipif(not warm_pool.available(), reason="warm pool needs os.fork")
+
+
+@pytest.fixture
+def pool():
+    p = warm_pool.WarmPool(1)
+    yield p
+    p.close()
+
+
+def test_exit_matches_python_script(tmp_path, pool):
+    (tmp_path / "t.py").write_text(
+        "import atexit, pickle, threading, time\n"
+        "class Point:\n"
+        "    pass\n"
+        "atexit.register(lambda: print('atexit ran'))\n"
+        "def late():\n"
+        "    time.sleep(0.3)\n"
+        "    print('thread done')\n"
+        "threading.Thread(target=late).start()\n"
+        "out = open('unflushed.txt', 'w')\n"
+        "out.write('kept')\n"
+        "print(type(pickle.loads(pickle.dumps(Point()))).__name__)\n"
+    )
+    res = pool.run("t.py", str(tmp_path), 10)
+    assert res["returncode"] == 0, res["output"]
+    assert res["output"].splitlines() == ["Point", "thread done", "atexit ran"]
+    assert (tmp_path / "unflushed.txt").read_text() == "kept"
+
+
+def test_local_module_shadowing_falls_back(tmp_path, pool):
+    (tmp_path / "csv.py").write_text("VALUE = 'local'\n")
+    (tmp_path / "t.py").write_text("import csv\nprint(csv.VALUE)\n")
+    with pytest.raises(warm_pool.WarmPoolUnavailable):
+        pool.run("t.py", str(tmp_path), 10)
+    # evaluator 退回普通子进程，行为和 `python t.py` 一致
+    with use_workspace(str(tmp_path)):
+        res = _run_target("t.py", 10, warm=True, workers=1)
+    assert res.get("runner") != "warm"
+    assert res["returncode"] == 0 and res["output"].strip() == "local"
+
+
+def test_acquire_times_out_instead_of_blocking(pool):
+    z = pool._acquire()
+    try:
+        with pytest.raises(warm_pool.WarmPoolUnavailable):
+            pool._acquire(timeout_s=0.3)
+    finally:
+        pool._release(z)
@@ -0,0 +1,46 @@
+# tests/test_workspace.py
+import os
+import time
+
+import pytest
+
+from tools import workspace
+
+
+@pytest.fixture
+def root(tmp_path, monkeypatch):
+    monkeypatch.setenv("WORKSPACE_ROOT", str(tmp_path))
+    return tmp_path
+
+
+def _old_run(root, run_id):
+    path = root / "runs" / run_id
+    path.mkdir(parents=True)
+    (path / "index.html").write_text("<html></html>")
+    old = time.time() - 30 * 24 * 3600  # 早就超过保留时长
+    os.utime(path, (old, old))
+    return path
+
+
+def test_resume_old_run_is_not_pruned(root):
+    path = _old_run(root, "oldrun")
+    run_id, ws = workspace.create_run_workspace("oldrun", resume=True)
+    try:
+        assert ws == str(path)
+        assert (path / "index.html").read_text() == "<html></html>"
+    finally:
+        workspace.release_run_workspace(run_id)
+
+
+def test_new_run_still_prunes_old_runs(root):
+    path = _old_run(root, "oldrun")
+    run_id, _ = workspace.create_run_workspace("newrun")
+    workspace.release_run_workspace(run_id)
+    assert not path.exists()
+
+
+def test_resume_missing_workspace_fails(root):
+    with pytest.raises(FileNotFoundError):
+        workspace.create_run_workspace("gone", resume=True)
+    assert "gone" not in workspace._active_runs
+    assert not (root / "runs" / "gone").exists()
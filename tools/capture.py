@@ -0,0 +1,176 @@
+# tools/capture.py
+"""
+子进程输出的有界捕获（只依赖标准库，warm_worker 也直接加载它）：
+- HeadTail：增量喂字节，只保留开头 head 字节 + 最后 tail 字节，同时统计总字节数，可选把完整输出落盘（可限制大小）；
+- run_captured：起一个独立进程组的 shell 命令，边读边截取，超时杀整个进程组并返回已拿到的部分输出。
+输出再多，内存占用也只有 head + tail。
+"""
+import os
+import signal
+import subprocess
+import threading
+from typing import Any, Callable, Dict, Optional
+
+_CHUNK = 65536
+
+
+class HeadTail:
+    def __init__(self, head: int, tail: int, spill_path: Optional[str] = None, spill_max: int = 0):
+        self.head_limit = max(0, head)
+        self.tail_limit = max(0, tail)
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total = 0
+        self.spill_path = spill_path
+        # 落盘上限（字节，0 = 不限）；超出的部分直接丢掉，spill_cut 记下日志不完整
+        self.spill_max = max(0, spill_max)
+        self.spilled = 0
+        self.spill_cut = False
+        self._spill = None
+        if spill_path:
+            os.makedirs(os.path.dirname(spill_path), exist_ok=True)
+            self._spill = open(spill_path, "wb")
+
+    def feed(self, chunk: bytes) -> None:
+        if not chunk:
+            return
+        self.total += len(chunk)
+        if self._spill is not None:
+            part = chunk
+            if self.spill_max:
+                part = chunk[:max(0, self.spill_max - self.spilled)]
+                if len(part) < len(chunk):
+                    self.spill_cut = True
+            if part:
+                self._spill.write(part)
+                self.spilled += len(part)
+        room = self.head_limit - len(self.head)
+        if room > 0:
+            self.head += chunk[:room]
+            chunk = chunk[room:]
+        if chunk and self.tail_limit:
+            self.tail += chunk
+            if len(self.tail) > self.tail_limit:
+                del self.tail[:len(self.tail) - self.tail_limit]
+
+    @property
+    def truncated(self) -> bool:
+        return self.total > len(self.head) + len(self.tail)
+
+    def text(self) -> str:
+        head = self.head.decode("utf-8", errors="replace")
+        tail = self.tail.decode("utf-8", errors="replace")
+        if not self.truncated:
+            return head + tail
+        omitted = self.total - len(self.head) - len(self.tail)
+        return f"{head}\n... [{omitted} bytes omitted] ...\n{tail}"
+
+    def close(self) -> Optional[str]:
+        """关闭落盘文件；没被截断时完整内容已经在 text() 里了，删掉文件。返回保留下来的文件路径。"""
+        if self._spill is None:
+            return None
+        self._spill.close()
+        self._spill = None
+        if not self.truncated:
+            try:
+                os.remove(self.spill_path)
+            except OSError:
+                pass
+            return None
+        return self.spill_path
+
+
+def kill_process_group(pid: int) -> None:
+    """杀掉以 pid 为组长的整个进程组；组还没建好（子进程还没 setsid）时退回只杀 pid。"""
+    try:
+        os.killpg(pid, signal.SIGKILL)
+        return
+    except (ProcessLookupError, PermissionError, OSError):
+        pass
+    try:
+        os.kill(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError, OSError):
+        pass
+
+
+def _kill_group(p: subprocess.Popen) -> None:
+    if hasattr(os, "killpg"):
+        kill_process_group(p.pid)
+        return
+    try:
+        p.kill()
+    except (ProcessLookupError, PermissionError, OSError):
+        pass
+
+
+def run_captured(
+    cmd: str,
+    cwd: str,
+    timeout_s: float,
+    head: int,
+    tail: int,
+    spill_path: Optional[str] = None,
+    spill_max: int = 0,
+    on_start: Optional[Callable[[int], None]] = None,
+) -> Dict[str, Any]:
+    """
+    执行 shell 命令（stderr 合并进 stdout），返回
+    {returncode, output, output_bytes, truncated, timed_out[, log_path, log_truncated]}；超时 returncode 为 None。
+    on_start(pid) 在进程启动后调用，pid 同时是进程组号，调用方可以拿它提前杀掉整组（见 kill_process_group）。
+    """
+    buf = HeadTail(head, tail, spill_path, spill_max)
+    p = subprocess.Popen(
+        cmd,
+        cwd=cwd,
+        shell=True,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        start_new_session=True,  # 独立进程组，超时可以连同孙进程一起杀掉
+    )
+    if on_start is not None:
+        on_start(p.pid)
+
+    lock = threading.Lock()
+    detached = []  # 非空表示调用方已经不再等输出
+
+    def pump() -> None:
+        while True:
+            chunk = p.stdout.read1(_CHUNK)
+            if not chunk:
+                break
+            with lock:
+                if detached:
+                    break
+                buf.feed(chunk)
+
+    reader = threading.Thread(target=pump, name="run-shell-capture", daemon=True)
+    reader.start()
+    timed_out = False
+    try:
+        p.wait(timeout=timeout_s)
+    except subprocess.TimeoutExpired:
+        timed_out = True
+        _kill_group(p)
+        p.wait()
+    # 脱离进程组的后台进程可能还拿着管道；最多再等一会儿，不让它拖住调用方
+    reader.join(timeout=5)
+    with lock:
+        detached.append(True)
+    if not reader.is_alive():
+        p.stdout.close()
+
+    out: Dict[str, Any] = {
+        "returncode": None if timed_out else p.returncode,
+        "output": buf.text(),
+        "output_bytes": buf.total,
+        "truncated": buf.truncated,
+    }
+    if timed_out:
+        out["timed_out"] = True
+    log_path = buf.close()
+    if log_path:
+        out["log_path"] = log_path
+        if buf.spill_cut:
+            out["log_truncated"] = True
+    return out
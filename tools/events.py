@@ -0,0 +1,34 @@
+# tools/events.py
+"""
+运行过程中的进度事件（节点开始 / 结束、工具调用等）。
+通过 LangGraph 的 custom stream writer 发出：graph_app.stream(..., stream_mode="custom") 时
+调用方能实时收到；普通 invoke 或不在图里调用时是 no-op。
+"""
+import time
+from typing import Any, Dict
+
+from langgraph.config import get_stream_writer
+
+# 事件里参数的最大长度，避免把整份文件内容塞进事件流
+_MAX_ARG_CHARS = 200
+
+
+def emit(event: Dict[str, Any]) -> None:
+    try:
+        writer = get_stream_writer()
+    except RuntimeError:
+        # 不在 graph 运行上下文里（例如单独调用工具）
+        return
+    writer({**event, "ts": time.time()})
+
+
+def summarize_args(args: Dict[str, Any]) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    for k, v in (args or {}).items():
+        if isinstance(v, str) and len(v) > _MAX_ARG_CHARS:
+            out[k] = f"<{len(v)} chars>"
+        elif isinstance(v, (list, dict)):
+            out[k] = f"<{type(v).__name__} of {len(v)}>"
+        else:
+            out[k] = v
+    return out
@@ -0,0 +1,130 @@
+# tools/executor.py
+import contextvars
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_core.messages import ToolMessage
+
+from tools import metrics, profiling
+from tools.events import emit, summarize_args
+
+# 单轮工具调用的最大并发数（网络请求占大头，线程池足够）
+MAX_TOOL_WORKERS = int(os.getenv("TOOL_MAX_WORKERS", "8"))
+
+# 返回 ToolMessage 表示“不用执行，直接用这个结果”；返回 None 表示正常执行
+PrecheckFn = Callable[[dict], Optional[ToolMessage]]
+
+
+def _call_paths(tc: dict) -> List[str]:
+    """同一个 path 上的调用必须按顺序执行（例如先 write 再 read）；write_files 涉及它的每个文件。"""
+    args = tc.get("args") or {}
+    paths = [args.get("path")]
+    files = args.get("files")
+    if isinstance(files, list):
+        paths += [f.get("path") for f in files if isinstance(f, dict)]
+    return [p for p in paths if isinstance(p, str) and p]
+
+
+def _invoke_one(tc: dict, tools_by_name: Dict[str, Any]) -> ToolMessage:
+    name = tc["name"]
+    args = tc.get("args") or {}
+    tool = tools_by_name.get(name)
+    if not tool:
+        return ToolMessage(content=f"ERROR: unknown tool {name}", tool_call_id=tc["id"])
+
+    emit({"event": "tool_start", "tool": name, "id": tc["id"], "args": summarize_args(args)})
+    t0 = time.perf_counter()
+    try:
+        out = tool.invoke(args)
+        msg = ToolMessage(content=str(out), tool_call_id=tc["id"])
+        ok = True
+    except Exception as e:  # noqa: BLE001
+        msg = ToolMessage(content=f"ERROR: tool failed: {e}", tool_call_id=tc["id"])
+        ok = False
+    dur = time.perf_counter() - t0
+    metrics.record_tool(
+        name, dur, ok,
+        args_bytes=len(json.dumps(args, ensure_ascii=False, default=str).encode("utf-8")),
+        result_bytes=len(msg.content.encode("utf-8")),
+    )
+    emit({
+        "event": "tool_end",
+        "tool": name,
+        "id": tc["id"],
+        "ok": ok,
+        "duration_s": round(dur, 3),
+        "bytes": len(msg.content),
+    })
+    return msg
+
+
+def run_tool_calls(
+    tool_calls: List[dict],
+    tools_by_name: Dict[str, Any],
+    precheck: Optional[PrecheckFn] = None,
+    max_workers: int = MAX_TOOL_WORKERS,
+) -> List[ToolMessage]:
+    """
+    并发执行一轮 AIMessage.tool_calls，返回与 tool_calls 顺序一致的 ToolMessage 列表。
+
+    - precheck 在主线程里按原始顺序串行执行，适合做 `written` 去重这类有状态的检查，
+      因此不需要给调用方的 set 加锁；
+    - 触及同一个 path 的调用被串成一条链，按原始顺序执行；互不相关的调用并行；
+    - 每个任务在提交时复制 contextvars，保证 tracing / 运行上下文在线程内可见。
+    """
+    results: List[Optional[ToolMessage]] = [None] * len(tool_calls)
+
+    # 1) 串行预检查，并按 path 分组成链
+    chains: List[List[int]] = []
+    chain_by_path: Dict[str, List[int]] = {}
+    for i, tc in enumerate(tool_calls):
+        if precheck is not None:
+            early = precheck(tc)
+            if early is not None:
+                results[i] = early
+                continue
+        paths = _call_paths(tc)
+        # 一个调用可能同时涉及多条已有的链（write_files），把它们合并成一条，保持原始顺序
+        found: List[List[int]] = []
+        for p in paths:
+            c = chain_by_path.get(p)
+            if c is not None and not any(c is f for f in found):
+                found.append(c)
+        if not found:
+            chain: List[int] = []
+            chains.append(chain)
+        else:
+            chain = found[0]
+            for other in found[1:]:
+                chain.extend(other)
+                chains[:] = [c for c in chains if c is not other]
+                for k, v in chain_by_path.items():
+                    if v is other:
+                        chain_by_path[k] = chain
+            chain.sort()
+        chain.append(i)
+        for p in paths:
+            chain_by_path[p] = chain
+
+    def run_chain(idxs: List[int]) -> None:
+        for i in idxs:
+            results[i] = _invoke_one(tool_calls[i], tools_by_name)
+
+    # 2) 只有一条链时没必要起线程
+    if len(chains) <= 1 or max_workers <= 1:
+        for chain in chains:
+            run_chain(chain)
+    else:
+        workers = min(max_workers, len(chains))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tool") as pool:
+            futures = [
+                pool.submit(contextvars.copy_context().run, profiling.in_thread(run_chain), chain)
+                for chain in chains
+            ]
+            for f in futures:
+                f.result()
+
+    return [r for r in results if r is not None]
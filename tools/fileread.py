@@ -0,0 +1,123 @@
+# tools/fileread.py
+"""
+read_file 的分段读取逻辑：
+- 按字节 (offset/length) 或按行 (start_line/end_line) 取一段，单次最多 max_bytes；
+- 超过 READ_FILE_MMAP_THRESHOLD 的大文件用 mmap 切片，只把需要的那段读进内存；
+- 结果没到文件末尾时追加截断标记（总大小 + 下一段的 offset），模型可以接着翻页；
+- 二进制文件不解码，只返回类型 / 大小 / 开头几个字节的摘要。
+"""
+import codecs
+import mimetypes
+import mmap
+import os
+from typing import Optional, Union
+
+READ_FILE_MAX_BYTES = int(os.getenv("READ_FILE_MAX_BYTES", str(64 * 1024)))
+READ_FILE_MMAP_THRESHOLD = int(os.getenv("READ_FILE_MMAP_THRESHOLD", str(1024 * 1024)))
+
+_SNIFF_BYTES = 8192
+# 除了 \t \n \r \f \b \x1b 以外的控制字符
+_CONTROL = bytes(b for b in range(32) if b not in (8, 9, 10, 12, 13, 27))
+
+Buffer = Union[bytes, mmap.mmap]
+
+
+def is_binary(sniff: bytes) -> bool:
+    if not sniff:
+        return False
+    if b"\x00" in sniff:
+        return True
+    try:
+        # final=False：末尾被切断的多字节字符不算错
+        codecs.getincrementaldecoder("utf-8")().decode(sniff, final=False)
+        return False
+    except UnicodeDecodeError:
+        pass
+    # 不是 UTF-8 的文本（例如 latin-1）也照常返回；控制字符多才当成二进制
+    return len(sniff.translate(None, _CONTROL)) < len(sniff) * 0.9
+
+
+def _binary_summary(path: str, size: int, sniff: bytes) -> str:
+    kind = mimetypes.guess_type(path)[0] or "unknown type"
+    return (
+        f"[binary file: {path}, {size} bytes, {kind}; not decoded. "
+        f"first bytes: {sniff[:32].hex(' ')}]"
+    )
+
+
+def _line_start(buf: Buffer, line: int) -> int:
+    """第 line 行（从 1 开始）的起始字节；超过行数时返回文件大小。"""
+    pos = 0
+    for _ in range(line - 1):
+        i = buf.find(b"\n", pos)
+        if i < 0:
+            return len(buf)
+        pos = i + 1
+    return pos
+
+
+def _char_start(buf: Buffer, pos: int) -> int:
+    """pos 落在多字节 UTF-8 字符中间时往后挪到下一个字符开头。"""
+    end = min(len(buf), pos + 3)
+    while pos < end and (buf[pos] & 0xC0) == 0x80:
+        pos += 1
+    return pos
+
+
+def read_range(
+    abs_path: str,
+    rel_path: str,
+    offset: Optional[int] = None,
+    length: Optional[int] = None,
+    start_line: Optional[int] = None,
+    end_line: Optional[int] = None,
+    max_bytes: int = READ_FILE_MAX_BYTES,
+) -> str:
+    max_bytes = max(1, min(max_bytes, READ_FILE_MAX_BYTES))
+    size = os.path.getsize(abs_path)
+    if size == 0:
+        return ""
+    with open(abs_path, "rb") as f:
+        if size > READ_FILE_MMAP_THRESHOLD:
+            buf: Buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            buf = f.read()
+        try:
+            sniff = bytes(buf[:_SNIFF_BYTES])
+            if is_binary(sniff):
+                return _binary_summary(rel_path, size, sniff)
+
+            if start_line is not None or end_line is not None:
+                start = _line_start(buf, start_line or 1)
+                end = _line_start(buf, end_line + 1) if end_line is not None else size
+                if start >= size:
+                    return f"[{rel_path} has fewer than {start_line} lines; {size} bytes total]"
+            else:
+                start = _char_start(buf, min(offset or 0, size))
+                end = size if length is None else min(size, start + length)
+
+            stop = min(end, start + max_bytes)
+            chunk = bytes(buf[start:stop])
+        finally:
+            if isinstance(buf, mmap.mmap):
+                buf.close()
+
+    if stop < end:
+        # 别把最后一个字符切成两半：退到完整字符的边界，下一段从这里接着读
+        i = len(chunk) - 1
+        while i > 0 and len(chunk) - i < 4 and (chunk[i] & 0xC0) == 0x80:
+            i -= 1
+        lead = chunk[i]
+        need = 2 if lead < 0xE0 else 3 if lead < 0xF0 else 4
+        if lead >= 0xC0 and len(chunk) - i < need and i > 0:
+            stop -= len(chunk) - i
+            chunk = chunk[:i]
+
+    text = chunk.decode("utf-8", errors="replace")
+    if stop < size:
+        label = "truncated" if stop < end else "end of range"
+        text += (
+            f"\n... [{label}: showed bytes {start}-{stop} of {size}; "
+            f"call read_file with offset={stop} to continue]"
+        )
+    return text
@@ -1,8 +1,48 @@
+import hashlib
+import json
 import os
-from typing import List
+import stat
+import tempfile
+from typing import Any, List, Optional
 from pydantic import BaseModel, Field
 from langchain.tools import tool
 
+from tools import fsindex
+from tools.fileread import READ_FILE_MAX_BYTES, read_range
+from tools.patch import apply_search_replace, apply_unified_diff
+from tools.workspace import file_sha256, get_workspace, resolve
+
+# 新建文件的权限按进程 umask 来（mkstemp 默认是 0600）；在导入时读一次，os.umask 不是线程安全的
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+WRITE_FILES_MAX = 50
+
+
+def _atomic_write(abs_path: str, data: bytes) -> bool:
+    """
+    写入 abs_path：内容哈希没变就什么都不做（mtime 不变，下游的变更检测不会误判），
+    否则先写同目录临时文件再 os.replace，中途失败不会留下半截文件。返回是否真的改了。
+    """
+    try:
+        st = os.stat(abs_path)
+    except FileNotFoundError:
+        st = None
+    if st is not None and st.st_size == len(data) and file_sha256(abs_path) == hashlib.sha256(data).hexdigest():
+        return False
+
+    os.makedirs(os.path.dirname(abs_path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(abs_path), prefix=".write-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp, stat.S_IMODE(st.st_mode) if st is not None else 0o666 & ~_UMASK)
+        os.replace(tmp, abs_path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return True
+
 
 class WriteFileArgs(BaseModel):
     path: str = Field(description="File path relative to workspace/, e.g. 'src/app.py' or 'index.html'")
@@ -11,61 +51,213 @@ class WriteFileArgs(BaseModel):
 
 @tool(args_schema=WriteFileArgs)
 def write_file(path: str, content: str) -> str:
-    """Write content to workspace/<path> and return the absolute path."""
-    base = os.path.abspath("workspace")
-    path = _normalize_path(path)
-    abs_path = os.path.abspath(os.path.join(base, path))
-    if not abs_path.startswith(base):
-        raise ValueError("Refuse to write outside workspace/")
+    """Write content to workspace/<path>.
+    Returns JSON with path, changed (false if the file already had exactly this content) and bytes.
+    """
+    path = normalize_path(path)
+    abs_path = resolve(path, "write")
 
-    os.makedirs(os.path.dirname(abs_path), exist_ok=True)
-    with open(abs_path, "w", encoding="utf-8") as f:
-        f.write(content)
-    return abs_path
+    data = content.encode("utf-8")
+    changed = _atomic_write(abs_path, data)
+    if changed:
+        fsindex.invalidate(get_workspace())
+    return json.dumps({"path": abs_path, "changed": changed, "bytes": len(data)}, ensure_ascii=False)
+
+
+class FileContent(BaseModel):
+    path: str = Field(description="File path relative to workspace/")
+    content: str = Field(description="Full file content to write")
+
+
+class WriteFilesArgs(BaseModel):
+    files: List[FileContent] = Field(
+        description=f"Files to create/overwrite in one call (at most {WRITE_FILES_MAX})",
+        min_length=1,
+        max_length=WRITE_FILES_MAX,
+    )
+
+
+@tool(args_schema=WriteFilesArgs)
+def write_files(files: List[Any]) -> str:
+    """Write several files under workspace/ in one call (each one like write_file).
+    Returns JSON with one {path, changed, bytes} or {path, error} entry per file, in order.
+    """
+    results = []
+    any_changed = False
+    for item in files:
+        if isinstance(item, dict):
+            path, content = item.get("path", ""), item.get("content")
+        else:
+            path, content = item.path, item.content
+        rel = normalize_path(path)
+        try:
+            if content is None:
+                raise ValueError("missing content")
+            abs_path = resolve(rel, "write")
+            data = content.encode("utf-8")
+            changed = _atomic_write(abs_path, data)
+        except Exception as e:  # noqa: BLE001
+            # 单个文件失败不影响其他文件，错误按文件报告给模型
+            results.append({"path": rel, "error": f"{type(e).__name__}: {e}"})
+            continue
+        any_changed = any_changed or changed
+        results.append({"path": abs_path, "changed": changed, "bytes": len(data)})
+    if any_changed:
+        fsindex.invalidate(get_workspace())
+    return json.dumps({"results": results}, ensure_ascii=False)
 
 
 class ReadFileArgs(BaseModel):
     path: str = Field(description="File path relative to workspace/")
+    offset: Optional[int] = Field(default=None, ge=0, description="Start at this byte offset")
+    length: Optional[int] = Field(default=None, ge=1, description="Read at most this many bytes from offset")
+    start_line: Optional[int] = Field(default=None, ge=1, description="First line to return (1-based)")
+    end_line: Optional[int] = Field(default=None, ge=1, description="Last line to return (inclusive)")
+    max_bytes: int = Field(
+        default=READ_FILE_MAX_BYTES,
+        ge=1,
+        le=READ_FILE_MAX_BYTES,
+        description="Hard cap on returned bytes",
+    )
 
 
 @tool(args_schema=ReadFileArgs)
-def read_file(path: str) -> str:
-    """Read workspace/<path> and return content."""
-    base = os.path.abspath("workspace")
-    path = _normalize_path(path)
-    abs_path = os.path.abspath(os.path.join(base, path))
-    if not abs_path.startswith(base):
-        raise ValueError("Refuse to read outside workspace/")
+def read_file(
+    path: str,
+    offset: Optional[int] = None,
+    length: Optional[int] = None,
+    start_line: Optional[int] = None,
+    end_line: Optional[int] = None,
+    max_bytes: int = READ_FILE_MAX_BYTES,
+) -> str:
+    """Read workspace/<path> and return content.
+    Large files are cut at max_bytes with a marker giving the total size and the offset to continue from;
+    pass offset/length (bytes) or start_line/end_line to read a specific part.
+    Binary files are summarized instead of decoded.
+    """
+    path = normalize_path(path)
+    abs_path = resolve(path, "read")
 
-    with open(abs_path, "r", encoding="utf-8") as f:
-        return f.read()
+    return read_range(
+        abs_path,
+        path,
+        offset=offset,
+        length=length,
+        start_line=start_line,
+        end_line=end_line,
+        max_bytes=max_bytes,
+    )
 
 
 class ListDirArgs(BaseModel):
     path: str = Field(default="", description="Directory path relative to workspace/")
+    pattern: str = Field(
+        default="",
+        description="Optional glob filter relative to path, e.g. '*.py' (any depth) or 'src/**/*.js'",
+    )
+    max_depth: Optional[int] = Field(
+        default=None, ge=1, description="Only list files at most this many levels below path (1 = direct children)"
+    )
+    ignore: List[str] = Field(
+        default_factory=list,
+        description="Extra .gitignore-style patterns to exclude, e.g. ['data/', '*.min.js']",
+    )
+    offset: int = Field(default=0, ge=0, description="Skip this many matching files (for paging)")
+    limit: int = Field(default=200, ge=1, le=2000, description="Return at most this many files")
 
 
 @tool(args_schema=ListDirArgs)
-def list_dir(path: str = "") -> List[str]:
-    """List files under workspace/<path>."""
-    base = os.path.abspath("workspace")
-    path = _normalize_path(path)
-    abs_dir = os.path.abspath(os.path.join(base, path))
-    if not abs_dir.startswith(base):
-        raise ValueError("Refuse to list outside workspace/")
-
-    if not os.path.exists(abs_dir):
-        return []
-    out = []
-    for root, _, files in os.walk(abs_dir):
-        for fn in files:
-            full = os.path.join(root, fn)
-            out.append(os.path.relpath(full, base))
-    return sorted(out)
+def list_dir(
+    path: str = "",
+    pattern: str = "",
+    max_depth: Optional[int] = None,
+    ignore: Optional[List[str]] = None,
+    offset: int = 0,
+    limit: int = 200,
+) -> str:
+    """List files under workspace/<path> (recursively, sorted; .gitignore'd and vendored dirs skipped).
+    Returns JSON with total, offset, next_offset (null when done) and files: [{path, size, mtime}].
+    Use pattern / max_depth / ignore to narrow the listing and offset to page through large trees.
+    """
+    base = get_workspace()
+    path = normalize_path(path).strip("/")
+    abs_dir = resolve(path, "list")
+
+    if not os.path.isdir(abs_dir):
+        return json.dumps({"total": 0, "offset": 0, "next_offset": None, "files": []})
+    subdir = os.path.relpath(abs_dir, base).replace(os.sep, "/")
+    res = fsindex.query(
+        base,
+        subdir="" if subdir == "." else subdir,
+        pattern=pattern,
+        max_depth=max_depth,
+        ignore=ignore or [],
+        offset=offset,
+        limit=limit,
+    )
+    return json.dumps(res, ensure_ascii=False)
+
+class EditBlock(BaseModel):
+    search: str = Field(description="Exact text currently in the file (must match exactly once; include enough context)")
+    replace: str = Field(description="Text to put in its place")
+
+
+class EditFileArgs(BaseModel):
+    path: str = Field(description="Existing file path relative to workspace/")
+    edits: List[EditBlock] = Field(
+        default_factory=list,
+        description="Search/replace blocks, applied in order",
+    )
+    patch: str = Field(
+        default="",
+        description="Alternatively, a unified diff for this file (hunks starting with '@@ -a,b +c,d @@')",
+    )
+
+
+@tool(args_schema=EditFileArgs)
+def edit_file(path: str, edits: Optional[List[Any]] = None, patch: str = "") -> str:
+    """Edit an existing workspace/<path> in place with search/replace blocks or a unified diff.
+    All edits are verified first and applied atomically (all or nothing); on a mismatch
+    nothing is written and the error says which block failed and what the file contains there.
+    Prefer this over write_file for small changes to existing files.
+    """
+    path = normalize_path(path)
+    abs_path = resolve(path, "edit")
+    if not os.path.isfile(abs_path):
+        raise ValueError(f"{path} does not exist; use write_file to create it")
+    if not edits and not patch:
+        raise ValueError("edit_file needs 'edits' or 'patch'")
+
+    with open(abs_path, "r", encoding="utf-8", newline="") as f:
+        original = f.read()
+
+    blocks = []
+    for e in edits or []:
+        if isinstance(e, dict):
+            blocks.append((e.get("search", ""), e.get("replace", "")))
+        else:
+            blocks.append((e.search, e.replace))
+    text = original
+    if blocks:
+        text = apply_search_replace(text, blocks)
+    if patch:
+        text = apply_unified_diff(text, patch)
+
+    changed = text != original
+    if changed:
+        _atomic_write(abs_path, text.encode("utf-8"))
+        fsindex.invalidate(get_workspace())
+    return json.dumps({
+        "path": abs_path,
+        "applied": len(blocks) + (1 if patch else 0),
+        "changed": changed,
+    }, ensure_ascii=False)
+
 
 import os
 
-def _normalize_path(path: str) -> str:
+def normalize_path(path: str) -> str:
+    """所有写/读工具共用的路径规范化；planner.allows 也用它，保证检查的和实际写的是同一个路径。"""
     p = path.replace("\\", "/").strip()
     # 去掉 ./ 前缀
     if p.startswith("./"):
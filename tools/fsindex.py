@@ -0,0 +1,251 @@
+# tools/fsindex.py
+"""
+list_dir 用的 workspace 文件索引：
+- 用 os.scandir 递归扫一遍，记录 (相对路径, 大小, mtime, 深度)，按根目录缓存；
+- 扫描时跳过 SKIP_DIRS、默认根目录下的 runs/，以及根目录 .gitignore 里的规则；
+- 同一次运行里重复 list_dir 直接查缓存；write_file / edit_file / run_shell 之后调用 invalidate() 让它重建。
+glob / 忽略规则都按 .gitignore 的写法解释：不含 "/" 的模式匹配任意层级的文件名，含 "/" 的相对根目录匹配，支持 ** 和 "!" 取反。
+"""
+import os
+import re
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from tools.workspace import SKIP_DIRS, default_root
+
+# 兜底：即使漏了 invalidate（例如外部进程改了文件），缓存最多用这么久
+INDEX_TTL_S = float(os.getenv("LIST_DIR_INDEX_TTL_S", "60"))
+# 单个 workspace 最多索引这么多文件，防止巨型目录把内存吃满
+INDEX_MAX_FILES = int(os.getenv("LIST_DIR_INDEX_MAX_FILES", "200000"))
+
+
+class Entry(NamedTuple):
+    path: str  # 相对根目录，统一用 "/"
+    size: int
+    mtime: float
+    depth: int  # 根目录下的文件为 1
+
+
+def _glob_to_regex(pat: str) -> str:
+    out = []
+    i, n = 0, len(pat)
+    while i < n:
+        c = pat[i]
+        if pat.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pat.startswith("/**", i) and i + 3 == n:
+            out.append("(?:/.*)?")
+            i += 3
+        elif pat.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif c == "*":
+            out.append("[^/]*")
+            i += 1
+        elif c == "?":
+            out.append("[^/]")
+            i += 1
+        elif c == "[":
+            j = pat.find("]", i + 1)
+            if j < 0:
+                out.append(re.escape(c))
+                i += 1
+            else:
+                body = pat[i + 1:j]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append("[" + body.replace("\\", "\\\\") + "]")
+                i = j + 1
+        else:
+            out.append(re.escape(c))
+            i += 1
+    return "".join(out)
+
+
+class PathMatcher:
+    """一组 .gitignore 风格的规则，后面的规则覆盖前面的。"""
+
+    def __init__(self, patterns: Sequence[str]):
+        self.rules: List[Tuple["re.Pattern[str]", bool, bool]] = []
+        for raw in patterns:
+            pat = raw.strip()
+            if not pat or pat.startswith("#"):
+                continue
+            negate = pat.startswith("!")
+            if negate:
+                pat = pat[1:]
+            dir_only = pat.endswith("/")
+            pat = pat.rstrip("/")
+            if not pat:
+                continue
+            anchored = "/" in pat
+            pat = pat.lstrip("/")
+            prefix = "" if anchored else "(?:.*/)?"
+            self.rules.append((re.compile(f"^{prefix}{_glob_to_regex(pat)}$"), negate, dir_only))
+
+    def __bool__(self) -> bool:
+        return bool(self.rules)
+
+    def match(self, rel: str, is_dir: bool) -> bool:
+        hit = False
+        for rx, negate, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if rx.match(rel):
+                hit = not negate
+        return hit
+
+    def match_any_parent(self, rel: str) -> bool:
+        """rel 本身或它的任一上级目录被忽略。"""
+        parts = rel.split("/")
+        for k in range(1, len(parts)):
+            if self.match("/".join(parts[:k]), True):
+                return True
+        return self.match(rel, False)
+
+
+def _read_gitignore(root: str) -> List[str]:
+    try:
+        with open(os.path.join(root, ".gitignore"), "r", encoding="utf-8", errors="replace") as f:
+            return f.read().splitlines()
+    except OSError:
+        return []
+
+
+def _scan(root: str) -> Tuple[List[Entry], bool]:
+    ignore = PathMatcher(_read_gitignore(root))
+    skip_runs = root == default_root()
+    entries: List[Entry] = []
+    stack = [("", 1)]
+    capped = False
+    while stack and not capped:
+        rel_dir, depth = stack.pop()
+        try:
+            it = os.scandir(os.path.join(root, rel_dir) if rel_dir else root)
+        except OSError:
+            continue
+        with it:
+            for de in it:
+                rel = f"{rel_dir}/{de.name}" if rel_dir else de.name
+                try:
+                    is_dir = de.is_dir(follow_symlinks=False)
+                except OSError:
+                    continue
+                if is_dir:
+                    if de.name in SKIP_DIRS or (skip_runs and rel == "runs"):
+                        continue
+                    if ignore and ignore.match(rel, True):
+                        continue
+                    stack.append((rel, depth + 1))
+                    continue
+                if ignore and ignore.match(rel, False):
+                    continue
+                try:
+                    st = de.stat()
+                except OSError:
+                    continue
+                entries.append(Entry(rel, st.st_size, st.st_mtime, depth))
+                if len(entries) >= INDEX_MAX_FILES:
+                    capped = True
+                    break
+    entries.sort()
+    return entries, capped
+
+
+_lock = threading.Lock()
+# root -> (构建时间, 条目, 是否因为上限被截断)
+_cache: Dict[str, Tuple[float, List[Entry], bool]] = {}
+# root -> 代数：invalidate() 时 +1。扫描前记下代数，扫完发现变了就不存（扫描期间有文件被写过，结果可能是旧的）
+_gens: Dict[str, int] = {}
+_stats = {"builds": 0, "hits": 0, "invalidations": 0}
+
+
+def _related(a: str, b: str) -> bool:
+    return a == b or a.startswith(b + os.sep) or b.startswith(a + os.sep)
+
+
+def get_index(root: str) -> Tuple[List[Entry], bool]:
+    root = os.path.abspath(root)
+    now = time.monotonic()
+    with _lock:
+        cached = _cache.get(root)
+        if cached and now - cached[0] < INDEX_TTL_S:
+            _stats["hits"] += 1
+            return cached[1], cached[2]
+        gen = _gens.setdefault(root, 0)
+    entries, capped = _scan(root)
+    with _lock:
+        _stats["builds"] += 1
+        if _gens.get(root) == gen:
+            _cache[root] = (now, entries, capped)
+    return entries, capped
+
+
+def invalidate(root: Optional[str] = None) -> None:
+    """丢掉 root 的索引（root 为空时全部丢掉）。root 下的子目录 / 上级目录的索引也一并丢掉。"""
+    with _lock:
+        _stats["invalidations"] += 1
+        if root is None:
+            _cache.clear()
+            for key in _gens:
+                _gens[key] += 1
+            return
+        root = os.path.abspath(root)
+        for key in list(_cache):
+            if _related(key, root):
+                del _cache[key]
+        for key in _gens:
+            if _related(key, root):
+                _gens[key] += 1
+
+
+def stats() -> Dict[str, int]:
+    with _lock:
+        return dict(_stats, roots=len(_cache))
+
+
+def query(
+    root: str,
+    subdir: str = "",
+    pattern: str = "",
+    max_depth: Optional[int] = None,
+    ignore: Sequence[str] = (),
+    offset: int = 0,
+    limit: int = 200,
+) -> Dict[str, object]:
+    """按子目录 / glob / 深度 / 忽略规则过滤索引并分页；路径相对 root。"""
+    entries, capped = get_index(root)
+    subdir = subdir.strip("/")
+    prefix = subdir + "/" if subdir else ""
+    base_depth = subdir.count("/") + 1 if subdir else 0
+    glob = PathMatcher([pattern]) if pattern else None
+    extra = PathMatcher(ignore) if ignore else None
+
+    matched: List[Entry] = []
+    for e in entries:
+        if prefix and not e.path.startswith(prefix):
+            continue
+        rel = e.path[len(prefix):]
+        if max_depth is not None and e.depth - base_depth > max_depth:
+            continue
+        if glob is not None and not glob.match(rel, False):
+            continue
+        if extra is not None and extra.match_any_parent(rel):
+            continue
+        matched.append(e)
+
+    offset = max(0, offset)
+    page = matched[offset:offset + limit]
+    next_offset = offset + len(page)
+    return {
+        "total": len(matched),
+        "offset": offset,
+        "next_offset": next_offset if next_offset < len(matched) else None,
+        "index_capped": capped,
+        "files": [
+            {"path": e.path, "size": e.size, "mtime": round(e.mtime, 3)}
+            for e in page
+        ],
+    }
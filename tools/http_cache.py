@@ -0,0 +1,384 @@
+# tools/http_cache.py
+"""
+web_fetch 用的 HTTP 层：
+- 每个 (scheme, host, port) 一个 keep-alive 连接池（http.client），避免每次重新握手；
+- 磁盘响应缓存，遵守 Cache-Control(max-age / no-cache / no-store)、ETag、Last-Modified，
+  过期后发 If-None-Match / If-Modified-Since 做条件请求，304 直接复用缓存内容；
+- 请求带 Accept-Encoding: gzip, deflate，并在这里解压；
+- 命中 / 未命中 / 重新验证 / 节省字节数等计数见 stats()。
+配置了 HTTP(S) 代理的 URL 退回 urllib.request（连接池不生效，缓存仍然生效）。
+"""
+import email.utils
+import hashlib
+import http.client
+import json
+import os
+import ssl
+import tempfile
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.error import HTTPError, URLError
+from urllib.parse import urljoin, urlsplit
+from urllib.request import Request, getproxies, proxy_bypass, urlopen
+
+CACHE_DIR = os.path.abspath(os.getenv("WEB_FETCH_CACHE_DIR", os.path.join(".cache", "web_fetch")))
+# 响应没有给出 max-age / Expires 时使用的缓存时间；0 表示每次都重新验证
+DEFAULT_TTL_S = int(os.getenv("WEB_FETCH_TTL_S", "600"))
+# 为了能缓存 / 复用连接，需要读完整个 body；超过这个大小就不缓存、也不复用连接
+MAX_BODY_BYTES = int(os.getenv("WEB_FETCH_MAX_BODY_BYTES", str(5 * 1024 * 1024)))
+POOL_MAX_PER_HOST = int(os.getenv("WEB_FETCH_POOL_PER_HOST", "4"))
+POOL_IDLE_S = float(os.getenv("WEB_FETCH_POOL_IDLE_S", "30"))
+MAX_REDIRECTS = 5
+
+USER_AGENT = "devAgent-web-fetch/1.0 (+https://example.local)"
+_REDIRECTS = {301, 302, 303, 307, 308}
+
+
+class Response:
+    def __init__(self, url: str, status: int, reason: str, headers: Dict[str, str], body: bytes,
+                 complete: bool = True):
+        self.url = url
+        self.status = status
+        self.reason = reason
+        self.headers = headers  # key 全部小写
+        self.body = body  # 已解压
+        self.complete = complete  # body 是否完整（压缩前或解压后超过读取上限时为 False）
+
+
+# ---------- 统计 ----------
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, int] = {
+    "requests": 0,
+    "hits": 0,
+    "misses": 0,
+    "revalidated": 0,
+    "bytes_saved": 0,
+    "bytes_downloaded": 0,
+    "connections_opened": 0,
+    "connections_reused": 0,
+}
+
+
+def _count(**kw: int) -> None:
+    with _stats_lock:
+        for k, v in kw.items():
+            _stats[k] += v
+
+
+def stats() -> Dict[str, Any]:
+    with _stats_lock:
+        out: Dict[str, Any] = dict(_stats)
+    lookups = out["hits"] + out["revalidated"] + out["misses"]
+    out["hit_rate"] = round((out["hits"] + out["revalidated"]) / lookups, 3) if lookups else None
+    return out
+
+
+# ---------- keep-alive 连接池 ----------
+
+class _ConnectionPool:
+    def __init__(self, max_per_host: int = POOL_MAX_PER_HOST, idle_s: float = POOL_IDLE_S):
+        self.max_per_host = max_per_host
+        self.idle_s = idle_s
+        self._lock = threading.Lock()
+        self._idle: Dict[Tuple[str, str, int], List[Tuple[float, http.client.HTTPConnection]]] = {}
+        self._ssl = ssl.create_default_context()
+
+    def acquire(self, key: Tuple[str, str, int], timeout: float) -> Tuple[http.client.HTTPConnection, bool]:
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._idle.get(key) or []
+            while bucket:
+                last_used, conn = bucket.pop()
+                if now - last_used <= self.idle_s and conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                    _count(connections_reused=1)
+                    return conn, True
+                conn.close()
+        scheme, host, port = key
+        if scheme == "https":
+            conn = http.client.HTTPSConnection(host, port, timeout=timeout, context=self._ssl)
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=timeout)
+        _count(connections_opened=1)
+        return conn, False
+
+    def release(self, key: Tuple[str, str, int], conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            bucket = self._idle.setdefault(key, [])
+            if len(bucket) >= self.max_per_host:
+                conn.close()
+                return
+            bucket.append((time.monotonic(), conn))
+
+
+_pool = _ConnectionPool()
+
+
+def _decode_body(data: bytes, encoding: str, limit: Optional[int] = None) -> Tuple[bytes, bool]:
+    """
+    按 Content-Encoding 解压，最多解出 limit 字节，返回 (body, 是否没有超出 limit)。
+    用 decompressobj 增量解压：压缩流被截断（超过 MAX_BODY_BYTES 只读了前一段）也能解出前面的部分，
+    压缩比很高的响应也不会整个展开到内存里。
+    """
+    limit = MAX_BODY_BYTES if limit is None else limit
+    encoding = (encoding or "").strip().lower()
+    if encoding in ("gzip", "x-gzip"):
+        wbits = [16 + zlib.MAX_WBITS]
+    elif encoding == "deflate":
+        # 有些服务器发的是不带 zlib 头的 raw deflate
+        wbits = [zlib.MAX_WBITS, -zlib.MAX_WBITS]
+    else:
+        return data[:limit], len(data) <= limit
+    for i, wb in enumerate(wbits):
+        try:
+            return _inflate(data, wb, limit)
+        except zlib.error:
+            if i == len(wbits) - 1:
+                raise
+    raise AssertionError("unreachable")
+
+
+def _inflate(data: bytes, wbits: int, limit: int) -> Tuple[bytes, bool]:
+    out = bytearray()
+    while data:
+        d = zlib.decompressobj(wbits)
+        out += d.decompress(data, limit + 1 - len(out))
+        if len(out) > limit:
+            return bytes(out[:limit]), False
+        if not d.eof:
+            # 输入被截断，或者还有没吐出来的数据
+            out += d.flush()[:limit + 1 - len(out)]
+            break
+        # gzip 允许多个 member 首尾相接
+        data = d.unused_data if wbits > 16 else b""
+    if len(out) > limit:
+        return bytes(out[:limit]), False
+    return bytes(out), True
+
+
+def _use_proxy(url: str) -> bool:
+    parts = urlsplit(url)
+    return parts.scheme in getproxies() and not proxy_bypass(parts.hostname or "")
+
+
+def _request_pooled(url: str, headers: Dict[str, str], timeout: float, limit: int) -> Response:
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https"):
+        raise URLError(f"unsupported scheme: {parts.scheme!r}")
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    key = (parts.scheme, parts.hostname or "", port)
+    target = parts.path or "/"
+    if parts.query:
+        target += "?" + parts.query
+
+    # 复用的连接可能已经被服务器关掉，失败时用新连接重试一次
+    for attempt in range(2):
+        conn, reused = _pool.acquire(key, timeout)
+        try:
+            conn.request("GET", target, headers=headers)
+            resp = conn.getresponse()
+            raw = resp.read(limit + 1)
+            if len(raw) <= limit and resp.length:
+                # read(amt) 遇到连接提前关闭不会报错，只是少给数据；按 Content-Length 自己检查
+                raise http.client.IncompleteRead(raw, resp.length)
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError,
+                http.client.BadStatusLine) as e:
+            conn.close()
+            if reused and attempt == 0:
+                continue
+            raise URLError(e)
+        except (http.client.HTTPException, OSError) as e:
+            # IncompleteRead 等其它协议错误：连接状态不可知，关掉不放回池子
+            conn.close()
+            raise URLError(e)
+
+        complete = len(raw) <= limit
+        if complete and not resp.will_close:
+            _pool.release(key, conn)
+        else:
+            conn.close()
+        raw = raw[:limit]
+        _count(bytes_downloaded=len(raw))
+        hdrs = {k.lower(): v for k, v in resp.getheaders()}
+        body, fits = _decode_body(raw, hdrs.get("content-encoding", ""), limit)
+        return Response(url, resp.status, resp.reason, hdrs, body, complete and fits)
+    raise URLError("unreachable")
+
+
+def _request_urllib(url: str, headers: Dict[str, str], timeout: float, limit: int) -> Response:
+    req = Request(url, headers=headers)
+    try:
+        resp = urlopen(req, timeout=timeout)
+    except HTTPError as e:
+        # 304 / 4xx / 5xx 在 urllib 里是异常，这里统一转成 Response
+        raw = e.read(limit) if e.fp else b""
+        hdrs = {k.lower(): v for k, v in (e.headers or {}).items()}
+        return Response(url, e.code, str(e.reason), hdrs, raw)
+    with resp:
+        try:
+            raw = resp.read(limit + 1)
+        except http.client.HTTPException as e:
+            raise URLError(e)
+        complete = len(raw) <= limit
+        raw = raw[:limit]
+        _count(bytes_downloaded=len(raw))
+        hdrs = {k.lower(): v for k, v in resp.headers.items()}
+        body, fits = _decode_body(raw, hdrs.get("content-encoding", ""), limit)
+        return Response(resp.geturl(), getattr(resp, "status", 200), resp.reason, hdrs, body, complete and fits)
+
+
+def _request(url: str, headers: Dict[str, str], timeout: float, limit: int = 0) -> Response:
+    """GET 一个 URL（跟随重定向）；网络错误抛 URLError。body 最多读 limit 字节（0 = MAX_BODY_BYTES）。"""
+    limit = min(limit, MAX_BODY_BYTES) if limit > 0 else MAX_BODY_BYTES
+    headers = {
+        "User-Agent": USER_AGENT,
+        "Accept-Encoding": "gzip, deflate",
+        **headers,
+    }
+    _count(requests=1)
+    if _use_proxy(url):
+        return _request_urllib(url, headers, timeout, limit)
+
+    current = url
+    for _ in range(MAX_REDIRECTS + 1):
+        resp = _request_pooled(current, headers, timeout, limit)
+        location = resp.headers.get("location")
+        if resp.status in _REDIRECTS and location:
+            current = urljoin(current, location)
+            continue
+        resp.url = current
+        return resp
+    raise URLError(f"too many redirects for {url}")
+
+
+# ---------- 磁盘缓存 ----------
+
+def _cache_paths(url: str) -> Tuple[str, str]:
+    key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    base = os.path.join(CACHE_DIR, key[:2], key)
+    return base + ".json", base + ".body"
+
+
+def _parse_cache_control(value: str) -> Dict[str, Optional[str]]:
+    out: Dict[str, Optional[str]] = {}
+    for part in (value or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "=" in part:
+            k, v = part.split("=", 1)
+            out[k.strip().lower()] = v.strip().strip('"')
+        else:
+            out[part.lower()] = None
+    return out
+
+
+def _fresh_until(headers: Dict[str, str], now: float) -> Optional[float]:
+    """返回过期时间戳；None 表示不能缓存。"""
+    cc = _parse_cache_control(headers.get("cache-control", ""))
+    if "no-store" in cc:
+        return None
+    if "no-cache" in cc:
+        return now  # 可以存，但每次都要重新验证
+    for k in ("s-maxage", "max-age"):
+        if cc.get(k):
+            try:
+                return now + max(0, int(cc[k]))
+            except ValueError:
+                pass
+    if headers.get("expires"):
+        try:
+            exp = email.utils.parsedate_to_datetime(headers["expires"]).timestamp()
+            return max(now, exp)
+        except (TypeError, ValueError):
+            pass
+    return now + DEFAULT_TTL_S
+
+
+def _load(url: str) -> Optional[Tuple[dict, bytes]]:
+    meta_path, body_path = _cache_paths(url)
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(body_path, "rb") as f:
+            body = f.read()
+    except (OSError, ValueError):
+        return None
+    return meta, body
+
+
+def _atomic_write(path: str, data: bytes) -> None:
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+# 缓存条目里保留的响应头；304 时用响应里的同名头整体刷新
+_CACHED_HEADERS = ("content-type", "etag", "last-modified", "cache-control", "expires")
+
+
+def _store(url: str, resp: Response, fresh_until: float) -> None:
+    meta_path, body_path = _cache_paths(url)
+    os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+    meta = {
+        "url": url,
+        "status": resp.status,
+        "headers": {
+            k: resp.headers[k]
+            for k in _CACHED_HEADERS
+            if k in resp.headers
+        },
+        "stored_at": time.time(),
+        "fresh_until": fresh_until,
+    }
+    # 先写 body 再写 meta：meta 存在即代表 body 完整
+    _atomic_write(body_path, resp.body)
+    _atomic_write(meta_path, json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+
+
+def _refresh(url: str, meta: dict, fresh_until: float) -> None:
+    meta_path, _ = _cache_paths(url)
+    meta = {**meta, "fresh_until": fresh_until}
+    _atomic_write(meta_path, json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+
+
+def cached_get(url: str, timeout: float, max_bytes: int = 0) -> Response:
+    """
+    带缓存的 GET：新鲜的直接返回，过期的做条件请求，其余正常请求并按响应头决定是否缓存。
+    max_bytes > 0 时最多下载 / 解出这么多字节就停（不完整的响应不进缓存）；缓存命中时返回完整 body。
+    """
+    now = time.time()
+    entry = _load(url)
+    headers: Dict[str, str] = {}
+    if entry is not None:
+        meta, body = entry
+        if meta.get("fresh_until", 0) > now:
+            _count(hits=1, bytes_saved=len(body))
+            return Response(url, meta["status"], "OK", meta.get("headers", {}), body)
+        if meta["headers"].get("etag"):
+            headers["If-None-Match"] = meta["headers"]["etag"]
+        if meta["headers"].get("last-modified"):
+            headers["If-Modified-Since"] = meta["headers"]["last-modified"]
+
+    resp = _request(url, headers, timeout, max_bytes)
+
+    if resp.status == 304 and entry is not None:
+        meta, body = entry
+        # 304 带回来的 ETag / Cache-Control / Expires / Last-Modified 覆盖旧值（旧条目里没有的也加上）
+        merged = {**meta["headers"], **{k: v for k, v in resp.headers.items() if k in _CACHED_HEADERS}}
+        until = _fresh_until(merged, time.time())
+        if until is not None:
+            _refresh(url, {**meta, "headers": merged}, until)
+        _count(revalidated=1, bytes_saved=len(body))
+        return Response(url, meta["status"], "OK", merged, body)
+
+    _count(misses=1)
+    if resp.status == 200 and resp.complete:
+        until = _fresh_until(resp.headers, time.time())
+        if until is not None:
+            _store(url, resp, until)
+    return resp
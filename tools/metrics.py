@@ -0,0 +1,292 @@
+# tools/metrics.py
+"""
+运行指标（横切所有节点 / LLM 调用 / 工具调用）：
+- 进程级累计指标，server 的 /metrics 以 Prometheus 文本格式导出（不依赖 prometheus_client）；
+- 每次运行一个 RunMetrics，graph_app 在节点执行期间把它放进 contextvar，
+  LLM / 工具调用（包括 executor 线程池里的）记到当前运行和当前节点上，运行结束后作为 timings 附在结果里。
+"""
+import bisect
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# 单位：秒；覆盖从本地工具调用（毫秒级）到整次运行（十分钟级）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+FIX_ITER_BUCKETS = (0, 1, 2, 3, 5)
+
+# 估算费用用的单价（美元 / 百万 token）；都为 0 时不计费用
+PRICE_PROMPT_PER_1M = float(os.getenv("LLM_PRICE_PROMPT_PER_1M", "0"))
+PRICE_COMPLETION_PER_1M = float(os.getenv("LLM_PRICE_COMPLETION_PER_1M", "0"))
+
+
+def _escape(v: Any) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt(v: float) -> str:
+    if v == math.inf:
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) and not v.is_integer() else str(int(v))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._lock = threading.Lock()
+
+    def _label_str(self, values: Tuple[Any, ...], extra: str = "") -> str:
+        parts = [f'{k}="{_escape(v)}"' for k, v in zip(self.labels, values)]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[Any, ...], float] = {}
+
+    def inc(self, *labels: Any, value: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + value
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items(), key=lambda kv: tuple(map(str, kv[0])))
+        return [f"{self.name}{self._label_str(k)} {_fmt(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, *labels: Any, value: float) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        # labels -> [每个桶的计数（非累计）..., +Inf 桶], sum, count
+        self._values: Dict[Tuple[Any, ...], List[Any]] = {}
+
+    def observe(self, *labels: Any, value: float) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(
+                ((k, (list(v[0]), v[1], v[2])) for k, v in self._values.items()),
+                key=lambda kv: tuple(map(str, kv[0])),
+            )
+        out = []
+        for labels, (counts, total, n) in items:
+            acc = 0
+            for le, c in zip(self.buckets + (math.inf,), counts):
+                acc += c
+                le_label = 'le="%s"' % _fmt(le)
+                out.append(f"{self.name}_bucket{self._label_str(labels, le_label)} {acc}")
+            out.append(f"{self.name}_sum{self._label_str(labels)} {_fmt(round(total, 6))}")
+            out.append(f"{self.name}_count{self._label_str(labels)} {n}")
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> Any:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for m in self._metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+NODE_SECONDS = REGISTRY.register(Histogram("devagent_node_duration_seconds", "Wall time of graph node executions.", ("node",)))
+NODE_ERRORS = REGISTRY.register(Counter("devagent_node_errors_total", "Graph node executions that raised.", ("node",)))
+LLM_SECONDS = REGISTRY.register(Histogram("devagent_llm_request_duration_seconds", "Latency of chat model calls.", ("model", "node", "cached")))
+LLM_ERRORS = REGISTRY.register(Counter("devagent_llm_errors_total", "Chat model calls that raised.", ("model", "node")))
+LLM_TOKENS = REGISTRY.register(Counter("devagent_llm_tokens_total", "Tokens used by uncached chat model calls.", ("model", "node", "kind")))
+LLM_COST = REGISTRY.register(Counter("devagent_llm_cost_usd_total", "Estimated chat model cost (LLM_PRICE_*_PER_1M).", ("model",)))
+TOOL_SECONDS = REGISTRY.register(Histogram("devagent_tool_duration_seconds", "Latency of agent tool calls.", ("tool",)))
+TOOL_CALLS = REGISTRY.register(Counter("devagent_tool_calls_total", "Agent tool calls by outcome.", ("tool", "ok")))
+TOOL_BYTES = REGISTRY.register(Counter("devagent_tool_payload_bytes_total", "Tool call argument / result sizes.", ("tool", "direction")))
+RUNS = REGISTRY.register(Counter("devagent_runs_total", "Finished graph runs by status.", ("status",)))
+RUN_SECONDS = REGISTRY.register(Histogram("devagent_run_duration_seconds", "Wall time of graph runs.", ("status",)))
+RUNS_ACTIVE = REGISTRY.register(Gauge("devagent_runs_in_progress", "Graph runs currently executing."))
+FIX_ITERS = REGISTRY.register(Histogram("devagent_fix_iterations", "evaluator -> coder fix loops per run.", (), FIX_ITER_BUCKETS))
+
+
+def _cost(prompt: int, completion: int) -> float:
+    return (prompt * PRICE_PROMPT_PER_1M + completion * PRICE_COMPLETION_PER_1M) / 1e6
+
+
+def _add(d: Dict[str, Any], key: str, dur: float, **counts: Any) -> None:
+    e = d.setdefault(key, {"calls": 0, "total_s": 0.0, "max_s": 0.0})
+    e["calls"] += 1
+    e["total_s"] += dur
+    e["max_s"] = max(e["max_s"], dur)
+    for k, v in counts.items():
+        e[k] = e.get(k, 0) + v
+
+
+class RunMetrics:
+    """一次运行的明细；file_worker / 工具线程会并发写，所以加锁。"""
+
+    def __init__(self, run_id: str):
+        self.run_id = run_id
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        self._lock = threading.Lock()
+        self.nodes: Dict[str, Dict[str, Any]] = {}
+        self.llm: Dict[str, Dict[str, Any]] = {}    # 按节点
+        self.tools: Dict[str, Dict[str, Any]] = {}  # 按工具名
+        self.fix_iterations = 0
+
+    def summary(self) -> Dict[str, Any]:
+        def rounded(d: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+            return {
+                k: {f: (round(v, 3) if isinstance(v, float) else v) for f, v in e.items()}
+                for k, e in sorted(d.items(), key=lambda kv: -kv[1]["total_s"])
+            }
+
+        with self._lock:
+            llm_total = {"calls": 0, "cached": 0, "errors": 0, "total_s": 0.0, "prompt_tokens": 0, "completion_tokens": 0}
+            for e in self.llm.values():
+                for k in llm_total:
+                    llm_total[k] += e.get(k, 0)
+            out = {
+                "total_s": round((self.finished or time.perf_counter()) - self.started, 3),
+                "nodes": rounded(self.nodes),
+                "llm": {**{k: round(v, 3) if isinstance(v, float) else v for k, v in llm_total.items()},
+                        "by_node": rounded(self.llm)},
+                "tools": rounded(self.tools),
+                "fix_iterations": self.fix_iterations,
+            }
+        if PRICE_PROMPT_PER_1M or PRICE_COMPLETION_PER_1M:
+            out["llm"]["cost_usd"] = round(_cost(llm_total["prompt_tokens"], llm_total["completion_tokens"]), 6)
+        return out
+
+
+_current_run: ContextVar[Optional[RunMetrics]] = ContextVar("metrics_run", default=None)
+_current_node: ContextVar[str] = ContextVar("metrics_node", default="")
+
+
+@contextmanager
+def track_run(run_id: str) -> Iterator[RunMetrics]:
+    """包住一次 graph 运行：langgraph 执行节点（包括 Send 出去的分支）时会复制 contextvars，节点里拿得到这次运行的 RunMetrics。"""
+    run = RunMetrics(run_id)
+    token = _current_run.set(run)
+    RUNS_ACTIVE.inc(value=1)
+    status = "failed"
+    try:
+        yield run
+        status = "succeeded"
+    finally:
+        _current_run.reset(token)
+        RUNS_ACTIVE.inc(value=-1)
+        run.finished = time.perf_counter()
+        RUNS.inc(status)
+        RUN_SECONDS.observe(status, value=run.finished - run.started)
+        FIX_ITERS.observe(value=run.fix_iterations)
+
+
+def current_node() -> str:
+    return _current_node.get()
+
+
+@contextmanager
+def node_scope(name: str) -> Iterator[None]:
+    """节点执行期间：记录耗时，并让节点内的 LLM / 工具调用归到这个节点上。"""
+    run = _current_run.get()
+    node_token = _current_node.set(name)
+    t0 = time.perf_counter()
+    ok = False
+    try:
+        yield
+        ok = True
+    finally:
+        dur = time.perf_counter() - t0
+        _current_node.reset(node_token)
+        NODE_SECONDS.observe(name, value=dur)
+        if not ok:
+            NODE_ERRORS.inc(name)
+        if run is not None:
+            with run._lock:
+                _add(run.nodes, name, dur, errors=0 if ok else 1)
+
+
+def record_fix_iteration() -> None:
+    run = _current_run.get()
+    if run is not None:
+        with run._lock:
+            run.fix_iterations += 1
+
+
+def record_llm(model: str, dur: float, resp: Any = None, cached: bool = False, error: bool = False) -> None:
+    node = current_node()
+    LLM_SECONDS.observe(model, node, "true" if cached else "false", value=dur)
+    usage = (getattr(resp, "usage_metadata", None) or {}) if resp is not None else {}
+    # 缓存命中没有真正调用模型，不计 token / 费用
+    prompt = 0 if cached else int(usage.get("input_tokens") or 0)
+    completion = 0 if cached else int(usage.get("output_tokens") or 0)
+    if error:
+        LLM_ERRORS.inc(model, node)
+    if prompt:
+        LLM_TOKENS.inc(model, node, "prompt", value=prompt)
+    if completion:
+        LLM_TOKENS.inc(model, node, "completion", value=completion)
+    if (prompt or completion) and (PRICE_PROMPT_PER_1M or PRICE_COMPLETION_PER_1M):
+        LLM_COST.inc(model, value=_cost(prompt, completion))
+    run = _current_run.get()
+    if run is not None:
+        with run._lock:
+            _add(run.llm, node or "-", dur, cached=int(cached), errors=int(error),
+                 prompt_tokens=prompt, completion_tokens=completion)
+
+
+def record_tool(name: str, dur: float, ok: bool, args_bytes: int, result_bytes: int) -> None:
+    TOOL_SECONDS.observe(name, value=dur)
+    TOOL_CALLS.inc(name, "true" if ok else "false")
+    TOOL_BYTES.inc(name, "args", value=args_bytes)
+    TOOL_BYTES.inc(name, "result", value=result_bytes)
+    run = _current_run.get()
+    if run is not None:
+        with run._lock:
+            _add(run.tools, name, dur, errors=0 if ok else 1, args_bytes=args_bytes, result_bytes=result_bytes)
+
+
+def render() -> str:
+    return REGISTRY.render()
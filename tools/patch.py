@@ -0,0 +1,149 @@
+# tools/patch.py
+"""
+edit_file 用到的纯文本补丁逻辑（不碰磁盘）：
+- search/replace 块：search 必须在当前内容里恰好出现一次；
+- unified diff hunk（@@ -a,b +c,d @@）：上下文行和删除行必须与文件一致，允许整体行号偏移。
+任何一处对不上都抛 PatchConflict，并说明是哪个块、期望什么、实际是什么；调用方据此整体放弃写入。
+"""
+import difflib
+import re
+from typing import List, Sequence, Tuple
+
+
+class PatchConflict(ValueError):
+    """补丁与文件内容对不上。"""
+
+
+def _line_of(text: str, index: int) -> int:
+    return text.count("\n", 0, index) + 1
+
+
+def _closest_lines(text: str, needle: str) -> str:
+    """search 没找到时，给出文件中最像 search 首行的位置，方便模型修正。"""
+    first = next((l for l in needle.splitlines() if l.strip()), "")
+    if not first:
+        return ""
+    lines = text.splitlines()
+    scored = [
+        (difflib.SequenceMatcher(None, first.strip(), l.strip()).ratio(), i + 1, l)
+        for i, l in enumerate(lines)
+    ]
+    scored = [s for s in scored if s[0] >= 0.6]
+    scored.sort(reverse=True)
+    if not scored:
+        return ""
+    hints = "; ".join(f"line {n}: {l.strip()[:120]!r}" for _, n, l in scored[:3])
+    return f" Closest lines: {hints}"
+
+
+def apply_search_replace(text: str, edits: Sequence[Tuple[str, str]]) -> str:
+    for i, (search, replace) in enumerate(edits, 1):
+        if not search:
+            raise PatchConflict(f"edit #{i}: empty search block")
+        count = text.count(search)
+        if count == 0:
+            raise PatchConflict(
+                f"edit #{i}: search block not found.{_closest_lines(text, search)}"
+            )
+        if count > 1:
+            where = []
+            start = 0
+            for _ in range(min(count, 5)):
+                idx = text.index(search, start)
+                where.append(str(_line_of(text, idx)))
+                start = idx + 1
+            raise PatchConflict(
+                f"edit #{i}: search block is ambiguous ({count} matches, at lines {', '.join(where)}); "
+                f"add more surrounding context"
+            )
+        text = text.replace(search, replace, 1)
+    return text
+
+
+def _split_lines(s: str) -> List[str]:
+    """
+    只按 \n 切行，并去掉行尾的 \r：CRLF 补丁里的空上下文行（只剩一个 \r）按空行处理。
+    不用 splitlines()，它还会在 \x0c、\x1c 这类字符处断行，把一行内容拆成两行。
+    """
+    lines = s.split("\n")
+    if lines[-1] == "":
+        lines.pop()
+    return [l[:-1] if l.endswith("\r") else l for l in lines]
+
+
+_HUNK_RE = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+def _parse_hunks(patch: str) -> List[Tuple[int, List[str], List[str]]]:
+    """返回 [(旧文件起始行号, 旧行列表, 新行列表)]；忽略 ---/+++ 文件头。"""
+    hunks: List[Tuple[int, List[str], List[str]]] = []
+    cur = None
+    for raw in _split_lines(patch):
+        m = _HUNK_RE.match(raw)
+        if m:
+            cur = (int(m.group(1)), [], [])
+            hunks.append(cur)
+            continue
+        if cur is None:
+            if raw.startswith(("---", "+++", "diff ", "index ")) or not raw.strip():
+                continue
+            raise PatchConflict(f"unexpected line before first hunk header: {raw[:120]!r}")
+        if raw.startswith("\\"):
+            continue  # "\ No newline at end of file"
+        tag, body = (raw[:1], raw[1:]) if raw else (" ", "")
+        if tag == " ":
+            cur[1].append(body)
+            cur[2].append(body)
+        elif tag == "-":
+            cur[1].append(body)
+        elif tag == "+":
+            cur[2].append(body)
+        else:
+            raise PatchConflict(f"invalid diff line: {raw[:120]!r}")
+    if not hunks:
+        raise PatchConflict("no hunks (@@ -a,b +c,d @@) found in patch")
+    return hunks
+
+
+def apply_unified_diff(text: str, patch: str) -> str:
+    newline = "\r\n" if "\r\n" in text else "\n"
+    # 空文件（@@ -0,0 新建）按以换行结尾处理
+    trailing = text.endswith(("\n", "\r\n")) or not text
+    lines = _split_lines(text)
+    offset = 0  # 前面的 hunk 造成的行数变化
+    for i, (old_start, old, new) in enumerate(_parse_hunks(patch), 1):
+        # 旧侧为空（-U0 的纯插入 / 新文件的 @@ -0,0）时 old_start 指的是“插在这一行之后”，
+        # 插入点就是 old_start 本身；否则旧块从第 old_start 行开始，下标是 old_start-1
+        base = old_start if not old else old_start - 1
+        expected = max(base + offset, 0)
+        pos = _find_block(lines, old, expected)
+        if pos < 0:
+            actual = lines[expected:expected + len(old)]
+            mismatch = next(
+                (k for k, (a, b) in enumerate(zip(old, actual)) if a != b),
+                min(len(old), len(actual)),
+            )
+            exp_line = old[mismatch] if mismatch < len(old) else "<end of hunk>"
+            act_line = actual[mismatch] if mismatch < len(actual) else "<end of file>"
+            raise PatchConflict(
+                f"hunk #{i} (@@ -{old_start}) does not apply: at line {expected + mismatch + 1} "
+                f"expected {exp_line!r} but found {act_line!r}"
+            )
+        lines[pos:pos + len(old)] = new
+        offset = pos - base + len(new) - len(old)
+    out = newline.join(lines)
+    if trailing and lines:
+        out += newline
+    return out
+
+
+def _find_block(lines: List[str], block: List[str], expected: int) -> int:
+    """在 expected 附近找与 block 完全一致的位置（先原位，再向两边扩散）；找不到返回 -1。"""
+    n = len(block)
+    if n == 0:
+        return min(expected, len(lines))
+    for delta in range(0, len(lines) + 1):
+        for pos in ((expected - delta, expected + delta) if delta else (expected,)):
+            if 0 <= pos <= len(lines) - n and lines[pos:pos + n] == block:
+                return pos
+    return -1
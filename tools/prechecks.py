@@ -0,0 +1,162 @@
+# tools/prechecks.py
+"""
+进程内的快速静态预检查（毫秒级，不起子进程）：
+- *.py   —— compile() 语法检查；
+- *.json —— json.loads 解析检查；
+- *.html —— 标签配对 / 未闭合检查（容忍 HTML 允许省略结束标签的元素）。
+在启动任何测试子进程之前跑，静态站点任务也能因此得到失败信号。
+"""
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional, Tuple
+
+from tools.workspace import SKIP_DIRS, default_root, get_workspace
+
+PRECHECK_WORKERS = int(os.getenv("PRECHECK_WORKERS", "8"))
+PRECHECK_MAX_BYTES = int(os.getenv("PRECHECK_MAX_BYTES", str(5 * 1024 * 1024)))
+
+_VOID = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta",
+    "param", "source", "track", "wbr",
+}
+# 允许省略结束标签的元素：遇到外层的结束标签时可以被隐式关闭
+_OPTIONAL_END = {
+    "html", "head", "body", "p", "li", "dt", "dd", "tr", "td", "th", "thead",
+    "tbody", "tfoot", "option", "optgroup", "colgroup", "caption", "rt", "rp",
+}
+
+
+class _TagBalance(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack: List[Tuple[str, int]] = []
+        self.errors: List[str] = []
+
+    def handle_starttag(self, tag: str, attrs: Any) -> None:
+        if tag not in _VOID:
+            self.stack.append((tag, self.getpos()[0]))
+
+    def handle_startendtag(self, tag: str, attrs: Any) -> None:
+        pass  # <br/>、<div/> 这类自闭合写法不入栈
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in _VOID:
+            return
+        line = self.getpos()[0]
+        # 从栈顶往下找匹配的开始标签，中间只能隔着可省略结束标签的元素
+        for i in range(len(self.stack) - 1, -1, -1):
+            name, _ = self.stack[i]
+            if name == tag:
+                del self.stack[i:]
+                return
+            if name not in _OPTIONAL_END:
+                break
+        if not any(name == tag for name, _ in self.stack):
+            self.errors.append(f"line {line}: unexpected </{tag}> with no matching <{tag}>")
+            return
+        open_tag, open_line = self.stack[-1]
+        self.errors.append(
+            f"line {line}: </{tag}> closes while <{open_tag}> (opened at line {open_line}) is still open"
+        )
+        # 尽量恢复，继续往下检查
+        while self.stack and self.stack[-1][0] != tag:
+            self.stack.pop()
+        if self.stack:
+            self.stack.pop()
+
+    def finish(self) -> List[str]:
+        self.close()
+        for name, line in self.stack:
+            if name not in _OPTIONAL_END:
+                self.errors.append(f"line {line}: <{name}> is never closed")
+        return self.errors
+
+
+def _check_python(text: str, path: str) -> Optional[str]:
+    try:
+        compile(text, path, "exec", dont_inherit=True)
+    except SyntaxError as e:
+        return f"line {e.lineno}: {e.msg}"
+    except ValueError as e:  # 例如源码里有 NUL 字节
+        return str(e)
+    return None
+
+
+def _check_json(text: str, path: str) -> Optional[str]:
+    try:
+        json.loads(text)
+    except json.JSONDecodeError as e:
+        return f"line {e.lineno} col {e.colno}: {e.msg}"
+    return None
+
+
+def _check_html(text: str, path: str) -> Optional[str]:
+    parser = _TagBalance()
+    parser.feed(text)
+    errors = parser.finish()
+    if not errors:
+        return None
+    more = f" (+{len(errors) - 5} more)" if len(errors) > 5 else ""
+    return "; ".join(errors[:5]) + more
+
+
+_CHECKS = {
+    ".py": ("python-syntax", _check_python),
+    ".json": ("json-parse", _check_json),
+    ".html": ("html-wellformed", _check_html),
+    ".htm": ("html-wellformed", _check_html),
+}
+
+
+def _collect(root: str) -> List[str]:
+    out = []
+    for dirpath, dirs, files in os.walk(root):
+        dirs[:] = [
+            d for d in dirs
+            if d not in SKIP_DIRS and not d.startswith(".")
+            and not (dirpath == root and root == default_root() and d == "runs")
+        ]
+        for fn in files:
+            if os.path.splitext(fn)[1].lower() in _CHECKS:
+                out.append(os.path.join(dirpath, fn))
+    return sorted(out)
+
+
+def _check_file(abs_path: str, root: str) -> Optional[Dict[str, str]]:
+    kind, fn = _CHECKS[os.path.splitext(abs_path)[1].lower()]
+    rel = os.path.relpath(abs_path, root)
+    try:
+        if os.path.getsize(abs_path) > PRECHECK_MAX_BYTES:
+            return None
+        with open(abs_path, "r", encoding="utf-8") as f:
+            text = f.read()
+    except UnicodeDecodeError as e:
+        return {"path": rel, "kind": kind, "error": f"not valid UTF-8: {e}"}
+    except OSError:
+        return None
+    err = fn(text, abs_path)
+    if err is None:
+        return None
+    return {"path": rel, "kind": kind, "error": err}
+
+
+def run_prechecks(root: Optional[str] = None, workers: int = PRECHECK_WORKERS) -> Dict[str, Any]:
+    """检查 workspace 下所有 .py / .json / .html 文件，返回 {ok, checked, failures, duration_s}。"""
+    root = root or get_workspace()
+    t0 = time.perf_counter()
+    files = _collect(root) if os.path.isdir(root) else []
+    if len(files) > 1 and workers > 1:
+        with ThreadPoolExecutor(max_workers=min(workers, len(files)), thread_name_prefix="precheck") as pool:
+            results = list(pool.map(lambda p: _check_file(p, root), files))
+    else:
+        results = [_check_file(p, root) for p in files]
+    failures = [r for r in results if r is not None]
+    return {
+        "ok": not failures,
+        "checked": len(files),
+        "failures": failures,
+        "duration_s": round(time.perf_counter() - t0, 4),
+    }
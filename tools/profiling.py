@@ -0,0 +1,242 @@
+# tools/profiling.py
+"""
+单次运行的按需 profiling（运行 API 传 profile=true 时才开启）：
+- 每个节点一个 cProfile（节点线程 + 它派出去的工具 / 评测线程，合并到同一个节点上）；
+- tracemalloc 记录峰值内存和增长最多的分配位置；
+- 结果写到 <workspace>/.devagent/profile/：<node>.prof（pstats 格式，可以用 snakeviz 打开）、
+  <node>.txt（按 cumulative 排序的前几十行）、memory.txt、summary.json。
+没开启时 contextvar 为 None，各个钩子直接返回 nullcontext / 原函数，没有额外开销。
+"""
+import contextlib
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+PROFILE_TOP_FUNCS = int(os.getenv("PROFILE_TOP_FUNCS", "40"))
+PROFILE_TOP_ALLOCS = int(os.getenv("PROFILE_TOP_ALLOCS", "25"))
+# tracemalloc 保留的栈深度；越深越慢
+PROFILE_TRACEMALLOC_FRAMES = int(os.getenv("PROFILE_TRACEMALLOC_FRAMES", "1"))
+
+PROFILE_DIRNAME = os.path.join(".devagent", "profile")
+
+# 按文件名 / 内置函数名把 tottime 粗分成几类，回答“时间花在 Python 里、子进程里还是网络上”
+_CATEGORIES = (
+    ("network", ("socket.py", "ssl.py", "httpcore", "httpx", "h11", "_socket", "_ssl", "getaddrinfo")),
+    # select / poll 两边都会用（httpcore 检查连接、communicate 读管道），不归类
+    ("subprocess", ("subprocess.py", "_posixsubprocess", "waitpid")),
+    ("thread_wait", ("threading.py", "lock' objects", "_thread.lock", "concurrent/futures")),
+    ("json", ("json/", "_json")),
+)
+
+_tm_lock = threading.Lock()
+_tm_users = 0  # 多个运行同时 profiling 时共用 tracemalloc，最后一个结束的才停
+_tm_owned = False  # 外部（例如 PYTHONTRACEMALLOC）已经开着的不归我们停
+
+
+def _category(func: tuple) -> str:
+    filename, _, name = func
+    text = f"{filename}:{name}"
+    for cat, needles in _CATEGORIES:
+        if any(n in text for n in needles):
+            return cat
+    return "python"
+
+
+class RunProfiler:
+    def __init__(self, out_dir: str):
+        self.out_dir = out_dir
+        self._lock = threading.Lock()
+        self._profiles: Dict[str, List[cProfile.Profile]] = {}
+        self._nodes: Dict[str, Dict[str, float]] = {}
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._peak_snapshot: Optional[tracemalloc.Snapshot] = None
+        self._peak_current = -1
+        self._peak_node = ""
+
+    # ---- tracemalloc ----
+    def _start_memory(self) -> None:
+        global _tm_users, _tm_owned
+        with _tm_lock:
+            if _tm_users == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+                _tm_owned = True
+            _tm_users += 1
+        tracemalloc.reset_peak()
+        self._baseline = tracemalloc.take_snapshot()
+
+    def _stop_memory(self) -> Dict[str, Any]:
+        global _tm_users, _tm_owned
+        current, peak = tracemalloc.get_traced_memory()
+        self._maybe_snapshot("end", current)
+        with _tm_lock:
+            _tm_users -= 1
+            if _tm_users == 0 and _tm_owned:
+                tracemalloc.stop()
+                _tm_owned = False
+        return {"peak_bytes": peak, "end_bytes": current}
+
+    def _maybe_snapshot(self, node: str, current: Optional[int] = None) -> None:
+        # 只在节点结束时看一眼：当前占用创新高才拍快照，快照代价大
+        if current is None:
+            current = tracemalloc.get_traced_memory()[0]
+        with self._lock:
+            if current <= self._peak_current:
+                return
+            self._peak_current = current
+        snap = tracemalloc.take_snapshot()
+        with self._lock:
+            if current >= self._peak_current:
+                self._peak_snapshot, self._peak_node = snap, node
+
+    # ---- cProfile ----
+    def _add_profile(self, node: str, prof: cProfile.Profile, wall: float = 0.0, cpu: float = 0.0, calls: int = 0) -> None:
+        with self._lock:
+            self._profiles.setdefault(node, []).append(prof)
+            e = self._nodes.setdefault(node, {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0})
+            e["calls"] += calls
+            e["wall_s"] += wall
+            e["cpu_s"] += cpu
+
+    # ---- 输出 ----
+    def _write_node(self, node: str, profs: List[cProfile.Profile]) -> Dict[str, Any]:
+        stats = pstats.Stats(profs[0])
+        for p in profs[1:]:
+            stats.add(p)
+        safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in node)
+        stats.dump_stats(os.path.join(self.out_dir, f"{safe}.prof"))
+        buf = io.StringIO()
+        stats.stream = buf
+        stats.sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCS)
+        with open(os.path.join(self.out_dir, f"{safe}.txt"), "w", encoding="utf-8") as f:
+            f.write(buf.getvalue())
+
+        categories: Dict[str, float] = {}
+        for func, (_, _, tt, _, _) in stats.stats.items():  # type: ignore[attr-defined]
+            cat = _category(func)
+            categories[cat] = categories.get(cat, 0.0) + tt
+        return {
+            "profiled_s": round(stats.total_tt, 3),  # type: ignore[attr-defined]
+            "by_category_s": {k: round(v, 3) for k, v in sorted(categories.items(), key=lambda kv: -kv[1])},
+            "files": [f"{safe}.prof", f"{safe}.txt"],
+        }
+
+    def _write_memory(self, mem: Dict[str, Any]) -> Dict[str, Any]:
+        top: List[Dict[str, Any]] = []
+        if self._peak_snapshot is not None and self._baseline is not None:
+            # 和运行开始时比：只看这次运行新增的分配
+            diff = self._peak_snapshot.compare_to(self._baseline, "lineno")
+            for st in diff[:PROFILE_TOP_ALLOCS]:
+                frame = st.traceback[0]
+                top.append({
+                    "site": f"{frame.filename}:{frame.lineno}",
+                    "size_bytes": st.size_diff,
+                    "count": st.count_diff,
+                })
+        lines = [
+            f"peak traced memory: {mem['peak_bytes'] / 1e6:.1f} MB",
+            f"largest snapshot taken after node: {self._peak_node or '-'}",
+            "(tracemalloc is process-wide: concurrent runs are included)",
+            "",
+        ] + [f"{t['size_bytes'] / 1024:10.1f} KiB {t['count']:8d}  {t['site']}" for t in top]
+        with open(os.path.join(self.out_dir, "memory.txt"), "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        return {**mem, "peak_after_node": self._peak_node, "top_allocations": top, "files": ["memory.txt"]}
+
+    def write(self, mem: Dict[str, Any], wall_s: float) -> Dict[str, Any]:
+        os.makedirs(self.out_dir, exist_ok=True)
+        nodes: Dict[str, Any] = {}
+        for node, profs in self._profiles.items():
+            e = self._nodes.get(node) or {}
+            nodes[node] = {
+                "calls": int(e.get("calls", 0)),
+                "wall_s": round(e.get("wall_s", 0.0), 3),
+                "cpu_s": round(e.get("cpu_s", 0.0), 3),
+                **self._write_node(node, profs),
+            }
+        summary = {
+            "wall_s": round(wall_s, 3),
+            "nodes": dict(sorted(nodes.items(), key=lambda kv: -kv[1]["wall_s"])),
+            "memory": self._write_memory(mem),
+        }
+        with open(os.path.join(self.out_dir, "summary.json"), "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        return summary
+
+
+_active: ContextVar[Optional[RunProfiler]] = ContextVar("run_profiler", default=None)
+_node: ContextVar[str] = ContextVar("profile_node", default="")
+
+
+@contextlib.contextmanager
+def profile_run(workspace: str, enabled: bool = True) -> Iterator[Dict[str, Any]]:
+    """
+    包住一次 graph 运行。yield 出来的 dict 在运行结束后填上 summary（enabled=False 时保持为空）。
+    运行中途报错也会把已经收集到的结果写出来。
+    """
+    result: Dict[str, Any] = {}
+    if not enabled:
+        yield result
+        return
+    prof = RunProfiler(os.path.join(workspace, PROFILE_DIRNAME))
+    prof._start_memory()
+    token = _active.set(prof)
+    t0 = time.perf_counter()
+    try:
+        yield result
+    finally:
+        _active.reset(token)
+        mem = prof._stop_memory()
+        result.update(prof.write(mem, time.perf_counter() - t0))
+        result["dir"] = PROFILE_DIRNAME.replace(os.sep, "/")
+
+
+def _run_profiled(prof: RunProfiler, node: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    p = cProfile.Profile()
+    p.enable()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        p.disable()
+        prof._add_profile(node, p)
+
+
+def node_profile(name: str):
+    """graph_app 的节点包装里用：没开 profiling 时就是 nullcontext。"""
+    prof = _active.get()
+    if prof is None:
+        return contextlib.nullcontext()
+    return _node_profile(prof, name)
+
+
+@contextlib.contextmanager
+def _node_profile(prof: RunProfiler, name: str) -> Iterator[None]:
+    token = _node.set(name)
+    p = cProfile.Profile()
+    t0, c0 = time.perf_counter(), time.thread_time()
+    p.enable()
+    try:
+        yield
+    finally:
+        p.disable()
+        _node.reset(token)
+        prof._add_profile(name, p, wall=time.perf_counter() - t0, cpu=time.thread_time() - c0, calls=1)
+        prof._maybe_snapshot(name)
+
+
+def in_thread(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    cProfile 只统计开启它的那个线程：节点派到线程池里的函数（工具调用、评测目标）用这个包一下，
+    结果合并到当前节点。没开 profiling 时原样返回 fn。调用方需要复制 contextvars（本来就要）。
+    """
+    prof = _active.get()
+    if prof is None:
+        return fn
+    return functools.partial(_run_profiled, prof, _node.get() or "-", fn)
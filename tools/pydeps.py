@@ -0,0 +1,172 @@
+# tools/pydeps.py
+"""
+静态分析 workspace 里 Python 文件的本地依赖（只看 import，不执行代码）。
+"""
+import ast
+import os
+from typing import List, Set, Tuple
+
+
+def _module_to_path(module: str, base_dir: str, root: str) -> str:
+    """把模块名映射到 workspace 内的文件；找不到（标准库 / 第三方）返回空串。"""
+    rel = module.replace(".", os.sep)
+    for d in (base_dir, root):
+        for cand in (os.path.join(d, rel + ".py"), os.path.join(d, rel, "__init__.py")):
+            cand = os.path.abspath(cand)
+            if os.path.commonpath([root, cand]) == root and os.path.isfile(cand):
+                return cand
+    return ""
+
+
+def local_imports(abs_path: str, root: str) -> List[str]:
+    """abs_path 直接 import 的、位于 root 之内的 .py 文件（绝对路径，去重后排序）。"""
+    try:
+        with open(abs_path, "r", encoding="utf-8") as f:
+            tree = ast.parse(f.read(), filename=abs_path)
+    except (OSError, SyntaxError, ValueError):
+        return []
+
+    base_dir = os.path.dirname(abs_path)
+    found: Set[str] = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [a.name for a in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                # 相对导入：从当前文件所在目录往上找
+                pkg_dir = base_dir
+                for _ in range(node.level - 1):
+                    pkg_dir = os.path.dirname(pkg_dir)
+                mod = node.module or ""
+                names = [f"{mod}.{a.name}" if mod else a.name for a in node.names]
+                if mod:
+                    names.append(mod)
+                for n in names:
+                    p = _module_to_path(n, pkg_dir, root)
+                    if p:
+                        found.add(p)
+                continue
+            mod = node.module or ""
+            names = [mod] + [f"{mod}.{a.name}" for a in node.names]
+        else:
+            continue
+        for n in names:
+            p = _module_to_path(n, base_dir, root)
+            if p:
+                found.add(p)
+    found.discard(os.path.abspath(abs_path))
+    return sorted(found)
+
+
+# 一个目录依赖最多展开多少个文件
+_MAX_DIR_FILES = 200
+
+
+def _path_literals(abs_path: str, root: str) -> List[str]:
+    """文件里出现的、能解析到 workspace 内已有文件 / 目录的字符串常量（例如 open("data/x.json")）。"""
+    try:
+        with open(abs_path, "r", encoding="utf-8") as f:
+            tree = ast.parse(f.read(), filename=abs_path)
+    except (OSError, SyntaxError, ValueError):
+        return []
+    base_dir = os.path.dirname(abs_path)
+    out: Set[str] = set()
+    for node in ast.walk(tree):
+        if not (isinstance(node, ast.Constant) and isinstance(node.value, str)):
+            continue
+        s = node.value.strip()
+        if not s or len(s) > 260 or "\n" in s or s in (".", "./"):
+            continue
+        # 目标以 workspace 为 cwd 运行，相对路径两种基准都试一下
+        for d in (root, base_dir):
+            cand = os.path.abspath(os.path.join(d, s))
+            if cand == root or os.path.commonpath([root, cand]) != root:
+                continue
+            if os.path.isfile(cand):
+                out.add(cand)
+            elif os.path.isdir(cand):
+                count = 0
+                for dirpath, dirs, files in os.walk(cand):
+                    dirs[:] = sorted(d2 for d2 in dirs if not d2.startswith(".") and d2 != "__pycache__")
+                    for fn in sorted(files):
+                        out.add(os.path.join(dirpath, fn))
+                        count += 1
+                        if count >= _MAX_DIR_FILES:
+                            break
+                    if count >= _MAX_DIR_FILES:
+                        break
+    return sorted(out)
+
+
+# 只要出现就说明输入集合静态看不全：动态 import / 执行、目录遍历、起子进程
+_ALWAYS_DYNAMIC = {
+    "__import__", "import_module", "spec_from_file_location", "run_path", "run_module", "exec", "eval",
+    "glob", "iglob", "rglob", "iterdir", "listdir", "scandir", "walk",
+    "system", "popen", "Popen", "run", "call", "check_call", "check_output", "urlopen",
+}
+# 第一个参数不是字符串常量时路径是动态拼出来的（open(os.path.join(DIR, name)) 这种）
+_PATH_ARG = {
+    "open", "Path", "PurePath", "loadtxt", "genfromtxt", "fromfile",
+    "read_csv", "read_json", "read_excel", "read_table", "read_parquet", "read_pickle",
+}
+
+
+def _call_name(func: ast.AST) -> str:
+    if isinstance(func, ast.Name):
+        return func.id
+    if isinstance(func, ast.Attribute):
+        return func.attr
+    return ""
+
+
+def dynamic_io(abs_path: str, root: str) -> List[str]:
+    """
+    abs_path 里静态分析看不全的读文件 / import（动态路径、importlib、glob、子进程等），
+    返回 "相对路径:行号: 调用名" 列表；为空才说明 python_inputs 的结果可以当成完整的。
+    读不了 / 语法错误的文件也算看不全。
+    """
+    rel = os.path.relpath(abs_path, root)
+    try:
+        with open(abs_path, "r", encoding="utf-8") as f:
+            tree = ast.parse(f.read(), filename=abs_path)
+    except (OSError, SyntaxError, ValueError):
+        return [f"{rel}: cannot parse"]
+    found = []
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call):
+            continue
+        name = _call_name(node.func)
+        if name in _ALWAYS_DYNAMIC:
+            found.append(f"{rel}:{node.lineno}: {name}()")
+        elif name in _PATH_ARG:
+            first = node.args[0] if node.args else None
+            if not (isinstance(first, ast.Constant) and isinstance(first.value, str)):
+                found.append(f"{rel}:{node.lineno}: {name}() with a non-literal path")
+    return found
+
+
+def scan_inputs(abs_path: str, root: str) -> Tuple[List[str], List[str]]:
+    """
+    运行 abs_path 时可能读取的 workspace 文件（绝对路径）：
+    自身 + 传递的本地 import + 这些文件里以字符串常量出现的数据文件 / 目录。
+    同时返回这些 .py 文件里的 dynamic_io() 结果：非空时输入列表不完整，不能拿它判断“没变”。
+    """
+    seen: Set[str] = set()
+    inputs: Set[str] = set()
+    dynamic: List[str] = []
+    stack = [os.path.abspath(abs_path)]
+    while stack:
+        cur = stack.pop()
+        if cur in seen:
+            continue
+        seen.add(cur)
+        inputs.add(cur)
+        inputs.update(_path_literals(cur, root))
+        dynamic.extend(dynamic_io(cur, root))
+        stack.extend(local_imports(cur, root))
+    return sorted(inputs), dynamic
+
+
+def python_inputs(abs_path: str, root: str) -> List[str]:
+    """scan_inputs 的输入列表部分（静态近似，动态拼出来的路径看不到）。"""
+    return scan_inputs(abs_path, root)[0]
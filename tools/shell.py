@@ -1,8 +1,22 @@
 import os,json
-import subprocess
+import time
+import uuid
+from typing import Callable, Optional
 from pydantic import BaseModel, Field
 from langchain.tools import tool
 
+from tools import fsindex
+from tools.capture import run_captured
+from tools.workspace import get_workspace
+
+# 输出只保留开头 + 结尾，内存占用与命令输出量无关
+SHELL_OUTPUT_HEAD_BYTES = int(os.getenv("SHELL_OUTPUT_HEAD_BYTES", "2000"))
+SHELL_OUTPUT_TAIL_BYTES = int(os.getenv("SHELL_OUTPUT_TAIL_BYTES", "6000"))
+# 输出被截断时，把完整日志留在 <workspace>/.devagent/logs/ 下（可以再用 read_file 查看）
+SHELL_SPILL_LOGS = os.getenv("SHELL_SPILL_LOGS", "1") == "1"
+# 单个落盘日志的上限，超出部分丢弃并在结果里标 log_truncated（0 = 不限）
+SHELL_SPILL_MAX_BYTES = int(os.getenv("SHELL_SPILL_MAX_BYTES", str(10 * 1024 * 1024)))
+
 
 class RunShellArgs(BaseModel):
     cmd: str = Field(description="Shell command to run inside workspace/")
@@ -13,28 +27,44 @@ class RunShellArgs(BaseModel):
 def run_shell(cmd: str, timeout_s: int = 30) -> str:
     """Run a shell command inside the sandboxed workspace/ directory.
         Returns JSON with cmd, cwd, returncode, and output.
+        Long output is cut to its beginning and end; log_path (if present) holds the full log
+        (up to a size cap; log_truncated is true if the log itself was cut).
+        On timeout returncode is null, timed_out is true and output holds what was printed so far.
     """
-    workdir = os.path.abspath("workspace")
+    return json.dumps(run_command(cmd, timeout_s), ensure_ascii=False)
+
+
+def run_command(cmd: str, timeout_s: int, on_start: Optional[Callable[[int], None]] = None) -> dict:
+    """
+    run_shell 的实现，返回 dict。
+    给内部调用方（evaluator）用：不经过给模型看的参数 schema，超时不受 120s 上限约束；
+    on_start 见 tools.capture.run_captured。
+    """
+    workdir = get_workspace()
     os.makedirs(workdir, exist_ok=True)
 
     blocked = ["rm -rf /", "sudo", "shutdown", "reboot"]
     if any(b in cmd for b in blocked):
         raise ValueError("Blocked dangerous command")
 
-    p = subprocess.run(
+    spill_path = None
+    if SHELL_SPILL_LOGS:
+        name = f"shell-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}.log"
+        spill_path = os.path.join(workdir, ".devagent", "logs", name)
+
+    res = run_captured(
         cmd,
         cwd=workdir,
-        shell=True,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        timeout=timeout_s,
-        text=True,
+        timeout_s=timeout_s,
+        head=SHELL_OUTPUT_HEAD_BYTES,
+        tail=SHELL_OUTPUT_TAIL_BYTES,
+        spill_path=spill_path,
+        spill_max=SHELL_SPILL_MAX_BYTES,
+        on_start=on_start,
     )
+    # 命令可能改了任意文件，list_dir 的索引需要重建
+    fsindex.invalidate(workdir)
+    if res.get("log_path"):
+        res["log_path"] = os.path.relpath(res["log_path"], workdir)
 
-    payload = {
-        "cmd": cmd,
-        "cwd": workdir,
-        "returncode": p.returncode,
-        "output": (p.stdout or "")[-8000:],
-    }
-    return json.dumps(payload, ensure_ascii=False)
\ No newline at end of file
+    return {"cmd": cmd, "cwd": workdir, **res}
@@ -0,0 +1,206 @@
+# tools/warm_pool.py
+"""
+预热解释器池：维护若干个 tools/warm_worker.py 母进程，每个都已经 import 好常用模块。
+evaluator 开启 EVAL_WARM_POOL=1 时用它代替 `run_shell("python <target>")`：
+同样的 cwd 隔离、超时（杀整个进程组）和输出截取，但省掉 shell + 解释器冷启动 + 重复 import。
+只在支持 os.fork 的平台上可用，否则 available() 返回 False，调用方退回 run_shell。
+"""
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from tools.shell import SHELL_OUTPUT_HEAD_BYTES, SHELL_OUTPUT_TAIL_BYTES
+
+WARM_POOL_PRELOAD = os.getenv(
+    "WARM_POOL_PRELOAD",
+    "json,re,math,random,string,time,datetime,collections,itertools,functools,pathlib,"
+    "typing,dataclasses,argparse,csv,unittest,subprocess,urllib.request,urllib.parse,"
+    "xml.etree.ElementTree,html.parser,http.client",
+)
+# 等空闲母进程的上限；超时抛 WarmPoolUnavailable，调用方退回普通子进程
+ACQUIRE_TIMEOUT_S = float(os.getenv("WARM_POOL_ACQUIRE_TIMEOUT_S", "10"))
+# 母进程在 timeout 之外额外给的响应宽限（要大于 warm_worker.DRAIN_GRACE_S）；超过就认为母进程坏了，杀掉重建
+_PROTOCOL_GRACE_S = 10
+
+_WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "warm_worker.py")
+
+
+class WarmPoolUnavailable(RuntimeError):
+    """这次请求不能用预热池执行（拿不到母进程 / 目标有同名本地模块），调用方应退回普通子进程。"""
+
+
+def available() -> bool:
+    return hasattr(os, "fork") and sys.platform != "win32"
+
+
+class _Zygote:
+    def __init__(self, preload: str):
+        self.proc = subprocess.Popen(
+            [sys.executable, _WORKER_SCRIPT, preload],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            bufsize=1,
+        )
+        hello = self.proc.stdout.readline()
+        if not hello or not json.loads(hello).get("ready"):
+            self.close()
+            raise RuntimeError("warm worker failed to start")
+
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def request(self, req: dict, wait_s: float, on_start: Optional[Callable[[int], None]] = None) -> dict:
+        self.proc.stdin.write(json.dumps(req, ensure_ascii=False) + "\n")
+        self.proc.stdin.flush()
+        # readline 本身不支持超时，用一个定时器兜底：母进程卡死时把它杀掉，readline 会读到 EOF
+        timer = threading.Timer(wait_s, self.close)
+        timer.start()
+        try:
+            while True:
+                line = self.proc.stdout.readline()
+                if not line:
+                    raise RuntimeError("warm worker died")
+                msg = json.loads(line)
+                if not msg.get("started"):
+                    return msg
+                # fork 成功的通知，真正的结果在下一行
+                if on_start is not None:
+                    on_start(int(msg["pid"]))
+        finally:
+            timer.cancel()
+
+    def close(self) -> None:
+        try:
+            self.proc.kill()
+        except OSError:
+            pass
+
+
+class WarmPool:
+    def __init__(self, size: int, preload: str = WARM_POOL_PRELOAD):
+        self.size = max(1, size)
+        self.preload = preload
+        self._idle: "queue.Queue[_Zygote]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self.runs = 0
+        self.respawns = 0
+
+    def _acquire(self, timeout_s: float = ACQUIRE_TIMEOUT_S) -> _Zygote:
+        deadline = time.monotonic() + timeout_s
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self._lock:
+                if self._created < self.size:
+                    self._created += 1
+                    create = True
+                else:
+                    create = False
+            if create:
+                try:
+                    return _Zygote(self.preload)
+                except Exception as e:
+                    with self._lock:
+                        self._created -= 1
+                    raise WarmPoolUnavailable(f"warm worker failed to start: {e}") from e
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise WarmPoolUnavailable(f"no idle warm worker within {timeout_s:g}s")
+            # 分段等：别的线程补建母进程失败时 _created 会减回去，下一圈就能自己建
+            try:
+                return self._idle.get(timeout=min(remaining, 0.5))
+            except queue.Empty:
+                continue
+
+    def _release(self, z: _Zygote) -> None:
+        if z.alive():
+            self._idle.put(z)
+            return
+        # 母进程已经退出：补一个新的，保持池子大小
+        with self._lock:
+            self.respawns += 1
+        try:
+            self._idle.put(_Zygote(self.preload))
+        except Exception:  # noqa: BLE001
+            with self._lock:
+                self._created -= 1
+
+    def run(self, target: str, cwd: str, timeout_s: int,
+            on_start: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+        """
+        执行 `python target`，返回与 run_shell 相同结构的 dict（另带 runner / timed_out）。
+        on_start(pid) 同 tools.capture.run_captured：pid 是目标的进程组号。
+        """
+        z = self._acquire()
+        try:
+            resp = z.request(
+                {
+                    "target": target,
+                    "cwd": cwd,
+                    "timeout_s": timeout_s,
+                    "head": SHELL_OUTPUT_HEAD_BYTES,
+                    "tail": SHELL_OUTPUT_TAIL_BYTES,
+                },
+                wait_s=timeout_s + _PROTOCOL_GRACE_S,
+                on_start=on_start,
+            )
+        finally:
+            self._release(z)
+        if resp.get("fallback"):
+            raise WarmPoolUnavailable(resp["fallback"])
+        with self._lock:
+            self.runs += 1
+        out = {
+            "cmd": f"python {target}",
+            "cwd": cwd,
+            "returncode": resp.get("returncode"),
+            "output": resp.get("output", ""),
+            "output_bytes": resp.get("output_bytes", 0),
+            "truncated": resp.get("truncated", False),
+            "runner": "warm",
+        }
+        if resp.get("timed_out"):
+            out["timed_out"] = True
+        if resp.get("error"):
+            out["error"] = resp["error"]
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": self.size,
+                "started": self._created,
+                "idle": self._idle.qsize(),
+                "runs": self.runs,
+                "respawns": self.respawns,
+            }
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pool: Optional[WarmPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(size: int) -> WarmPool:
+    """进程级共享的池子；第一次调用时按 size 创建，母进程按需懒启动。"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = WarmPool(size)
+        return _pool
@@ -0,0 +1,245 @@
+# tools/warm_worker.py
+"""
+预热的 Python “母进程”（forkserver 风格），由 tools/warm_pool.py 启动，不直接使用。
+
+启动时先 import 一批常用模块，然后从 stdin 逐行读取 JSON 请求：
+    {"target": "a.py", "cwd": "/abs/workspace", "timeout_s": 120, "head": 2000, "tail": 6000}
+对每个请求 fork 一个子进程执行 target（相当于 `python target`，cwd 隔离、独立进程组），
+fork 之后先回一行 {"started": true, "pid": <子进程 pid = 进程组号>}，方便调用方提前取消；
+母进程负责收集输出、超时后杀掉整个进程组，再往 stdout 回一行 JSON：
+    {"returncode": 0, "output": "...", "output_bytes": 123, "truncated": false, "timed_out": false}
+子进程是 fork 出来的，继承了已经 import 好的模块，省掉解释器冷启动和重复 import。
+目标目录里有和已 import 模块同名的本地模块时（比如自己写了 random.py），fork 出来的子进程会用到母进程里的
+标准库版本，和 `python target` 不一致；这种请求不执行，直接回 {"fallback": "..."}，由调用方改用普通子进程。
+"""
+import atexit
+import builtins
+import gc
+import importlib.machinery
+import importlib.util
+import json
+import os
+import select
+import signal
+import sys
+import threading
+import time
+import traceback
+import types
+
+
+def _load_capture():
+    # 按文件路径加载 tools/capture.py，不注册进 sys.modules、不改 sys.path，
+    # 免得和目标脚本自己的 tools / capture 模块撞名
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "capture.py")
+    spec = importlib.util.spec_from_file_location("_warm_capture", path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+HeadTail = _load_capture().HeadTail
+
+# 子进程退出后继续读残留输出的时间上限；读输出时每隔多久检查一次子进程是否退出
+DRAIN_GRACE_S = 5.0
+POLL_INTERVAL_S = 0.05
+
+
+def _child(target: str, cwd: str, out_fd: int, proto_fds: list) -> None:
+    """在 fork 出来的子进程里执行 target，永不返回。"""
+    code = 0
+    script = os.path.abspath(os.path.join(cwd, target))
+    main = None
+    try:
+        os.setsid()
+        for fd in proto_fds:
+            os.close(fd)
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.dup2(out_fd, 1)
+        os.dup2(out_fd, 2)
+        os.close(out_fd)
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+        os.chdir(cwd)
+        sys.argv = [target]
+        sys.path[0] = os.path.dirname(script)
+
+        # 换一个全新的 __main__ 模块再执行（而不是 runpy 的临时模块）：
+        # pickle / multiprocessing 在退出阶段按 sys.modules["__main__"] 找脚本里定义的类，要一直指向脚本
+        main = types.ModuleType("__main__")
+        main.__file__ = script
+        main.__loader__ = importlib.machinery.SourceFileLoader("__main__", script)
+        main.__builtins__ = builtins
+        sys.modules["__main__"] = main
+        with open(script, "rb") as f:
+            code_obj = compile(f.read(), script, "exec")
+        exec(code_obj, main.__dict__)
+    except SystemExit as e:
+        if e.code is None:
+            code = 0
+        elif isinstance(e.code, int):
+            code = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            code = 1
+    except BaseException as e:  # noqa: BLE001
+        # 去掉本文件的栈帧，让 traceback 和直接 `python target` 时一样从脚本开始
+        tb = e.__traceback__
+        while tb is not None and tb.tb_frame.f_code.co_filename != script:
+            tb = tb.tb_next
+        traceback.print_exception(type(e), e, tb or e.__traceback__)
+        code = 1
+    finally:
+        # 按解释器正常退出的顺序收尾：等非 daemon 线程、跑 atexit、刷 stdio；
+        # 最后仍用 os._exit，不能让子进程回到母进程的请求循环里
+        try:
+            threading._shutdown()
+        except BaseException:  # noqa: BLE001
+            pass
+        try:
+            atexit._run_exitfuncs()
+        except BaseException:  # noqa: BLE001
+            pass
+        # 解释器退出时会清掉模块全局变量，没 close 的文件在析构时把缓冲写出去；这里对 __main__ 做同样的事
+        if main is not None:
+            try:
+                main.__dict__.clear()
+                gc.collect()
+            except BaseException:  # noqa: BLE001
+                pass
+        for stream in (sys.stdout, sys.stderr):
+            try:
+                stream.flush()
+            except BaseException:  # noqa: BLE001
+                pass
+        os._exit(code & 0xFF)
+
+
+def _shadowed(script_dir: str) -> str:
+    """script_dir 里和母进程已 import 的顶层模块同名的本地模块 / 包；没有返回空串。"""
+    loaded = {name.partition(".")[0] for name in sys.modules}
+    try:
+        names = os.listdir(script_dir)
+    except OSError:
+        return ""
+    for name in sorted(names):
+        if name.endswith(".py"):
+            mod = name[:-3]
+        elif os.path.isfile(os.path.join(script_dir, name, "__init__.py")):
+            mod = name
+        else:
+            continue
+        if mod in loaded:
+            return mod
+    return ""
+
+
+def _run(req: dict, proto_fds: list, notify=None) -> dict:
+    target = req["target"]
+    cwd = req["cwd"]
+    timeout_s = float(req.get("timeout_s", 30))
+    clash = _shadowed(os.path.dirname(os.path.abspath(os.path.join(cwd, target))))
+    if clash:
+        return {"returncode": None, "fallback": f"local module {clash!r} shadows a preloaded module"}
+    buf = HeadTail(int(req.get("head", 2000)), int(req.get("tail", 6000)))
+
+    r, w = os.pipe()
+    sys.stdout.flush()
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid == 0:
+        os.close(r)
+        _child(target, cwd, w, proto_fds)
+    os.close(w)
+    if notify is not None:
+        notify({"started": True, "pid": pid})
+
+    # 只保留开头 + 结尾，输出再多内存也不涨。
+    # 同时轮询子进程是否已退出：目标留下的后台进程可能一直占着管道写端，读不到 EOF；
+    # 子进程退出后最多再读 DRAIN_GRACE_S 秒（和 run_captured 里 reader.join(timeout=5) 一样）
+    deadline = time.monotonic() + timeout_s
+    drain_deadline = None
+    timed_out = False
+    status = None
+    while True:
+        now = time.monotonic()
+        if status is None:
+            done, st = os.waitpid(pid, os.WNOHANG)
+            if done:
+                status = st
+                drain_deadline = now + DRAIN_GRACE_S
+        if drain_deadline is not None:
+            remaining = drain_deadline - now
+            if remaining <= 0:
+                break
+        else:
+            remaining = deadline - now
+            if remaining <= 0:
+                timed_out = True
+                break
+        ready, _, _ = select.select([r], [], [], min(remaining, POLL_INTERVAL_S))
+        if not ready:
+            continue
+        chunk = os.read(r, 65536)
+        if not chunk:
+            break
+        buf.feed(chunk)
+
+    if timed_out:
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    os.close(r)
+    if status is None:
+        _, status = os.waitpid(pid, 0)
+    if os.WIFSIGNALED(status):
+        returncode = -os.WTERMSIG(status)
+    else:
+        returncode = os.WEXITSTATUS(status)
+    return {
+        "returncode": None if timed_out else returncode,
+        "output": buf.text(),
+        "output_bytes": buf.total,
+        "truncated": buf.truncated,
+        "timed_out": timed_out,
+    }
+
+
+def main() -> None:
+    preload = [m for m in (sys.argv[1] if len(sys.argv) > 1 else "").split(",") if m]
+    for mod in preload:
+        try:
+            __import__(mod)
+        except Exception:  # noqa: BLE001
+            pass  # 预加载失败不影响执行，子进程需要时会自己 import
+
+    # 协议走原来的 stdin/stdout；fd 1 换成 /dev/null，防止预加载模块的输出混进协议
+    proto_in = os.dup(0)
+    proto_out = os.dup(1)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.close(devnull)
+    reader = os.fdopen(proto_in, "r", encoding="utf-8")
+    writer = os.fdopen(proto_out, "w", encoding="utf-8")
+
+    def send(msg: dict) -> None:
+        writer.write(json.dumps(msg, ensure_ascii=False) + "\n")
+        writer.flush()
+
+    send({"ready": True, "pid": os.getpid()})
+    for line in reader:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            resp = _run(json.loads(line), [proto_in, proto_out], notify=send)
+        except Exception as e:  # noqa: BLE001
+            resp = {"returncode": None, "output": "", "timed_out": False, "error": f"{type(e).__name__}: {e}"}
+        send(resp)
+
+
+if __name__ == "__main__":
+    main()
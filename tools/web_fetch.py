@@ -1,12 +1,13 @@
 # tools/web_fetch.py
 import json
 from typing import Optional
-from urllib.request import Request, urlopen
-from urllib.error import URLError, HTTPError
+from urllib.error import URLError
 
 from pydantic import BaseModel, Field
 from langchain.tools import tool
 
+from tools.http_cache import cached_get
+
 
 class WebFetchArgs(BaseModel):
     url: str = Field(description="URL to fetch (can be HTML page or API endpoint)")
@@ -22,7 +23,7 @@ class WebFetchArgs(BaseModel):
 @tool(args_schema=WebFetchArgs)
 def web_fetch(url: str, timeout_s: int = 20, max_bytes: int = 50000) -> str:
     """
-    Fetch a URL using Python standard library (urllib) and return JSON string.
+    Fetch a URL (keep-alive pooled, on-disk HTTP cache) and return JSON string.
 
     Response JSON schema:
     {
@@ -35,48 +36,45 @@ def web_fetch(url: str, timeout_s: int = 20, max_bytes: int = 50000) -> str:
     Notes:
     - No HTML parsing is done here; this is suitable for APIs (e.g. arXiv Atom XML).
     - Caller (LLM) is expected to inspect `.status` and `.text`.
+    - Responses are cached per Cache-Control / ETag / Last-Modified, see tools/http_cache.py.
     """
-    headers = {
-        # 伪装一个正常 UA，避免部分站点拒绝
-        "User-Agent": "devAgent-web-fetch/1.0 (+https://example.local)"
-    }
-
-    req = Request(url, headers=headers)
     try:
-        with urlopen(req, timeout=timeout_s) as resp:
-            status = getattr(resp, "status", 200)
-            # 限制读取字节数，避免太大
-            data = resp.read(max_bytes)
-            # 尝试从 header 推断编码，默认 utf-8
-            content_type = resp.headers.get("Content-Type", "")
-            charset: Optional[str] = None
-            if "charset=" in content_type:
-                charset = content_type.split("charset=")[-1].split(";")[0].strip()
-            if not charset:
-                charset = "utf-8"
-
-            try:
-                text = data.decode(charset, errors="replace")
-            except LookupError:
-                # 万一遇到怪编码，退回 utf-8
-                text = data.decode("utf-8", errors="replace")
-
+        # max_bytes 同时限制下载量：读够了就停，不会先把整个响应（最多 MAX_BODY_BYTES）拉下来
+        resp = cached_get(url, timeout_s, max_bytes=max_bytes)
+        if resp.status >= 400:
+            # 与 urllib 的 HTTPError 行为保持一致：只给状态码和错误信息
             payload = {
                 "url": url,
-                "status": status,
-                "error": "",
-                "text": text,
+                "status": resp.status,
+                "error": f"HTTPError: HTTP Error {resp.status}: {resp.reason}",
+                "text": "",
             }
             return json.dumps(payload, ensure_ascii=False)
 
-    except HTTPError as e:
+        # 限制返回给 LLM 的字节数（缓存命中时 body 可能是完整的）
+        data = resp.body[:max_bytes]
+        # 尝试从 header 推断编码，默认 utf-8
+        content_type = resp.headers.get("content-type", "")
+        charset: Optional[str] = None
+        if "charset=" in content_type:
+            charset = content_type.split("charset=")[-1].split(";")[0].strip()
+        if not charset:
+            charset = "utf-8"
+
+        try:
+            text = data.decode(charset, errors="replace")
+        except LookupError:
+            # 万一遇到怪编码，退回 utf-8
+            text = data.decode("utf-8", errors="replace")
+
         payload = {
             "url": url,
-            "status": e.code,
-            "error": f"HTTPError: {e}",
-            "text": "",
+            "status": resp.status,
+            "error": "",
+            "text": text,
         }
         return json.dumps(payload, ensure_ascii=False)
+
     except URLError as e:
         payload = {
             "url": url,
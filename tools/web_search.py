@@ -1,7 +1,10 @@
 # tools/web_search.py
 import os
 import json
-from typing import List, Dict, Any
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
 
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field
@@ -67,14 +70,8 @@ def web_search(query: str, max_results: int = 5) -> str:
         return json.dumps(payload, ensure_ascii=False)
 
     try:
-        # Tavily 官方客户端：返回 dict，包含 "results" 等字段
-        resp = client.search(
-            query=query,
-            max_results=max_results,
-            search_depth="basic",       # 保守一点，basic 即可
-            include_answer=False,
-            include_raw_content=False,
-        )
+        # 带 TTL 缓存 + 并发去重，见文件末尾
+        results_out = _cached_search(client, query, max_results)
     except Exception as e:  # noqa: BLE001
         payload: List[Dict[str, Any]] = [
             {
@@ -85,6 +82,69 @@ def web_search(query: str, max_results: int = 5) -> str:
         ]
         return json.dumps(payload, ensure_ascii=False)
 
+    return json.dumps(results_out, ensure_ascii=False)
+
+
+# ---------- 查询结果缓存 + singleflight ----------
+# 同一个（规范化后的）查询在 TTL 内直接复用结果；并发的相同查询只真正请求一次 Tavily。
+SEARCH_TTL_S = int(os.getenv("WEB_SEARCH_TTL_S", "3600"))
+SEARCH_CACHE_SIZE = int(os.getenv("WEB_SEARCH_CACHE_SIZE", "256"))
+
+_cache_lock = threading.Lock()
+# key -> (过期时间, 请求时的 max_results, 结果列表)
+_cache: "OrderedDict[str, Tuple[float, int, List[Dict[str, Any]]]]" = OrderedDict()
+_inflight: Dict[Tuple[str, int], "_Call"] = {}
+_stats = {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0}
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: List[Dict[str, Any]] = []
+        self.error: Optional[BaseException] = None
+
+
+def _normalize_query(query: str) -> str:
+    """大小写、空白、首尾标点 / 引号不同的查询视为同一个。"""
+    q = " ".join((query or "").casefold().split())
+    return q.strip(" \t\"'`.,;!?，。；！？")
+
+
+def search_stats() -> Dict[str, Any]:
+    with _cache_lock:
+        out: Dict[str, Any] = dict(_stats)
+        out["size"] = len(_cache)
+        out["inflight"] = len(_inflight)
+    lookups = out["hits"] + out["misses"] + out["coalesced"]
+    out["hit_rate"] = round((out["hits"] + out["coalesced"]) / lookups, 3) if lookups else None
+    return out
+
+
+def _lookup(key: str, max_results: int) -> Optional[List[Dict[str, Any]]]:
+    # 调用方已持有 _cache_lock
+    entry = _cache.get(key)
+    if entry is None:
+        return None
+    expires, fetched, results = entry
+    if expires <= time.time():
+        del _cache[key]
+        return None
+    # 之前用更大的 max_results 查过，也能满足这次请求
+    if fetched < max_results and len(results) >= fetched:
+        return None
+    _cache.move_to_end(key)
+    return results[:max_results]
+
+
+def _search_tavily(client: TavilyClient, query: str, max_results: int) -> List[Dict[str, Any]]:
+    # Tavily 官方客户端：返回 dict，包含 "results" 等字段
+    resp = client.search(
+        query=query,
+        max_results=max_results,
+        search_depth="basic",       # 保守一点，basic 即可
+        include_answer=False,
+        include_raw_content=False,
+    )
     results_out: List[Dict[str, Any]] = []
     for r in (resp.get("results") or []):
         results_out.append(
@@ -95,5 +155,47 @@ def web_search(query: str, max_results: int = 5) -> str:
                 "snippet": r.get("content", "") or "",
             }
         )
+    return results_out
+
+
+def _cached_search(client: TavilyClient, query: str, max_results: int) -> List[Dict[str, Any]]:
+    key = _normalize_query(query)
+    flight_key = (key, max_results)
+    with _cache_lock:
+        hit = _lookup(key, max_results)
+        if hit is not None:
+            _stats["hits"] += 1
+            return hit
+        call = _inflight.get(flight_key)
+        leader = call is None
+        if leader:
+            call = _Call()
+            _inflight[flight_key] = call
+            _stats["misses"] += 1
+        else:
+            _stats["coalesced"] += 1
+
+    if not leader:
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
 
-    return json.dumps(results_out, ensure_ascii=False)
\ No newline at end of file
+    try:
+        call.result = _search_tavily(client, query, max_results)
+    except BaseException as e:
+        call.error = e
+        with _cache_lock:
+            _stats["errors"] += 1
+        raise
+    finally:
+        with _cache_lock:
+            _inflight.pop(flight_key, None)
+            # 出错的结果不缓存
+            if call.error is None:
+                _cache[key] = (time.time() + SEARCH_TTL_S, max_results, call.result)
+                _cache.move_to_end(key)
+                while len(_cache) > SEARCH_CACHE_SIZE:
+                    _cache.popitem(last=False)
+        call.done.set()
+    return call.result
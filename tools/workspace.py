@@ -0,0 +1,175 @@
+# tools/workspace.py
+"""
+每次 graph 运行使用独立的 workspace 根目录：
+- 当前运行的根目录放在 contextvar 里，由 graph_app 在每个节点执行前根据 state["workspace"] 设置；
+- 没有设置时退回到原来的 workspace/，保证单次运行 / 命令行用法不受影响；
+- 运行目录统一在 workspace/runs/<run_id>/ 下，按“保留时长 + 保留个数”清理。
+"""
+import hashlib
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# 保留策略：超过 RETENTION_S 秒的运行目录会被清理，且最多保留 KEEP_RUNS 个
+RETENTION_S = int(os.getenv("WORKSPACE_RETENTION_S", str(7 * 24 * 3600)))
+KEEP_RUNS = int(os.getenv("WORKSPACE_KEEP_RUNS", "20"))
+
+_current_root: ContextVar[Optional[str]] = ContextVar("workspace_root", default=None)
+
+# 正在运行的 run_id，清理时跳过
+_active_runs = set()
+_active_lock = threading.Lock()
+
+_RUN_ID_RE = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+
+def default_root() -> str:
+    return os.path.abspath(os.getenv("WORKSPACE_ROOT", "workspace"))
+
+
+def runs_dir() -> str:
+    return os.path.join(default_root(), "runs")
+
+
+def get_workspace() -> str:
+    """当前运行的 workspace 根目录（绝对路径）。"""
+    return _current_root.get() or default_root()
+
+
+@contextmanager
+def use_workspace(path: Optional[str]) -> Iterator[str]:
+    """在 with 块内把工具的根目录切到 path；path 为空时保持默认。"""
+    if not path:
+        yield get_workspace()
+        return
+    token = _current_root.set(os.path.abspath(path))
+    try:
+        yield _current_root.get()
+    finally:
+        _current_root.reset(token)
+
+
+def resolve(path: str, action: str = "access") -> str:
+    """把相对路径解析到当前 workspace 下，拒绝越界访问。"""
+    base = get_workspace()
+    abs_path = os.path.abspath(os.path.join(base, path))
+    if os.path.commonpath([base, abs_path]) != base:
+        raise ValueError(f"Refuse to {action} outside workspace/")
+    return abs_path
+
+
+def create_run_workspace(run_id: Optional[str] = None, resume: bool = False) -> Tuple[str, str]:
+    """
+    为一次运行创建 workspace/runs/<run_id>/，返回 (run_id, 绝对路径)。
+    resume=True 时目录必须已经存在（续跑要用原来的文件），不存在抛 FileNotFoundError。
+    """
+    run_id = run_id or uuid.uuid4().hex[:12]
+    if not _RUN_ID_RE.match(run_id):
+        raise ValueError(f"invalid run_id: {run_id!r}")
+    # 先登记为活跃再清理：续跑一个很旧的运行时，清理不能把它自己的目录删掉
+    with _active_lock:
+        _active_runs.add(run_id)
+    try:
+        prune_run_workspaces()
+        path = os.path.join(runs_dir(), run_id)
+        if resume:
+            if not os.path.isdir(path):
+                raise FileNotFoundError(f"workspace for run {run_id} was removed; cannot resume")
+        else:
+            os.makedirs(path, exist_ok=True)
+    except BaseException:
+        release_run_workspace(run_id)
+        raise
+    return run_id, path
+
+
+def release_run_workspace(run_id: str) -> None:
+    """运行结束：目录保留，但之后可以被保留策略清理。"""
+    with _active_lock:
+        _active_runs.discard(run_id)
+
+
+def remove_run_workspace(run_id: str) -> bool:
+    """立即删除某次运行的目录；运行中的目录不允许删除。"""
+    if not _RUN_ID_RE.match(run_id):
+        raise ValueError(f"invalid run_id: {run_id!r}")
+    with _active_lock:
+        if run_id in _active_runs:
+            raise RuntimeError(f"run {run_id} is still active")
+    path = os.path.join(runs_dir(), run_id)
+    if not os.path.isdir(path):
+        return False
+    shutil.rmtree(path, ignore_errors=True)
+    return True
+
+
+def prune_run_workspaces(
+    retention_s: int = RETENTION_S,
+    keep: int = KEEP_RUNS,
+) -> List[str]:
+    """按保留策略清理旧的运行目录，返回被删除的 run_id。"""
+    root = runs_dir()
+    if not os.path.isdir(root):
+        return []
+    with _active_lock:
+        active = set(_active_runs)
+
+    entries = []
+    with os.scandir(root) as it:
+        for e in it:
+            if e.is_dir(follow_symlinks=False) and e.name not in active:
+                entries.append((e.stat().st_mtime, e.name))
+    entries.sort(reverse=True)  # 新的在前
+
+    now = time.time()
+    removed = []
+    for i, (mtime, name) in enumerate(entries):
+        too_old = retention_s >= 0 and now - mtime > retention_s
+        too_many = keep >= 0 and i >= keep
+        if too_old or too_many:
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+            removed.append(name)
+    return removed
+
+
+# manifest / 索引时跳过的目录：依赖、VCS、缓存，以及运行期的内部文件
+SKIP_DIRS = {"node_modules", ".git", "__pycache__", ".devagent", ".venv", "venv"}
+
+
+def file_sha256(abs_path: str) -> str:
+    h = hashlib.sha256()
+    with open(abs_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def workspace_manifest(root: Optional[str] = None, limit: int = 2000) -> Dict[str, Dict[str, object]]:
+    """当前 workspace 的内容哈希清单：{相对路径: {"sha256": 前 16 位, "size": 字节数}}。"""
+    root = root or get_workspace()
+    out: Dict[str, Dict[str, object]] = {}
+    if not os.path.isdir(root):
+        return out
+    for dirpath, dirs, files in os.walk(root):
+        dirs[:] = sorted(
+            d for d in dirs
+            if d not in SKIP_DIRS and not (dirpath == root and root == default_root() and d == "runs")
+        )
+        for fn in sorted(files):
+            full = os.path.join(dirpath, fn)
+            try:
+                out[os.path.relpath(full, root)] = {
+                    "sha256": file_sha256(full)[:16],
+                    "size": os.path.getsize(full),
+                }
+            except OSError:
+                continue
+            if len(out) >= limit:
+                return out
+    return out